@@ -0,0 +1,105 @@
+"""Benchmark /flashcards serialization: model round-trip vs. the pre-serialized fast path."""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# cme_service refuses to import without an API key; the benchmark never serves requests.
+os.environ.setdefault("SANCTUM_API_KEY", "benchmark")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+from src.cme_service import CMEService  # noqa: E402
+from src.schemas import Pivot, Verse  # noqa: E402
+
+VERSES = TypeAdapter(List[Verse])
+
+
+def seed(db, n: int) -> None:
+    due = datetime.utcnow() - timedelta(days=1)
+    rows = [
+        review_db.verse_to_row(
+            Verse(
+                verse_id=f"Book_{i // 50}_{i % 50}",
+                text="For God so loved the world, that he gave his only begotten Son.",
+                covenant_tags=["Atonement", "Love"],
+                emotion_codes=["Gratitude"],
+                notes="A test note.",
+                pivot=(
+                    Pivot(
+                        type="Chiastic",
+                        center="C",
+                        elements=["A <-> A", "B <-> B"],
+                        score=1.0,
+                    )
+                    if i % 2
+                    else None
+                ),
+                easiness_factor=2.36,
+                next_due=due - timedelta(seconds=i),
+            )
+        )
+        for i in range(n)
+    ]
+    review_db.upsert_verses(rows, db=db)
+
+
+def models_path(service: CMEService, n: int) -> bytes:
+    # What the endpoint did before: decode rows into Verse models, then let
+    # FastAPI dump, re-validate and serialize them against response_model.
+    verses = service.get_flashcards(limit=n)
+    validated = VERSES.validate_python([v.model_dump() for v in verses])
+    return json.dumps(VERSES.dump_python(validated, mode="json")).encode()
+
+
+def fast_path(service: CMEService, n: int) -> bytes:
+    return service.get_flashcards_json(limit=n)
+
+
+def bench(fn, service, n: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(service, n)
+        best = min(best, time.perf_counter() - started)
+    return n / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark /flashcards serialization paths."
+    )
+    parser.add_argument(
+        "--cards", type=int, default=10_000, help="Due cards in the deck."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per path (best is reported)."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        review_db.DB_PATH = os.path.join(tmp, "bench.db")
+        db = review_db.connect()
+        try:
+            migrations.migrate(db)
+            seed(db, args.cards)
+            service = CMEService(db)
+            assert json.loads(models_path(service, args.cards)) == json.loads(
+                fast_path(service, args.cards)
+            )
+            before = bench(models_path, service, args.cards, args.repeat)
+            after = bench(fast_path, service, args.cards, args.repeat)
+        finally:
+            db.close()
+
+    print(f"{args.cards} due cards")
+    print(f"  models + response_model: {before:>12,.0f} rows/s")
+    print(f"  pre-serialized JSON:     {after:>12,.0f} rows/s  ({after / before:.1f}x)")
@@ -0,0 +1,86 @@
+"""Benchmark HawkesForecaster.forecast: per-timestep rescans vs. the kernel recursion."""
+
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.forecasters.hawkes import HawkesForecaster  # noqa: E402
+
+
+def rescan_forecast(
+    forecaster: HawkesForecaster, events: List[float], horizon: int
+) -> List[float]:
+    # What forecast did before: filter and exponentiate every event at every timestep.
+    times = np.arange(1, horizon + 1)
+    intensity = np.full_like(times, forecaster.baseline, dtype=float)
+    past_events = np.array(events)
+    for t in times:
+        relevant_events = past_events[past_events < t]
+        if relevant_events.size > 0:
+            intensity[t - 1] += forecaster.alpha * np.sum(
+                np.exp(-forecaster.beta * (t - relevant_events))
+            )
+    return (1 - np.exp(-intensity)).tolist()
+
+
+def recursive_forecast(
+    forecaster: HawkesForecaster, events: List[float], horizon: int
+) -> List[float]:
+    return forecaster.forecast(events, horizon)
+
+
+def bench(fn, forecaster, events, horizon: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(forecaster, events, horizon)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark HawkesForecaster.forecast across event counts."
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1_000, 10_000, 100_000],
+        help="Event counts to try.",
+    )
+    parser.add_argument(
+        "--horizon", type=int, default=365, help="Forecast horizon in timesteps."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs per path (best is reported)."
+    )
+    args = parser.parse_args()
+
+    forecaster = HawkesForecaster()
+    rng = np.random.default_rng(0)
+    print(f"horizon {args.horizon}")
+    print(
+        f"{'events':>10} {'rescan':>12} {'recursive':>12} {'speedup':>9} {'max |diff|':>11}"
+    )
+    for n in args.events:
+        events = np.sort(rng.uniform(-args.horizon, args.horizon, n)).tolist()
+        before = rescan_forecast(forecaster, events, args.horizon)
+        after = recursive_forecast(forecaster, events, args.horizon)
+        diff = (
+            float(np.max(np.abs(np.subtract(before, after)))) if args.horizon else 0.0
+        )
+        t_before = bench(rescan_forecast, forecaster, events, args.horizon, args.repeat)
+        t_after = bench(
+            recursive_forecast, forecaster, events, args.horizon, args.repeat
+        )
+        print(
+            f"{n:>10,} {t_before * 1000:>10.2f}ms {t_after * 1000:>10.3f}ms "
+            f"{t_before / t_after:>8.0f}x {diff:>11.1e}"
+        )
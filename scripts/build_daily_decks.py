@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import daily_deck  # noqa: E402
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+
+
+def run_build(day: str, users, rebuild: bool) -> None:
+    """
+    Snapshots the day's deck for every user with cards due (or the given
+    users), so the first session request of the day does not build it.
+    """
+    started = time.perf_counter()
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        decks, cards = daily_deck.build_decks(db, day, users=users, rebuild=rebuild)
+    finally:
+        db.close()
+    print(
+        f"Built {decks} decks ({cards} cards) for {day} in {time.perf_counter() - started:.2f}s."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the materialized daily decks, e.g. from cron at midnight UTC."
+    )
+    parser.add_argument(
+        "--day",
+        type=date.fromisoformat,
+        help="Deck day as YYYY-MM-DD (default: today, UTC).",
+    )
+    parser.add_argument(
+        "--user",
+        action="append",
+        dest="users",
+        help="Only build this user's deck (repeatable).",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild decks that already exist for the day.",
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_build(
+        (args.day or date.fromisoformat(daily_deck.today())).isoformat(),
+        args.users,
+        args.rebuild,
+    )
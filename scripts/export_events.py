@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+from src.event_log import DEFAULT_CHUNK_SIZE, export_events  # noqa: E402
+
+
+def run_export(out_dir: str, chunk_size: int, compress: bool) -> None:
+    """
+    Streams review_events into columnar .npz parts under out_dir.
+    """
+    started = time.perf_counter()
+
+    def report_progress(report):
+        elapsed = time.perf_counter() - started
+        print(f"  {report.events} events in {report.parts} parts ({elapsed:.1f}s)")
+
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        report = export_events(
+            db,
+            out_dir,
+            chunk_size=chunk_size,
+            compress=compress,
+            progress=report_progress,
+        )
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Exported {report.events} events ({report.users} users, {report.verses} verses) "
+        f"in {report.parts} parts to {out_dir} in {elapsed:.2f}s."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the review event log as columnar NumPy files."
+    )
+    parser.add_argument(
+        "out_dir", help="Directory for part-*.npz, users.npy and verses.npy."
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Events per part file.",
+    )
+    parser.add_argument(
+        "--no-compress", action="store_true", help="Write uncompressed .npz parts."
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_export(args.out_dir, args.chunk_size, not args.no_compress)
@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import hawkes_params, hawkes_state, migrations  # noqa: E402
+from src.forecasters.hawkes import DEFAULT_PRIOR_SCALE  # noqa: E402
+
+
+def run_fit(args) -> None:
+    """
+    Fits the pooled prior and every user's Hawkes parameters from
+    review_events, stores them in hawkes_params for /forecast and rebuilds
+    the per-user intensity states under them.
+    """
+    started = time.perf_counter()
+
+    def report_progress(report):
+        elapsed = time.perf_counter() - started
+        print(f"  {report.users} users, {report.events} events ({elapsed:.1f}s)")
+
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        report = hawkes_params.fit_all(
+            db,
+            now=args.now,
+            pool_sample=args.pool_sample,
+            prior_scale=args.prior_scale,
+            batch_size=args.batch_size,
+            progress=report_progress,
+        )
+        # The running intensity states depend on the refitted decay rates
+        with review_db.write_transaction(db):
+            hawkes_state.rebuild(db)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    prior = (
+        ", ".join(f"{name}={value:.4g}" for name, value in report.prior.items())
+        or "none"
+    )
+    print(
+        f"Fitted {report.users} users ({report.events} events) in {elapsed:.2f}s; population prior: {prior}."
+    )
+    if report.prior_at_bound or report.users_at_bound:
+        print(
+            f"Held at a parameter bound: {report.users_at_bound} users"
+            + (" and the population prior" if report.prior_at_bound else "")
+            + " (histories too bursty for a stationary fit, or too sparse to pin down)."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fit Hawkes forecaster parameters per user by maximum likelihood."
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--now",
+        type=datetime.fromisoformat,
+        help="End of the observation window, ISO 8601 (default: now, UTC).",
+    )
+    parser.add_argument(
+        "--pool-sample",
+        type=int,
+        default=hawkes_params.DEFAULT_POOL_SAMPLE,
+        help="Users the population prior is fitted on.",
+    )
+    parser.add_argument(
+        "--prior-scale",
+        type=float,
+        default=DEFAULT_PRIOR_SCALE,
+        help="Prior std. dev. in log-parameter space.",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Users fitted per transaction."
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_fit(args)
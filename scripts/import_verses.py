@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+from src.verse_import import (  # noqa: E402
+    DEFAULT_CHUNK_SIZE,
+    import_verses,
+    iter_ndjson,
+    iter_yaml,
+)
+
+
+def detect_format(file_path: str) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    return "yaml" if ext in (".yaml", ".yml") else "ndjson"
+
+
+def run_import(file_path: str, file_format: str, chunk_size: int) -> None:
+    """
+    Streams verses from a YAML or NDJSON file into the verses table.
+    """
+    started = time.perf_counter()
+
+    def report_progress(report):
+        elapsed = time.perf_counter() - started
+        print(f"  {report.imported} imported, {report.failed} failed ({elapsed:.1f}s)")
+
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        with open(file_path, "rb") as f:
+            items = iter_yaml(file_path) if file_format == "yaml" else iter_ndjson(f)
+            report = import_verses(
+                items, db=db, chunk_size=chunk_size, progress=report_progress
+            )
+    except FileNotFoundError:
+        print(f"Error: File not found at '{file_path}'")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    for error in report.errors:
+        print(
+            f"Error in object at index {error['index']} (verse_id: {error['verse_id'] or 'N/A'}):"
+        )
+        print(error["error"])
+    elapsed = time.perf_counter() - started
+    print(
+        f"Imported {report.imported} verses in {elapsed:.2f}s ({report.failed} failed)."
+    )
+    if report.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk-import verses from a YAML or NDJSON file."
+    )
+    parser.add_argument(
+        "file_path", type=str, help="The YAML (.yaml/.yml) or NDJSON file to import."
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["yaml", "ndjson"],
+        help="Input format (default: from the file extension).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Verses written per transaction.",
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_import(
+        args.file_path, args.format or detect_format(args.file_path), args.chunk_size
+    )
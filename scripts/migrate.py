@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+
+
+def show_status(db) -> None:
+    version = migrations.current_version(db)
+    print(f"Schema version: {version} (latest: {migrations.LATEST_VERSION})")
+    pending = migrations.pending(db)
+    if not pending:
+        print("No pending migrations.")
+        return
+    print("Pending migrations:")
+    for migration in pending:
+        print(f"  {migration.version}: {migration.description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show or apply Sanctum schema migrations."
+    )
+    parser.add_argument(
+        "command",
+        choices=["status", "apply"],
+        help="'status' lists pending migrations; 'apply' runs them.",
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--target",
+        type=int,
+        default=migrations.LATEST_VERSION,
+        help="Migrate up to this version.",
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    db = review_db.connect()
+    try:
+        if args.command == "apply":
+            applied = migrations.migrate(db, target=args.target)
+            if not applied:
+                print("Database already up to date.")
+        show_status(db)
+    finally:
+        db.close()
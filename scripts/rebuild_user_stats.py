@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import migrations, user_stats  # noqa: E402
+
+
+def run_rebuild() -> None:
+    """
+    Recomputes the user_stats rollup from verse_reviews and review_events in
+    one transaction; readers see either the old or the new table.
+    """
+    started = time.perf_counter()
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        with review_db.write_transaction(db):
+            users = user_stats.rebuild(db)
+    finally:
+        db.close()
+    print(f"Rebuilt stats for {users} users in {time.perf_counter() - started:.2f}s.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recompute the per-user review stats rollup from scratch."
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_rebuild()
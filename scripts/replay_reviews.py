@@ -0,0 +1,112 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import daily_deck, migrations, user_stats  # noqa: E402
+from src.replay import (  # noqa: E402
+    DEFAULT_SHARD_EVENTS,
+    ExportSource,
+    TableSource,
+    run_replay,
+)
+
+
+def run(args) -> None:
+    """
+    Rebuilds verse_reviews from review_events (or an exported event log),
+    resuming a previous run with the same --run-id.
+    """
+    started = time.perf_counter()
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        if args.restart:
+            with db.conn:
+                db.execute(
+                    "DELETE FROM replay_checkpoints WHERE run_id = ?", [args.run_id]
+                )
+    finally:
+        db.close()
+
+    if args.from_export:
+        source = ExportSource(args.from_export, shard_count=args.shards)
+    else:
+        source = TableSource(args.db, shard_events=args.shard_events)
+
+    def report_progress(report):
+        elapsed = time.perf_counter() - started
+        print(
+            f"  {report.shards} shards, {report.events} events, {report.states} states ({elapsed:.1f}s)"
+        )
+
+    report = run_replay(
+        args.db,
+        source,
+        run_id=args.run_id,
+        workers=args.workers,
+        progress=report_progress,
+    )
+    # Replayed states bypass the incremental stats rollup and daily decks
+    db = review_db.connect()
+    try:
+        with review_db.write_transaction(db):
+            user_stats.rebuild(db)
+            daily_deck.invalidate(db)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Replayed {report.events} events into {report.states} review states "
+        f"({report.shards} shards, {report.skipped} already done) in {elapsed:.2f}s."
+    )
+    print(
+        "Restart the CME service so its in-memory due heaps pick up the new due dates."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild SM-2 review state from the recorded review history.",
+        epilog="A running CME service caches each user's due heap (/users/{id}/next) in memory and keeps "
+        "serving the old due dates: restart it after a run.",
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--from-export",
+        metavar="DIR",
+        help="Replay an export from scripts/export_events.py instead of review_events.",
+    )
+    parser.add_argument(
+        "--run-id",
+        default="replay",
+        help="Checkpoint name; rerunning with the same id resumes.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Forget the checkpoints of this run id first.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes."
+    )
+    parser.add_argument(
+        "--shard-events",
+        type=int,
+        default=DEFAULT_SHARD_EVENTS,
+        help="Events per shard (table source).",
+    )
+    parser.add_argument(
+        "--shards", type=int, default=16, help="Number of shards (export source)."
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run(args)
@@ -0,0 +1,130 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import daily_deck, migrations, user_stats  # noqa: E402
+from src.algorithms.sm2 import update_sm2_batch  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 50000
+
+_CHUNK_SQL = """
+SELECT user_id, verse_id, ease_factor, repetition_count, interval
+FROM verse_reviews
+WHERE (user_id, verse_id) > (?, ?)
+ORDER BY user_id, verse_id
+LIMIT ?
+"""
+
+
+def reschedule_chunk(rows, quality: int, now: datetime):
+    """Apply one SM-2 review of ``quality`` to every row; returns review states."""
+    ease = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    reps = np.fromiter((r[3] for r in rows), dtype=np.int64, count=len(rows))
+    interval = np.fromiter((r[4] for r in rows), dtype=np.int64, count=len(rows))
+    updated = update_sm2_batch(ease, reps, interval, quality, now=now)
+    return [
+        {
+            "user_id": row[0],
+            "verse_id": row[1],
+            "ease_factor": float(e),
+            "repetition_count": int(n),
+            "interval": int(i),
+            "next_due": d,
+        }
+        for row, e, n, i, d in zip(
+            rows,
+            updated["easiness_factor"],
+            updated["repetitions"],
+            updated["interval"],
+            updated["next_due"].astype(object),
+        )
+    ]
+
+
+def run_reschedule(quality: int, now: datetime, chunk_size: int, dry_run: bool) -> None:
+    """
+    Walks verse_reviews in primary-key order and rewrites each chunk in one
+    transaction, so memory stays bounded by the chunk size.
+    """
+    started = time.perf_counter()
+    db = review_db.connect()
+    try:
+        migrations.migrate(db)
+        after = ("", "")
+        total = 0
+        while True:
+            rows = db.execute(_CHUNK_SQL, [*after, chunk_size]).fetchall()
+            if not rows:
+                break
+            states = reschedule_chunk(rows, quality, now)
+            if not dry_run:
+                with review_db.write_transaction(db):
+                    review_db.save_review_states(states, db=db)
+            total += len(rows)
+            after = (rows[-1][0], rows[-1][1])
+            elapsed = time.perf_counter() - started
+            print(f"  {total} review states rescheduled ({elapsed:.1f}s)")
+        if not dry_run:
+            # Rescheduled states bypass the incremental stats rollup and daily decks
+            with review_db.write_transaction(db):
+                user_stats.rebuild(db)
+                daily_deck.invalidate(db)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    verb = "Would reschedule" if dry_run else "Rescheduled"
+    print(f"{verb} {total} review states in {elapsed:.2f}s.")
+    if not dry_run:
+        print(
+            "Restart the CME service so its in-memory due heaps pick up the new due dates."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Apply an SM-2 review of a fixed quality to every row of verse_reviews.",
+        epilog="A running CME service caches each user's due heap (/users/{id}/next) in memory and keeps "
+        "serving the old due dates: restart it after a run.",
+    )
+    parser.add_argument(
+        "--quality",
+        type=int,
+        required=True,
+        choices=range(6),
+        help="Recall quality to apply (0-5).",
+    )
+    parser.add_argument(
+        "--now",
+        type=datetime.fromisoformat,
+        help="Review time as ISO 8601 (default: now, UTC).",
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Review states per transaction.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute the new states without writing them.",
+    )
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_reschedule(
+        args.quality, args.now or datetime.utcnow(), args.chunk_size, args.dry_run
+    )
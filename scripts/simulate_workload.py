@@ -0,0 +1,176 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import db as review_db  # noqa: E402
+from src import migrations  # noqa: E402
+from src.algorithms.workload import (  # noqa: E402
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_QUALITY_PROBS,
+    QualityModel,
+    iter_review_cards,
+    simulate_workload,
+    synthetic_cards,
+)
+
+
+def parse_probs(value: str):
+    probs = [float(p) for p in value.split(",")]
+    if len(probs) != 6:
+        raise argparse.ArgumentTypeError(
+            "expected six comma-separated probabilities (q = 0..5)"
+        )
+    return probs
+
+
+def iter_batches(args, start: datetime):
+    if not args.skip_db:
+        db = review_db.connect()
+        try:
+            migrations.migrate(db)
+            yield from iter_review_cards(db, start, chunk_size=args.chunk_size)
+        finally:
+            db.close()
+    if args.users:
+        yield synthetic_cards(
+            args.users, args.cards_per_user, args.new_per_day, args.join_days
+        )
+
+
+def simulate(args, start: datetime, load_balance: bool):
+    started = time.perf_counter()
+    result = simulate_workload(
+        iter_batches(args, start),
+        args.days,
+        QualityModel(args.quality_probs),
+        seed=args.seed,
+        load_balance=load_balance,
+    )
+    return result, time.perf_counter() - started
+
+
+def summary(label: str, result, elapsed: float) -> str:
+    return (
+        f"{label}{result.total} reviews over {len(result.reviews)} days in {elapsed:.2f}s: "
+        f"mean {result.mean:.0f}/day, peak {result.peak}/day (peak-to-mean {result.peak_to_mean:.2f})."
+    )
+
+
+def run_simulation(args) -> None:
+    """
+    Projects reviews per day for the current verse_reviews population plus
+    any synthetic new users, and writes the histogram as CSV. With
+    --compare, also runs the load-balanced schedule and reports both.
+    """
+    start = (args.start or datetime.utcnow()).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    result, elapsed = simulate(args, start, args.load_balance)
+
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["day", "date", "reviews"])
+        for day, reviews in enumerate(result.reviews):
+            writer.writerow(
+                [day, (start + timedelta(days=day)).date().isoformat(), int(reviews)]
+            )
+    finally:
+        if args.out:
+            out.close()
+
+    if not args.compare:
+        print(summary("Simulated ", result, elapsed), file=sys.stderr)
+        return
+    runs = {
+        args.load_balance: (result, elapsed),
+        not args.load_balance: simulate(args, start, not args.load_balance),
+    }
+    (plain, plain_elapsed), (balanced, balanced_elapsed) = runs[False], runs[True]
+    print(summary("Plain SM-2:    ", plain, plain_elapsed), file=sys.stderr)
+    print(summary("Load-balanced: ", balanced, balanced_elapsed), file=sys.stderr)
+    if plain.peak_to_mean:
+        reduction = 1 - balanced.peak_to_mean / plain.peak_to_mean
+        print(
+            f"Peak-to-mean reduced by {reduction:.1%}; peak reduced by {1 - balanced.peak / plain.peak:.1%}.",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Project daily review volume for capacity planning."
+    )
+    parser.add_argument("--days", type=int, default=90, help="Days to simulate.")
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        help="First simulated day (default: today, UTC).",
+    )
+    parser.add_argument(
+        "--db",
+        default=review_db.DB_PATH,
+        help="Path to the SQLite database (default: data/sanctum.db).",
+    )
+    parser.add_argument(
+        "--skip-db",
+        action="store_true",
+        help="Ignore the existing verse_reviews population.",
+    )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=0,
+        help="Synthetic new users to add to the population.",
+    )
+    parser.add_argument(
+        "--cards-per-user",
+        type=int,
+        default=500,
+        help="Cards each synthetic user will learn.",
+    )
+    parser.add_argument(
+        "--new-per-day",
+        type=int,
+        default=20,
+        help="New cards each synthetic user starts per day.",
+    )
+    parser.add_argument(
+        "--join-days",
+        type=int,
+        default=1,
+        help="Spread synthetic users' start over this many days.",
+    )
+    parser.add_argument(
+        "--load-balance",
+        action="store_true",
+        help="Simulate the load-balanced due-date mode.",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Report plain vs. load-balanced peak-to-mean.",
+    )
+    parser.add_argument(
+        "--quality-probs",
+        type=parse_probs,
+        default=list(DEFAULT_QUALITY_PROBS),
+        help="Comma-separated probabilities of recall quality 0..5.",
+    )
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs.")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Review states loaded per batch.",
+    )
+    parser.add_argument("--out", help="Write the CSV here instead of stdout.")
+    args = parser.parse_args()
+
+    review_db.DB_PATH = args.db
+    run_simulation(args)
@@ -0,0 +1,80 @@
+"""Spread SM-2 due dates over a small window to flatten daily review peaks.
+
+Plain SM-2 intervals are deterministic, so cards learned together come due
+together and load arrives in spikes. In load-balanced mode a card's interval
+may move within a fuzz window around the SM-2 interval, onto the day with
+the fewest reviews already scheduled. Short intervals are left alone.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Mapping, Tuple
+
+import numpy as np
+
+LOAD_BALANCE = os.getenv("SANCTUM_LOAD_BALANCE", "0") == "1"
+# Window half-width as a fraction of the interval, capped at MAX_FUZZ_DAYS.
+FUZZ_FRACTION = float(os.getenv("SANCTUM_LOAD_BALANCE_FUZZ", "0.1"))
+MAX_FUZZ_DAYS = int(os.getenv("SANCTUM_LOAD_BALANCE_MAX_DAYS", "7"))
+# Intervals shorter than this are never moved.
+MIN_INTERVAL = 3
+
+
+def fuzz_window(
+    interval: int, fraction: float = FUZZ_FRACTION, max_days: int = MAX_FUZZ_DAYS
+) -> Tuple[int, int]:
+    """Smallest and largest interval a card due in ``interval`` days may move to."""
+    if interval < MIN_INTERVAL:
+        return interval, interval
+    fuzz = min(max_days, max(1, round(interval * fraction)))
+    return max(1, interval - fuzz), interval + fuzz
+
+
+def pick_interval(
+    interval: int,
+    user_load: Mapping[int, int],
+    global_load: Mapping[int, int],
+    fraction: float = FUZZ_FRACTION,
+    max_days: int = MAX_FUZZ_DAYS,
+) -> int:
+    """Choose the interval in the fuzz window with the lightest load.
+
+    Loads map an interval (days from now) to reviews already scheduled that
+    day. The user's own load decides first, then the server-wide load, then
+    closeness to the SM-2 interval.
+    """
+    low, high = fuzz_window(interval, fraction, max_days)
+    return min(
+        range(low, high + 1),
+        key=lambda days: (
+            user_load.get(days, 0),
+            global_load.get(days, 0),
+            abs(days - interval),
+            days,
+        ),
+    )
+
+
+def water_fill(load: np.ndarray, count: int, ideal: int) -> np.ndarray:
+    """Spread ``count`` cards over days with the given loads, lowest first.
+
+    Returns how many cards go to each day so the busiest touched day is as
+    light as possible; ties favour days closest to index ``ideal``. This is
+    :func:`pick_interval`'s rule applied to a whole group of cards at once.
+    """
+    load = np.asarray(load, dtype=np.int64)
+    allocation = np.zeros(len(load), dtype=np.int64)
+    if count <= 0 or not len(load):
+        return allocation
+    order = np.lexsort((np.abs(np.arange(len(load)) - ideal), load))
+    levels = load[order]
+    prefix = np.cumsum(levels)
+    # Cards needed to lift the first j + 1 days up to the level of day j
+    needed = np.arange(1, len(load) + 1) * levels - prefix
+    filled = int(np.searchsorted(needed, count, side="left"))
+    level = (count + prefix[filled - 1]) // filled
+    shares = level - levels[:filled]
+    shares[: count - int(shares.sum())] += 1
+    allocation[order[:filled]] = shares
+    return allocation
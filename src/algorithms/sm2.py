@@ -1,7 +1,12 @@
 from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 
-def update_sm2_stats(ease: float, reps: int, interval: int, q: int) -> dict:
+
+def update_sm2_stats(
+    ease: float, reps: int, interval: int, q: int, now: Optional[datetime] = None
+) -> dict:
     """Update spaced repetition statistics using the SM-2 algorithm.
 
     Args:
@@ -9,6 +14,7 @@ def update_sm2_stats(ease: float, reps: int, interval: int, q: int) -> dict:
         reps: Number of successful repetitions so far.
         interval: Current interval in days.
         q: Quality of recall from 0 (complete blackout) to 5 (perfect).
+        now: Time of the review (default: ``datetime.utcnow()``).
 
     Returns:
         dict with updated ``easiness_factor``, ``repetitions``, ``interval`` and
@@ -35,7 +41,9 @@ def update_sm2_stats(ease: float, reps: int, interval: int, q: int) -> dict:
     if ease < 1.3:
         ease = 1.3
 
-    next_due = datetime.utcnow() + timedelta(days=interval)
+    if now is None:
+        now = datetime.utcnow()
+    next_due = now + timedelta(days=interval)
 
     return {
         "easiness_factor": ease,
@@ -45,6 +53,62 @@ def update_sm2_stats(ease: float, reps: int, interval: int, q: int) -> dict:
     }
 
 
+# Ease adjustment per quality, computed exactly as update_sm2_stats does.
+_EASE_DELTA = np.array([0.1 - (5 - q) * (0.08 + (5 - q) * 0.02) for q in range(6)])
+
+
+def sm2_arrays(
+    ease: np.ndarray, reps: np.ndarray, interval: np.ndarray, q: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Array core of :func:`update_sm2_batch`, without due dates.
+
+    Mirrors :func:`update_sm2_stats` operation for operation (``np.rint``
+    rounds half to even, like ``round``), so results are bit-for-bit equal.
+    Inputs broadcast against each other; ``q`` is not validated here.
+    """
+    ease = np.asarray(ease, dtype=np.float64)
+    reps = np.asarray(reps, dtype=np.int64)
+    interval = np.asarray(interval, dtype=np.int64)
+    q = np.asarray(q, dtype=np.int64)
+
+    failed = q <= 2
+    new_reps = np.where(failed, 0, reps + 1)
+    new_interval = np.rint(interval * ease).astype(np.int64)
+    new_interval[new_reps == 2] = 6
+    new_interval[new_reps <= 1] = 1
+    new_ease = np.maximum(ease + _EASE_DELTA[q], 1.3)
+    return new_ease, new_reps, new_interval
+
+
+def update_sm2_batch(
+    ease: np.ndarray,
+    reps: np.ndarray,
+    interval: np.ndarray,
+    q: np.ndarray,
+    now: Optional[datetime] = None,
+) -> Dict[str, np.ndarray]:
+    """Vectorized :func:`update_sm2_stats` over NumPy arrays.
+
+    Element ``i`` of the result equals ``update_sm2_stats(ease[i], reps[i],
+    interval[i], q[i], now)``. ``next_due`` is a ``datetime64[us]`` array;
+    ``.astype(object)`` turns it back into ``datetime`` objects.
+    """
+    q = np.asarray(q, dtype=np.int64)
+    if ((q < 0) | (q > 5)).any():
+        raise ValueError("q rating must be between 0 and 5")
+    if now is None:
+        now = datetime.utcnow()
+
+    new_ease, new_reps, new_interval = sm2_arrays(ease, reps, interval, q)
+    next_due = np.datetime64(now, "us") + new_interval.astype("timedelta64[D]")
+    return {
+        "easiness_factor": new_ease,
+        "repetitions": new_reps,
+        "interval": new_interval,
+        "next_due": next_due,
+    }
+
+
 def update_sm2(verse: dict, quality: int):
     """Backward compatible wrapper around :func:`update_sm2_stats`."""
     stats = update_sm2_stats(
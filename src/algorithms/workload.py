@@ -0,0 +1,339 @@
+"""Project daily review volume for a population of SM-2 cards.
+
+Cards are held as parallel NumPy arrays of *cohorts*: distinct SM-2 states
+(ease, repetitions, interval, due day) with the number of cards in each.
+The simulation runs in review rounds rather than day by day: every round,
+each cohort still due inside the horizon is reviewed, its count is added to
+the per-day histogram, and it splits by a multinomial draw over recall
+qualities into up to six successor cohorts. Identical successors are merged
+again, so a population of identical users costs no more than one user and
+the work tracks the number of distinct states rather than cards x days.
+
+Users are assumed to clear everything due each day; an overdue card is
+reviewed on day 0.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import sqlite_utils
+
+from src.algorithms.load_balance import fuzz_window, water_fill
+from src.algorithms.sm2 import sm2_arrays
+
+# Probability of each recall quality 0-5 for a review.
+DEFAULT_QUALITY_PROBS = (0.03, 0.04, 0.08, 0.25, 0.35, 0.25)
+DEFAULT_CHUNK_SIZE = 500_000
+# Decimal places of ease kept when merging cohorts.
+EASE_RESOLUTION = 6
+
+
+@dataclass
+class Cards:
+    """Cohorts of cards sharing an SM-2 state.
+
+    ``due_day`` counts days from the simulation start; ``count`` is the
+    number of cards in each cohort.
+    """
+
+    ease: np.ndarray
+    reps: np.ndarray
+    interval: np.ndarray
+    due_day: np.ndarray
+    count: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.count.sum())
+
+    def select(self, index: np.ndarray) -> "Cards":
+        return Cards(
+            self.ease[index],
+            self.reps[index],
+            self.interval[index],
+            self.due_day[index],
+            self.count[index],
+        )
+
+    @staticmethod
+    def concat(parts: Sequence["Cards"]) -> "Cards":
+        return Cards(*(np.concatenate([getattr(p, f) for p in parts]) for f in _FIELDS))
+
+    def merged(self) -> "Cards":
+        """Collapse cohorts with identical states into one.
+
+        Ease is snapped to ``EASE_RESOLUTION`` first: the same quality
+        sequence applied in different orders leaves float noise in the last
+        bits, which would otherwise keep equivalent states apart.
+        """
+        self.ease = np.round(self.ease, EASE_RESOLUTION)
+        if len(self.count) < 2:
+            return self
+        columns = [
+            np.rint(self.ease * 10**EASE_RESOLUTION).astype(np.int64),
+            self.reps,
+            self.interval,
+            self.due_day,
+        ]
+        # Pack the state into one integer key when it fits: a single argsort
+        # is much cheaper than a lexsort over four columns.
+        key = np.zeros(len(self.count), dtype=np.int64)
+        capacity = 1
+        for column in columns:
+            low = int(column.min())
+            radix = int(column.max()) - low + 1
+            capacity *= radix
+            key = key * radix + (column - low)
+        if capacity < 2**62:
+            order = np.argsort(key)
+            key = key[order]
+            changed = key[1:] != key[:-1]
+        else:
+            order = np.lexsort(columns[::-1])
+            changed = np.zeros(len(order) - 1, dtype=bool)
+            for column in columns:
+                column = column[order]
+                changed |= column[1:] != column[:-1]
+        starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+        merged = self.select(order[starts])
+        merged.count = np.add.reduceat(self.count[order], starts)
+        return merged
+
+
+_FIELDS = ("ease", "reps", "interval", "due_day", "count")
+
+
+@dataclass
+class WorkloadResult:
+    reviews: np.ndarray  # reviews per day, indexed by day offset
+
+    @property
+    def total(self) -> int:
+        return int(self.reviews.sum())
+
+    @property
+    def peak(self) -> int:
+        return int(self.reviews.max()) if len(self.reviews) else 0
+
+    @property
+    def mean(self) -> float:
+        return float(self.reviews.mean()) if len(self.reviews) else 0.0
+
+    @property
+    def peak_to_mean(self) -> float:
+        return self.peak / self.mean if self.mean else 0.0
+
+
+class QualityModel:
+    """Samples recall qualities, optionally depending on the repetition count.
+
+    ``probs`` is either one distribution over qualities 0-5 or a table with
+    one row per repetition count; cards past the last row use the last row.
+    """
+
+    def __init__(self, probs: Sequence = DEFAULT_QUALITY_PROBS) -> None:
+        table = np.atleast_2d(np.asarray(probs, dtype=np.float64))
+        if table.shape[1] != 6 or (table < 0).any():
+            raise ValueError(
+                "quality probabilities need six non-negative entries per row"
+            )
+        self._probs = table / table.sum(axis=1, keepdims=True)
+
+    def split(
+        self, count: np.ndarray, reps: np.ndarray, rng: np.random.Generator
+    ) -> np.ndarray:
+        """Draw how many cards of each cohort recall at each quality; shape (cohorts, 6).
+
+        A multinomial draw per cohort, done as five vectorized conditional
+        binomials so reps-dependent probabilities need no per-row loop.
+        """
+        probs = self._probs[np.minimum(reps, len(self._probs) - 1)]
+        out = np.empty((len(count), 6), dtype=np.int64)
+        remaining = count.astype(np.int64)
+        tail = np.ones(len(count))
+        for q in range(5):
+            p = np.divide(probs[:, q], tail, out=np.ones(len(count)), where=tail > 0)
+            out[:, q] = rng.binomial(remaining, np.clip(p, 0.0, 1.0))
+            remaining -= out[:, q]
+            tail -= probs[:, q]
+        out[:, 5] = remaining
+        return out
+
+
+def synthetic_cards(
+    users: int, cards_per_user: int, new_per_day: int = 20, join_days: int = 1
+) -> Cards:
+    """A population of unseen cards, each user introducing ``new_per_day`` a day.
+
+    Users join evenly over the first ``join_days`` days; the default has
+    everyone start on day 0.
+    """
+    new_per_day = max(new_per_day, 1)
+    days = -(-cards_per_user // new_per_day)
+    per_day = np.full(days, new_per_day, dtype=np.int64)
+    if days:
+        per_day[-1] = cards_per_user - new_per_day * (days - 1)
+    join_days = max(min(join_days, users), 1)
+    joined = np.full(join_days, users // join_days, dtype=np.int64)
+    joined[: users % join_days] += 1
+    return Cards(
+        ease=np.full(days * join_days, 2.5),
+        reps=np.zeros(days * join_days, dtype=np.int64),
+        interval=np.zeros(days * join_days, dtype=np.int64),
+        due_day=np.add.outer(np.arange(join_days), np.arange(days)).ravel(),
+        count=np.outer(joined, per_day).ravel(),
+    )
+
+
+def iter_review_cards(
+    db: sqlite_utils.Database, start: datetime, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Cards]:
+    """Stream the current ``verse_reviews`` states as :class:`Cards` chunks."""
+    start64 = np.datetime64(start, "us")
+    after = ("", "")
+    while True:
+        rows = db.execute(
+            """
+            SELECT user_id, verse_id, ease_factor, repetition_count, interval, next_due
+            FROM verse_reviews
+            WHERE (user_id, verse_id) > (?, ?)
+            ORDER BY user_id, verse_id
+            LIMIT ?
+            """,
+            [*after, chunk_size],
+        ).fetchall()
+        if not rows:
+            return
+        after = (rows[-1][0], rows[-1][1])
+        _, _, ease, reps, interval, next_due = zip(*rows)
+        due = np.array(next_due, dtype="datetime64[us]")
+        yield Cards(
+            ease=np.array(ease, dtype=np.float64),
+            reps=np.array(reps, dtype=np.int64),
+            interval=np.array(interval, dtype=np.int64),
+            due_day=np.maximum((due - start64) // np.timedelta64(1, "D"), 0),
+            count=np.ones(len(rows), dtype=np.int64),
+        ).merged()
+
+
+def _balance(cards: Cards, day: int, load: np.ndarray) -> Cards:
+    """Move freshly reviewed cards within their fuzz windows onto light days,
+    adding them to ``load`` where they land.
+
+    Cards sharing an SM-2 interval share a window, so each group is spread
+    with :func:`water_fill` and its cohorts are cut along the allocation.
+    Groups whose window runs past the horizon keep their SM-2 due day: the
+    load there is unknown, and squeezing them into the days left would pile
+    them onto the end of the horizon.
+    """
+    horizon = len(load)
+    pieces = []
+    for interval in np.unique(cards.interval):
+        group = cards.select(cards.interval == interval)
+        low, high = fuzz_window(int(interval))
+        if low == high or day + high >= horizon:
+            inside = group.due_day < horizon
+            np.add.at(load, group.due_day[inside], group.count[inside])
+            pieces.append(group)
+            continue
+        allocation = water_fill(
+            load[day + low : day + high + 1],
+            int(group.count.sum()),
+            int(interval) - low,
+        )
+        # Cut the group's cards (in cohort order) into runs, one per window day
+        cohort_ends = np.cumsum(group.count)
+        day_ends = np.cumsum(allocation)
+        ends = np.union1d(cohort_ends, day_ends)
+        starts = np.concatenate(([0], ends[:-1]))
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        moved = group.select(np.searchsorted(cohort_ends, starts, side="right"))
+        moved.count = ends - starts
+        moved.interval = low + np.searchsorted(day_ends, starts, side="right")
+        moved.due_day = day + moved.interval
+        load[moved.due_day] += moved.count
+        pieces.append(moved)
+    return Cards.concat(pieces)
+
+
+def simulate_cards(
+    cards: Cards,
+    days: int,
+    quality: Optional[QualityModel] = None,
+    rng: Optional[np.random.Generator] = None,
+    load_balance: bool = False,
+) -> np.ndarray:
+    """Reviews per day over ``days`` days for one batch of card cohorts.
+
+    With ``load_balance`` each new due date is chosen like the service's
+    load-balanced mode does, against the load of this batch (cohorts carry
+    no user identity, so only the global load is balanced).
+    """
+    quality = quality or QualityModel()
+    rng = rng or np.random.default_rng()
+    reviews = np.zeros(days, dtype=np.int64)
+    # Cards scheduled per day, as the due histogram would show it
+    load = np.zeros(days, dtype=np.int64)
+    buckets: List[List[Cards]] = [[] for _ in range(days)]
+
+    def schedule(batch: Cards) -> None:
+        batch = batch.select(batch.due_day < days)
+        if not len(batch.count):
+            return
+        order = np.argsort(batch.due_day, kind="stable")
+        batch = batch.select(order)
+        bounds = np.flatnonzero(np.diff(batch.due_day)) + 1
+        for first, last in zip(
+            np.concatenate(([0], bounds)), np.concatenate((bounds, [len(order)]))
+        ):
+            buckets[batch.due_day[first]].append(batch.select(slice(first, last)))
+
+    cards = cards.select(slice(None))
+    cards.due_day = np.maximum(cards.due_day, 0)
+    if load_balance:
+        inside = cards.due_day < days
+        np.add.at(load, cards.due_day[inside], cards.count[inside])
+    schedule(cards)
+    for day in range(days):
+        if not buckets[day]:
+            continue
+        cards = Cards.concat(buckets[day]).merged()
+        buckets[day] = []
+        reviews[day] = cards.count.sum()
+        split = quality.split(cards.count, cards.reps, rng)
+        cohort, q = np.nonzero(split)
+        cards = cards.select(cohort)
+        cards.count = split[cohort, q]
+        cards.ease, cards.reps, cards.interval = sm2_arrays(
+            cards.ease, cards.reps, cards.interval, q
+        )
+        cards.due_day = day + cards.interval
+        if load_balance:
+            cards = _balance(cards.merged(), day, load)
+        else:
+            cards = cards.merged()
+        schedule(cards)
+    return reviews
+
+
+def simulate_workload(
+    batches: Iterable[Cards],
+    days: int,
+    quality: Optional[QualityModel] = None,
+    seed: Optional[int] = None,
+    load_balance: bool = False,
+) -> WorkloadResult:
+    """Sum the per-day review histogram over every batch of cards.
+
+    Batches are simulated independently, which keeps memory bounded when
+    streaming a large ``verse_reviews`` table.
+    """
+    rng = np.random.default_rng(seed)
+    reviews = np.zeros(days, dtype=np.int64)
+    for cards in batches:
+        reviews += simulate_cards(cards, days, quality, rng, load_balance)
+    return WorkloadResult(reviews=reviews)
@@ -1,79 +1,251 @@
-
 import os
 import sqlite_utils
 import json
-from fastapi import FastAPI, Depends, HTTPException, Header
+from dataclasses import asdict
+from enum import Enum
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from datetime import datetime, timedelta
 
 # Import the algorithm module
+from src.algorithms.load_balance import LOAD_BALANCE, fuzz_window, pick_interval
 from src.algorithms.sm2 import update_sm2, update_sm2_stats
+
 # Import the new DB module for reviews
 from src import db as review_db
+from src import daily_deck, hawkes_state, migrations, user_stats
+from src.hawkes_params import julian_day
+from src.review_buffer import WRITE_BEHIND, ReviewBuffer
+from src.scheduler import DueScheduler
+from src.schemas import Pivot, Verse, VerseProjection
+from src.verse_import import DEFAULT_CHUNK_SIZE, VerseImporter, iter_ndjson
 
 # --- Configuration ---
 API_KEY = os.getenv("SANCTUM_API_KEY")
 if not API_KEY:
     raise ValueError("SANCTUM_API_KEY environment variable not set.")
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sanctum.db')
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
 
 # --- Pydantic Models (DTOs) ---
-class Pivot(BaseModel):
-    type: str
-    center: Optional[str] = None
-    elements: Optional[List[str]] = []
-    score: Optional[float] = None
-    match_count: Optional[int] = None
-    depth: Optional[int] = None
-    total_words: Optional[int] = None
-    major_pivot: Optional[dict] = None
-    minor_pivot: Optional[dict] = None
-
-class Verse(BaseModel):
-    verse_id: str = Field(..., description="Canonical verse reference, e.g., 'John_3_16'")
-    text: str = Field(..., description="The full text of the scripture.")
-    covenant_tags: Optional[List[str]] = []
-    emotion_codes: Optional[List[str]] = []
-    notes: Optional[str] = ""
-    pivot: Optional[Pivot] = None
-    # SM-2 Spaced Repetition Fields (for general, non-user-specific reviews)
-    repetitions: int = 0
-    easiness_factor: float = 2.5
-    interval: int = 0  # in days
-    next_due: datetime = Field(default_factory=datetime.utcnow)
+class DueOrder(str, Enum):
+    due = "due"
+    priority = "priority"
+
+
+class DueCard(BaseModel):
+    """A verse due for a specific user, carrying that user's SM-2 state."""
+
+    verse_id: str
+    text: str
+    next_due: datetime
+    interval: int
+    ease_factor: float
+    repetition_count: int
+
+
+class NextCard(BaseModel):
+    verse_id: str
+    next_due: datetime
+    due: bool = Field(..., description="Whether the card is already due for review.")
+
+
+class DeckCard(DueCard):
+    position: int
+
+
+class DeckPage(BaseModel):
+    day: str = Field(..., description="UTC date the deck was built for.")
+    size: int = Field(..., description="Cards in the deck when it was built.")
+    remaining: int = Field(..., description="Cards not yet reviewed.")
+    items: List[DeckCard]
+    next_cursor: Optional[int] = Field(
+        None,
+        description="Pass as `after` to fetch the next page; null on the last page.",
+    )
+
+
+class UserStats(BaseModel):
+    user_id: str
+    reviews_today: int
+    total_reviews: int
+    lapses: int = Field(
+        ..., description="Failed reviews (q < 3) of cards that had been learned."
+    )
+    cards: int
+    mature_cards: int = Field(
+        ..., description="Cards with an interval of at least 21 days."
+    )
+    mean_ease: Optional[float] = None
+    retention_rate: Optional[float] = Field(
+        None, description="Share of reviews of learned cards recalled (q >= 3)."
+    )
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class Facets(BaseModel):
+    covenant_tags: List[FacetCount]
+    emotion_codes: List[FacetCount]
+
+
+class VersePage(BaseModel):
+    items: List[Verse]
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Pass as `after` to fetch the next page; null on the last page.",
+    )
 
 
 class VerseUpdate(BaseModel):
-    quality: int = Field(..., ge=0, le=5, description="Recall quality from 0 (complete blackout) to 5 (perfect).")
-
-
-# --- Database Setup ---
-def get_db():
-    db = sqlite_utils.Database(DB_PATH)
-    if "verses" not in db.table_names():
-        db["verses"].create({
-            "verse_id": str,
-            "text": str,
-            "covenant_tags": str,  # Stored as JSON string
-            "emotion_codes": str,  # Stored as JSON string
-            "notes": str,
-            "pivot": str,          # Stored as JSON string
-            "repetitions": int,
-            "easiness_factor": float,
-            "interval": int,
-            "next_due": datetime,
-        }, pk="verse_id")
-        print("Database table 'verses' created.")
-    # Simple migration: add pivot column if it doesn't exist
-    elif "pivot" not in db["verses"].columns_dict:
-        db["verses"].add_column("pivot", str)
-        print("Column 'pivot' added to 'verses' table.")
-    
-    return db
+    quality: int = Field(
+        ...,
+        ge=0,
+        le=5,
+        description="Recall quality from 0 (complete blackout) to 5 (perfect).",
+    )
+
+
+# Served by idx_verse_reviews_user_due (range scan, already in next_due order)
+# joined to verses on its primary key.
+DUE_FOR_USER_SQL = """
+SELECT r.verse_id, v.text, r.next_due, r.interval, r.ease_factor, r.repetition_count
+FROM verse_reviews AS r
+JOIN verses AS v ON v.verse_id = r.verse_id
+WHERE r.user_id = ? AND r.next_due < ?
+ORDER BY r.next_due
+LIMIT ?
+"""
+
+
+# Overdue backlog triage: top-k by the indexed priority_key (see migration 11)
+# instead of by next_due; idx_verse_reviews_user_priority is read in order and
+# the scan stops after ``limit`` due cards, so there is no sort.
+DUE_FOR_USER_BY_PRIORITY_SQL = """
+SELECT r.verse_id, v.text, r.next_due, r.interval, r.ease_factor, r.repetition_count
+FROM verse_reviews AS r
+JOIN verses AS v ON v.verse_id = r.verse_id
+WHERE r.user_id = ? AND r.next_due < ?
+ORDER BY r.priority_key, r.next_due
+LIMIT ?
+"""
+
+# Explicit column list: SELECT * would also return the generated priority_key.
+VERSE_SELECT = ", ".join(f"[{c}]" for c in review_db.VERSE_COLUMNS)
+
+
+def decode_verse_row(verse_row: dict) -> dict:
+    """Deserialize the JSON columns of a ``verses`` row in place."""
+    if verse_row.get("covenant_tags"):
+        verse_row["covenant_tags"] = json.loads(verse_row["covenant_tags"])
+    if verse_row.get("emotion_codes"):
+        verse_row["emotion_codes"] = json.loads(verse_row["emotion_codes"])
+
+    pivot_data = verse_row.get("pivot")
+    if pivot_data and pivot_data != "null":
+        verse_row["pivot"] = json.loads(pivot_data)
+    else:
+        verse_row["pivot"] = None
+    return verse_row
+
+
+def _due_verses_query(
+    limit: int,
+    tag: Optional[str] = None,
+    emotion: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    order: DueOrder = DueOrder.due,
+) -> Tuple[str, List]:
+    """
+    Builds the due-verses SELECT shared by the flashcard read paths, most
+    overdue first or, for ``DueOrder.priority``, by the indexed triage key.
+    """
+    now = datetime.utcnow()
+    # Using 'lt' because we want anything past due
+    where = ["next_due < ?"]
+    params: List = [now.isoformat()]
+    if tag is not None:
+        where.append("verse_id IN (SELECT verse_id FROM verse_tags WHERE tag = ?)")
+        params.append(tag)
+    if emotion is not None:
+        where.append(
+            "verse_id IN (SELECT verse_id FROM verse_emotions WHERE emotion = ?)"
+        )
+        params.append(emotion)
+    select = ", ".join(f"[{c}]" for c in columns) if columns else VERSE_SELECT
+    order_by = "priority_key, next_due" if order == DueOrder.priority else "next_due"
+    sql = f"SELECT {select} FROM verses WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT ?"
+    return sql, params + [limit]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parses a comma-separated ``fields=`` projection into Verse field names,
+    in request order without duplicates. Unknown names are rejected with 422.
+    """
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in Verse.model_fields]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}. "
+            f"Valid fields: {', '.join(Verse.model_fields)}",
+        )
+    return names
+
+
+def _json_value(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _stored_json(value) -> str:
+    # Written by json.dumps in verse_to_row, so it is emitted as-is.
+    return value if value else "null"
+
+
+def _json_int(value) -> str:
+    return "null" if value is None else str(int(value))
+
+
+def _json_float(value) -> str:
+    return "null" if value is None else repr(float(value))
+
+
+_VERSE_FIELD_ENCODERS = {
+    "verse_id": _json_value,
+    "text": _json_value,
+    "covenant_tags": _stored_json,
+    "emotion_codes": _stored_json,
+    "notes": _json_value,
+    "pivot": _stored_json,
+    "repetitions": _json_int,
+    "easiness_factor": _json_float,
+    "interval": _json_int,
+    "next_due": _json_value,
+}
+
+
+def encode_verse_rows(rows: Iterable[Sequence], fields: List[str]) -> bytes:
+    """Serializes ``verses`` rows (columns in ``fields`` order) as a JSON array of Verse objects."""
+    keys = [_json_value(f) + ":" for f in fields]
+    encoders = [_VERSE_FIELD_ENCODERS[f] for f in fields]
+    objects = [
+        "{"
+        + ",".join(
+            key + encode(value) for key, encode, value in zip(keys, encoders, row)
+        )
+        + "}"
+        for row in rows
+    ]
+    return ("[" + ",".join(objects) + "]").encode()
+
 
 # --- Service Class ---
 class CMEService:
@@ -81,8 +253,18 @@ class CMEService:
     Orchestrating service layer for the Covenant Memory Engine.
     Coordinates all workflows related to covenantal memory practice.
     """
-    def __init__(self, db: sqlite_utils.Database):
+
+    def __init__(
+        self,
+        db: sqlite_utils.Database,
+        review_buffer: Optional[ReviewBuffer] = None,
+        scheduler: Optional[DueScheduler] = None,
+        load_balance: Optional[bool] = None,
+    ):
         self.db = db
+        self.review_buffer = review_buffer
+        self.scheduler = scheduler
+        self.load_balance = LOAD_BALANCE if load_balance is None else load_balance
 
     def add_verse(self, verse: Verse):
         """
@@ -90,37 +272,152 @@ class CMEService:
         “Write them upon the table of thine heart.” (Prov 3:3 KJV)
         """
         # This method handles both creation and updates (upsert).
-        verse_dict = verse.model_dump()
-        # Serialize lists to JSON strings for storage
-        verse_dict["covenant_tags"] = json.dumps(verse.covenant_tags)
-        verse_dict["emotion_codes"] = json.dumps(verse.emotion_codes)
-        verse_dict["pivot"] = json.dumps(verse.pivot.model_dump()) if verse.pivot else None
-        
-        self.db["verses"].upsert(verse_dict, pk="verse_id")
+        review_db.upsert_verses([review_db.verse_to_row(verse)], db=self.db)
         return {"verse_id": verse.verse_id, "status": "created_or_updated"}
 
-    def get_flashcards(self, limit: int = 10) -> List[Verse]:
-        """Retrieves verses that are due for review."""
-        now = datetime.utcnow()
-        # Using 'lt' because we want anything past due
-        due_verses = self.db["verses"].rows_where("next_due < ?", [now.isoformat()], order_by="next_due", limit=limit)
-        
-        results = []
-        for verse_row in due_verses:
-            # Deserialize JSON strings back to lists
-            if verse_row.get('covenant_tags'):
-                verse_row['covenant_tags'] = json.loads(verse_row['covenant_tags'])
-            if verse_row.get('emotion_codes'):
-                verse_row['emotion_codes'] = json.loads(verse_row['emotion_codes'])
-            
-            pivot_data = verse_row.get('pivot')
-            if pivot_data and pivot_data != 'null':
-                verse_row['pivot'] = Pivot(**json.loads(pivot_data))
+    def get_flashcards(
+        self,
+        limit: int = 10,
+        tag: Optional[str] = None,
+        emotion: Optional[str] = None,
+        order: DueOrder = DueOrder.due,
+    ) -> List[Verse]:
+        """Retrieves verses that are due for review, optionally narrowed by covenant tag and/or emotion."""
+        sql, params = _due_verses_query(limit, tag, emotion, order=order)
+        due_verses = review_db.fetch_dicts(self.db.execute(sql, params))
+        return [Verse(**decode_verse_row(verse_row)) for verse_row in due_verses]
+
+    def get_flashcards_json(
+        self,
+        limit: int = 10,
+        tag: Optional[str] = None,
+        emotion: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        order: DueOrder = DueOrder.due,
+    ) -> bytes:
+        """
+        Same result as :meth:`get_flashcards`, already serialized as a JSON
+        array. The stored JSON columns are spliced in verbatim, so rows are
+        never decoded into models and re-validated on the way out.
+        ``fields`` (see :func:`parse_fields`) narrows both the SELECT and the
+        objects to those Verse fields.
+        """
+        columns = fields or review_db.VERSE_COLUMNS
+        sql, params = _due_verses_query(
+            limit, tag, emotion, columns=columns, order=order
+        )
+        return encode_verse_rows(self.db.execute(sql, params), columns)
+
+    def list_verses(self, after: Optional[str] = None, limit: int = 100) -> VersePage:
+        """
+        Pages through all verses in ``verse_id`` order. ``after`` is the
+        ``next_cursor`` of the previous page; each page is one primary-key
+        range scan, however deep into the table it starts.
+        """
+        if after is None:
+            cursor = self.db.execute(
+                f"SELECT {VERSE_SELECT} FROM verses ORDER BY verse_id LIMIT ?", [limit]
+            )
+        else:
+            cursor = self.db.execute(
+                f"SELECT {VERSE_SELECT} FROM verses WHERE verse_id > ? ORDER BY verse_id LIMIT ?",
+                [after, limit],
+            )
+        items = [
+            Verse(**decode_verse_row(row)) for row in review_db.fetch_dicts(cursor)
+        ]
+        next_cursor = items[-1].verse_id if len(items) == limit else None
+        return VersePage(items=items, next_cursor=next_cursor)
+
+    def get_facets(self, due_only: bool = False) -> Facets:
+        """Counts verses per covenant tag and per emotion code, most common first."""
+        facets = {}
+        for name, table, column in (
+            ("covenant_tags", "verse_tags", "tag"),
+            ("emotion_codes", "verse_emotions", "emotion"),
+        ):
+            if due_only:
+                sql = (
+                    f"SELECT j.{column}, COUNT(*) AS n FROM {table} AS j "
+                    "JOIN verses AS v ON v.verse_id = j.verse_id WHERE v.next_due < ? "
+                    f"GROUP BY j.{column} ORDER BY n DESC, j.{column}"
+                )
+                params = [datetime.utcnow().isoformat()]
             else:
-                verse_row['pivot'] = None
-                
-            results.append(Verse(**verse_row))
-        return results
+                sql = f"SELECT {column}, COUNT(*) AS n FROM {table} GROUP BY {column} ORDER BY n DESC, {column}"
+                params = []
+            facets[name] = [
+                FacetCount(value=value, count=n)
+                for value, n in self.db.execute(sql, params)
+            ]
+        return Facets(**facets)
+
+    def get_due_for_user(
+        self, user_id: str, limit: int = 10, order: DueOrder = DueOrder.due
+    ) -> List[DueCard]:
+        """
+        Retrieves the verses a user is due to review, most overdue first or,
+        for a returning user's backlog, by triage priority. In write-behind
+        mode buffered review states replace the stored ones.
+        """
+        now = datetime.utcnow().isoformat()
+        sql = (
+            DUE_FOR_USER_BY_PRIORITY_SQL
+            if order == DueOrder.priority
+            else DUE_FOR_USER_SQL
+        )
+        overlay = {
+            state["verse_id"]: state
+            for state in (
+                self.review_buffer.states_for_user(user_id)
+                if self.review_buffer
+                else ()
+            )
+        }
+        # Enough rows to fill the page once the buffered cards are dropped
+        rows = review_db.fetch_dicts(
+            self.db.execute(sql, [user_id, now, limit + len(overlay)])
+        )
+        if overlay:
+            rows = [row for row in rows if row["verse_id"] not in overlay]
+            rows.extend(self._buffered_due_rows(overlay.values(), now))
+            if order == DueOrder.priority:
+                # Same key as the priority_key column
+                rows.sort(
+                    key=lambda row: (
+                        julian_day(row["next_due"])
+                        + row["interval"] * row["ease_factor"],
+                        row["next_due"],
+                    )
+                )
+            else:
+                rows.sort(key=lambda row: row["next_due"])
+        return [DueCard(**row) for row in rows[:limit]]
+
+    def _buffered_due_rows(self, states: Iterable[dict], now: str) -> List[dict]:
+        """Buffered states still due at ``now``, shaped like DUE_FOR_USER_SQL rows."""
+        due = {s["verse_id"]: s for s in states if review_db._iso(s["next_due"]) < now}
+        if not due:
+            return []
+        texts = dict(
+            self.db.execute(
+                "SELECT verse_id, text FROM verses "
+                f"WHERE verse_id IN ({', '.join('?' for _ in due)})",
+                list(due),
+            )
+        )
+        return [
+            {
+                "verse_id": verse_id,
+                "text": texts[verse_id],
+                "next_due": review_db._iso(s["next_due"]),
+                "interval": s["interval"],
+                "ease_factor": s["ease_factor"],
+                "repetition_count": s["repetition_count"],
+            }
+            for verse_id, s in due.items()
+            if verse_id in texts
+        ]
 
     def review_verse(self, verse_id: str, quality: int):
         """
@@ -128,51 +425,230 @@ class CMEService:
         practicing line-upon-line recollection.
         This is a legacy, non-user-specific review endpoint.
         """
-        try:
-            # Fetch the verse from the database
-            verse_row = self.db["verses"].get(verse_id)
-        except sqlite_utils.db.NotFoundError:
+        # Fetch the verse from the database
+        rows = review_db.fetch_dicts(
+            self.db.execute(
+                f"SELECT {VERSE_SELECT} FROM verses WHERE verse_id = ?", [verse_id]
+            )
+        )
+        if not rows:
             raise HTTPException(status_code=404, detail="Verse not found")
-        
-        updated_verse_data = update_sm2(verse_row, quality)
+
+        updated_verse_data = update_sm2(rows[0], quality)
 
         # Update the verse record in the database
-        self.db["verses"].update(verse_id, updated_verse_data)
-        return {"verse_id": verse_id, "status": "review_recorded", "next_due": updated_verse_data["next_due"]}
+        with self.db.conn:
+            self.db.execute(
+                "UPDATE verses SET easiness_factor = ?, repetitions = ?, interval = ?, next_due = ? "
+                "WHERE verse_id = ?",
+                [
+                    updated_verse_data["easiness_factor"],
+                    updated_verse_data["repetitions"],
+                    updated_verse_data["interval"],
+                    updated_verse_data["next_due"].isoformat(),
+                    verse_id,
+                ],
+            )
+        return {
+            "verse_id": verse_id,
+            "status": "review_recorded",
+            "next_due": updated_verse_data["next_due"],
+        }
 
     def process_user_review(self, verse_id: str, user_id: str, q_rating: int):
         """
         Processes a user-specific review and updates their personal SM-2 stats.
         """
-        state = review_db.get_review_state(user_id, verse_id)
-        ease = state["ease_factor"] if state else 2.5
-        reps = state["repetition_count"] if state else 0
-        interval = state["interval"] if state else 0
+        return self.process_user_reviews([(user_id, verse_id, q_rating)])[0]
+
+    def process_user_reviews(self, reviews: List[Tuple[str, str, int]]) -> List[dict]:
+        """
+        Applies a sequence of ``(user_id, verse_id, q)`` reviews in order and
+        persists the resulting states with one UPSERT, and one review event
+        per review, in one transaction.
+
+        Repeated reviews of the same (user, verse) build on each other, as if
+        they had been submitted one at a time. In write-behind mode the states
+        go to the review buffer instead and reach the database in its next
+        group commit.
+        """
+        if self.review_buffer is not None:
+            with self.review_buffer.lock:
+                results, states, events = self._apply_reviews(reviews)
+                self.review_buffer.record(states.values(), events)
+                self._reschedule(states.values())
+            return results
+
+        with review_db.write_transaction(self.db):
+            results, states, events = self._apply_reviews(reviews)
+            review_db.save_review_states(states.values(), db=self.db)
+            review_db.append_review_events(events, db=self.db)
+            user_stats.apply_review_events(events, self.db)
+            hawkes_state.apply_review_events(events, self.db)
+            daily_deck.pop_cards(states.keys(), self.db)
+        self._reschedule(states.values())
+        return results
+
+    def _reschedule(self, states: Iterable[dict]) -> None:
+        if self.scheduler is not None:
+            for state in states:
+                self.scheduler.update(
+                    state["user_id"], state["verse_id"], state["next_due"]
+                )
+
+    def get_next_card(self, user_id: str) -> NextCard:
+        """
+        Returns the user's earliest-due card from the in-memory scheduler
+        (hydrated from the database on first access).
+        """
+        # Not ``or``: an empty scheduler is falsy
+        scheduler = self.scheduler if self.scheduler is not None else DueScheduler()
+        overlay = (
+            self.review_buffer.states_for_user(user_id) if self.review_buffer else ()
+        )
+        card = scheduler.next_card(user_id, self.db, overlay)
+        if card is None:
+            raise HTTPException(
+                status_code=404, detail="No cards scheduled for this user"
+            )
+        verse_id, next_due = card
+        return NextCard(
+            verse_id=verse_id,
+            next_due=next_due,
+            due=next_due < datetime.utcnow().isoformat(),
+        )
 
-        new_stats = update_sm2_stats(ease, reps, interval, q_rating)
+    def get_deck(
+        self, user_id: str, after: Optional[int] = None, limit: int = 20
+    ) -> DeckPage:
+        """
+        Pages through the user's deck for today, snapshotted on the first
+        request of the day; reviewed cards drop out, the order never changes.
+        ``after`` is the ``next_cursor`` of the previous page.
+        """
+        overlay = (
+            self.review_buffer.states_for_user(user_id) if self.review_buffer else ()
+        )
+        deck, rows = daily_deck.get_page(
+            user_id, self.db, after=after, limit=limit, overlay=overlay
+        )
+        items = [DeckCard(**row) for row in rows]
+        next_cursor = items[-1].position if len(items) == limit else None
+        return DeckPage(**deck, items=items, next_cursor=next_cursor)
 
-        review_db.save_review_state(
-            user_id,
-            verse_id,
+    def get_user_stats(self, user_id: str) -> UserStats:
+        """
+        Returns the user's review statistics from the incrementally maintained
+        rollup (in write-behind mode it trails buffered reviews until flush).
+        """
+        stats = user_stats.get_user_stats(user_id, self.db)
+        if stats is None:
+            raise HTTPException(
+                status_code=404, detail="No reviews recorded for this user"
+            )
+        return UserStats(**stats)
+
+    def _review_state(self, user_id: str, verse_id: str) -> Optional[dict]:
+        if self.review_buffer is not None:
+            state = self.review_buffer.get(user_id, verse_id)
+            if state is not None:
+                return state
+        return review_db.get_review_state(user_id, verse_id, db=self.db)
+
+    def _balanced_interval(
+        self, user_id: str, interval: int, now: datetime, booked: Counter
+    ) -> int:
+        """
+        Moves an SM-2 interval within its fuzz window onto the day with the
+        fewest reviews due, for this user first and then server-wide. Loads
+        come from the due histograms (in write-behind mode they trail the
+        buffered reviews until the next flush).
+        """
+        low, high = fuzz_window(interval)
+        if low == high:
+            return interval
+        days = {
+            i: (now + timedelta(days=i)).date().isoformat()
+            for i in range(low, high + 1)
+        }
+        user_counts, global_counts = review_db.get_due_counts(
+            user_id, days[low], days[high], db=self.db
+        )
+        chosen = pick_interval(
+            interval,
+            {
+                i: user_counts.get(day, 0) + booked[user_id, day]
+                for i, day in days.items()
+            },
             {
+                i: global_counts.get(day, 0) + booked[None, day]
+                for i, day in days.items()
+            },
+        )
+        booked[user_id, days[chosen]] += 1
+        booked[None, days[chosen]] += 1
+        return chosen
+
+    def _apply_reviews(
+        self, reviews: List[Tuple[str, str, int]]
+    ) -> Tuple[List[dict], Dict[Tuple[str, str], dict], List[dict]]:
+        results = []
+        states: Dict[Tuple[str, str], dict] = {}
+        events = []
+        # Due dates chosen in this call, not yet visible in the histograms
+        booked: Counter = Counter()
+        for user_id, verse_id, q_rating in reviews:
+            key = (user_id, verse_id)
+            if key not in states:
+                states[key] = self._review_state(user_id, verse_id)
+            state = states[key]
+            ease = state["ease_factor"] if state else 2.5
+            reps = state["repetition_count"] if state else 0
+            interval = state["interval"] if state else 0
+
+            now = datetime.utcnow()
+            new_stats = update_sm2_stats(ease, reps, interval, q_rating, now=now)
+            if self.load_balance:
+                new_stats["interval"] = self._balanced_interval(
+                    user_id, new_stats["interval"], now, booked
+                )
+                new_stats["next_due"] = now + timedelta(days=new_stats["interval"])
+            states[key] = {
+                "user_id": user_id,
+                "verse_id": verse_id,
                 "ease_factor": new_stats["easiness_factor"],
                 "repetition_count": new_stats["repetitions"],
                 "interval": new_stats["interval"],
                 "next_due": new_stats["next_due"],
-            },
-        )
+            }
+            events.append(
+                {
+                    **states[key],
+                    "quality": q_rating,
+                    "reviewed_at": now,
+                    "prior_ease_factor": state["ease_factor"] if state else None,
+                    "prior_repetition_count": (
+                        state["repetition_count"] if state else None
+                    ),
+                    "prior_interval": state["interval"] if state else None,
+                    "prior_next_due": state["next_due"] if state else None,
+                }
+            )
+
+            encouragement = (
+                f"Your next review is in {new_stats['interval']} days. "
+                "Keep the word close to your heart."
+            )
+            results.append(
+                {
+                    "verse_id": verse_id,
+                    "user_id": user_id,
+                    "next_due": new_stats["next_due"],
+                    "message": encouragement,
+                }
+            )
+        return results, states, events
 
-        encouragement = (
-            f"Your next review is in {new_stats['interval']} days. "
-            "Keep the word close to your heart."
-        )
-
-        return {
-            "verse_id": verse_id,
-            "user_id": user_id,
-            "next_due": new_stats["next_due"],
-            "message": encouragement,
-        }
 
 # --- FastAPI App ---
 app = FastAPI(
@@ -181,55 +657,345 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Set at startup when SANCTUM_REVIEW_WRITE_BEHIND=1
+review_buffer: Optional[ReviewBuffer] = None
+# Per-user due heaps, reset at startup
+due_scheduler = DueScheduler()
+
+
 # --- API Key Dependency ---
 async def verify_api_key(x_api_key: str = Header(...)):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
 
+
 # --- Service Dependency ---
-def get_cme_service():
-    """Dependency injector for the CMEService."""
-    db = get_db()
-    return CMEService(db)
+class AsyncCMEService:
+    """
+    Awaitable facade over CMEService for the async endpoints.
+    Each call runs on the DB executor with its own pooled connection, so the
+    event loop never waits on SQLite and concurrent requests overlap, up to
+    ``SANCTUM_DB_CONCURRENCY`` at a time.
+    """
+
+    async def call(self, method: str, *args, **kwargs):
+        def work():
+            with review_db.get_pool().connection() as db:
+                service = CMEService(
+                    db, review_buffer=review_buffer, scheduler=due_scheduler
+                )
+                return getattr(service, method)(*args, **kwargs)
+
+        return await review_db.run_in_db(work)
+
+    async def add_verse(self, verse: Verse):
+        return await self.call("add_verse", verse)
+
+    async def get_flashcards_json(
+        self,
+        limit: int = 10,
+        tag: Optional[str] = None,
+        emotion: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        order: DueOrder = DueOrder.due,
+    ) -> bytes:
+        return await self.call(
+            "get_flashcards_json",
+            limit=limit,
+            tag=tag,
+            emotion=emotion,
+            fields=fields,
+            order=order,
+        )
+
+    async def list_verses(
+        self, after: Optional[str] = None, limit: int = 100
+    ) -> VersePage:
+        return await self.call("list_verses", after=after, limit=limit)
+
+    async def get_facets(self, due_only: bool = False) -> Facets:
+        return await self.call("get_facets", due_only=due_only)
+
+    async def get_due_for_user(
+        self, user_id: str, limit: int = 10, order: DueOrder = DueOrder.due
+    ) -> List[DueCard]:
+        return await self.call("get_due_for_user", user_id, limit=limit, order=order)
+
+    async def review_verse(self, verse_id: str, quality: int):
+        return await self.call("review_verse", verse_id, quality)
+
+    async def process_user_review(self, verse_id: str, user_id: str, q_rating: int):
+        return await self.call("process_user_review", verse_id, user_id, q_rating)
+
+    async def process_user_reviews(
+        self, reviews: List[Tuple[str, str, int]]
+    ) -> List[dict]:
+        return await self.call("process_user_reviews", reviews)
+
+    async def get_next_card(self, user_id: str) -> NextCard:
+        return await self.call("get_next_card", user_id)
+
+    async def get_deck(
+        self, user_id: str, after: Optional[int] = None, limit: int = 20
+    ) -> DeckPage:
+        return await self.call("get_deck", user_id, after=after, limit=limit)
+
+    async def get_user_stats(self, user_id: str) -> UserStats:
+        return await self.call("get_user_stats", user_id)
+
+
+def get_cme_service() -> AsyncCMEService:
+    """Dependency injector for the (async) CMEService."""
+    return AsyncCMEService()
+
 
 # --- API Endpoints ---
 @app.on_event("startup")
 async def startup_event():
-    # Ensure the database and table exist on startup
-    get_db()
-    db_reviews = review_db.connect()
-    db_reviews.close()
+    global review_buffer, due_scheduler
+    # Bring the schema up to date once, before serving any request
+    with review_db.get_pool().connection() as db:
+        migrations.migrate(db)
+    due_scheduler = DueScheduler()
+    if WRITE_BEHIND:
+        # Replays reviews journaled but not committed before a crash
+        review_buffer = ReviewBuffer().start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global review_buffer
+    review_db.shutdown_executor()
+    if review_buffer is not None:
+        review_buffer.close()
+        review_buffer = None
+    review_db.close_pool()
 
 
 @app.post("/add_verse", status_code=201, dependencies=[Depends(verify_api_key)])
-async def add_verse_endpoint(verse: Verse, service: CMEService = Depends(get_cme_service)):
+async def add_verse_endpoint(
+    verse: Verse, service: AsyncCMEService = Depends(get_cme_service)
+):
     """Adds a new verse to the memory database."""
     try:
-        return service.add_verse(verse)
+        return await service.add_verse(verse)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/flashcards", response_model=List[Verse], dependencies=[Depends(verify_api_key)])
-async def get_flashcards_endpoint(limit: int = 10, service: CMEService = Depends(get_cme_service)):
-    """Retrieves all verses due for review today."""
-    return service.get_flashcards(limit=limit)
+
+@app.post("/verses/import", dependencies=[Depends(verify_api_key)])
+async def import_verses_endpoint(
+    request: Request,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    """
+    Bulk-imports verses from an NDJSON body (one verse object per line).
+    The body is consumed as a stream and written in chunks; invalid lines are
+    reported individually and do not abort the import.
+    """
+    importer = VerseImporter(chunk_size=max(1, chunk_size))
+    pending = b""
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        await review_db.run_in_db(importer.add_all, iter_ndjson(lines))
+    await review_db.run_in_db(importer.add_all, iter_ndjson([pending]))
+    return asdict(await review_db.run_in_db(importer.finish))
+
+
+@app.get("/verses", response_model=VersePage, dependencies=[Depends(verify_api_key)])
+async def list_verses_endpoint(
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    service: AsyncCMEService = Depends(get_cme_service),
+):
+    """Pages through all verses by `verse_id` using an opaque keyset cursor."""
+    return await service.list_verses(after=after, limit=limit)
+
+
+EXPORT_BATCH_SIZE = 1000
+
+
+@app.get("/verses/export", dependencies=[Depends(verify_api_key)])
+async def export_verses_endpoint():
+    """
+    Streams every verse as NDJSON, in `verse_id` order. Rows are fetched from
+    a server-side cursor in batches, so memory stays flat however large the deck.
+    The export reads on its own connection, not a pooled one: it stays open
+    as long as the client takes to read the response.
+    """
+
+    async def rows():
+        db = await review_db.run_in_db(review_db.connect)
+        cursor = None
+        try:
+            cursor = await review_db.run_in_db(
+                db.execute, f"SELECT {VERSE_SELECT} FROM verses ORDER BY verse_id"
+            )
+            columns = [c[0] for c in cursor.description]
+            while batch := await review_db.run_in_db(
+                cursor.fetchmany, EXPORT_BATCH_SIZE
+            ):
+                yield "".join(
+                    json.dumps(decode_verse_row(dict(zip(columns, row)))) + "\n"
+                    for row in batch
+                ).encode()
+        finally:
+            # Also runs if the client disconnects mid-stream
+            if cursor is not None:
+                cursor.close()
+            db.close()
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/flashcards",
+    # Full verses, or only the requested keys with `fields=`
+    response_model=Union[List[Verse], List[VerseProjection]],
+    dependencies=[Depends(verify_api_key)],
+)
+async def get_flashcards_endpoint(
+    limit: int = 10,
+    tag: Optional[str] = None,
+    emotion: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated Verse fields to return, e.g. `verse_id,text,next_due`.",
+    ),
+    order: DueOrder = Query(
+        DueOrder.due,
+        description="`due`: most overdue first; `priority`: backlog triage order.",
+    ),
+    service: AsyncCMEService = Depends(get_cme_service),
+):
+    """Retrieves all verses due for review today, optionally filtered by covenant tag and/or emotion."""
+    projection = parse_fields(fields)
+    # Pre-serialized: returning a Response skips response_model re-validation.
+    body = await service.get_flashcards_json(
+        limit=limit, tag=tag, emotion=emotion, fields=projection, order=order
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/facets", response_model=Facets, dependencies=[Depends(verify_api_key)])
+async def get_facets_endpoint(
+    due_only: bool = False, service: AsyncCMEService = Depends(get_cme_service)
+):
+    """Counts verses per covenant tag and emotion code (only due verses if ``due_only``)."""
+    return await service.get_facets(due_only=due_only)
+
+
+@app.get(
+    "/users/{user_id}/due",
+    response_model=List[DueCard],
+    dependencies=[Depends(verify_api_key)],
+)
+async def get_user_due_endpoint(
+    user_id: str,
+    limit: int = 10,
+    order: DueOrder = Query(
+        DueOrder.due,
+        description="`due`: most overdue first; `priority`: backlog triage order.",
+    ),
+    service: AsyncCMEService = Depends(get_cme_service),
+):
+    """Retrieves the verses due for review for a specific user."""
+    return await service.get_due_for_user(user_id, limit=limit, order=order)
+
+
+@app.get(
+    "/users/{user_id}/next",
+    response_model=NextCard,
+    dependencies=[Depends(verify_api_key)],
+)
+async def get_user_next_endpoint(
+    user_id: str, service: AsyncCMEService = Depends(get_cme_service)
+):
+    """Returns the user's next card to review, answered from the in-memory due heap."""
+    return await service.get_next_card(user_id)
+
+
+@app.get(
+    "/users/{user_id}/deck",
+    response_model=DeckPage,
+    dependencies=[Depends(verify_api_key)],
+)
+async def get_user_deck_endpoint(
+    user_id: str,
+    after: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=500),
+    service: AsyncCMEService = Depends(get_cme_service),
+):
+    """Serves today's deck for the user from its daily snapshot, in a stable order."""
+    return await service.get_deck(user_id, after=after, limit=limit)
+
+
+@app.get(
+    "/users/{user_id}/stats",
+    response_model=UserStats,
+    dependencies=[Depends(verify_api_key)],
+)
+async def get_user_stats_endpoint(
+    user_id: str, service: AsyncCMEService = Depends(get_cme_service)
+):
+    """Returns the user's review statistics, read from the per-user rollup."""
+    return await service.get_user_stats(user_id)
+
 
 class UserReviewPayload(BaseModel):
     user_id: str
     verse_id: str
-    q: int = Field(..., ge=0, le=5, description="Recall quality from 0 (complete blackout) to 5 (perfect).")
+    q: int = Field(
+        ...,
+        ge=0,
+        le=5,
+        description="Recall quality from 0 (complete blackout) to 5 (perfect).",
+    )
+
 
 @app.post("/review", dependencies=[Depends(verify_api_key)])
-async def review_endpoint(payload: UserReviewPayload, service: CMEService = Depends(get_cme_service)):
+async def review_endpoint(
+    payload: UserReviewPayload, service: AsyncCMEService = Depends(get_cme_service)
+):
     """Processes a verse review for a specific user."""
-    return service.process_user_review(payload.verse_id, payload.user_id, payload.q)
+    return await service.process_user_review(
+        payload.verse_id, payload.user_id, payload.q
+    )
+
+
+class ReviewBatchPayload(BaseModel):
+    reviews: List[UserReviewPayload] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Reviews in the order they were taken.",
+    )
+
+
+@app.post("/reviews/batch", dependencies=[Depends(verify_api_key)])
+async def review_batch_endpoint(
+    payload: ReviewBatchPayload, service: AsyncCMEService = Depends(get_cme_service)
+):
+    """Processes a burst of queued reviews in one transaction, returning per-item results."""
+    return await service.process_user_reviews(
+        [(r.user_id, r.verse_id, r.q) for r in payload.reviews]
+    )
 
-@app.post("/review_verse/{verse_id}", status_code=200, dependencies=[Depends(verify_api_key)])
-async def review_verse_endpoint(verse_id: str, update: VerseUpdate, service: CMEService = Depends(get_cme_service)):
+
+@app.post(
+    "/review_verse/{verse_id}", status_code=200, dependencies=[Depends(verify_api_key)]
+)
+async def review_verse_endpoint(
+    verse_id: str,
+    update: VerseUpdate,
+    service: AsyncCMEService = Depends(get_cme_service),
+):
     """(Legacy) Updates a verse's spaced repetition data after a review."""
-    return service.review_verse(verse_id, update.quality)
+    return await service.review_verse(verse_id, update.quality)
+
 
 if __name__ == "__main__":
     import uvicorn
+
     print("Starting CME Service. Ensure SANCTUM_API_KEY is set.")
     uvicorn.run(app, host="0.0.0.0", port=8000)
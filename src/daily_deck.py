@@ -0,0 +1,184 @@
+"""Materialized "today's deck" per user.
+
+The first deck request of a (UTC) day, or ``scripts/build_daily_decks.py``
+run at midnight, snapshots the user's cards due before the end of that day,
+in ``next_due`` order, into ``daily_deck_items``. Pages are then served from
+the snapshot by position, so session calls are primary-key range scans with
+a stable order however the underlying states change.
+
+Any review moves a card's ``next_due`` at least a day ahead, past the end
+of the deck, so reviewed cards are popped from the deck in the review's
+transaction (in write-behind mode, on flush; until then readers filter them
+out with the buffered states).
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlite_utils
+
+from src import db as review_db
+
+# Most cards a single day's deck holds.
+DECK_MAX_CARDS = int(os.getenv("SANCTUM_DECK_MAX_CARDS", "500"))
+
+_BUILD_SQL = """
+INSERT INTO daily_deck_items (user_id, position, verse_id)
+SELECT r.user_id, row_number() OVER (ORDER BY r.next_due, r.verse_id), r.verse_id
+FROM verse_reviews AS r
+JOIN verses AS v ON v.verse_id = r.verse_id
+WHERE r.user_id = ? AND r.next_due < ?
+ORDER BY r.next_due, r.verse_id
+LIMIT ?
+"""
+
+_PAGE_SQL = """
+SELECT i.position, r.verse_id, v.text, r.next_due, r.interval, r.ease_factor, r.repetition_count
+FROM daily_deck_items AS i
+JOIN verse_reviews AS r ON r.user_id = i.user_id AND r.verse_id = i.verse_id
+JOIN verses AS v ON v.verse_id = i.verse_id
+WHERE i.user_id = ? AND i.position > ?
+ORDER BY i.position
+LIMIT ?
+"""
+
+
+def today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def deck_end(day: str) -> str:
+    """Cards due before this timestamp belong to ``day``'s deck."""
+    return datetime.combine(
+        date.fromisoformat(day) + timedelta(days=1), datetime.min.time()
+    ).isoformat()
+
+
+def get_deck(user_id: str, db: sqlite_utils.Database) -> Optional[Dict]:
+    row = db.execute(
+        "SELECT day, size, remaining FROM daily_decks WHERE user_id = ?", [user_id]
+    ).fetchone()
+    return dict(zip(("day", "size", "remaining"), row)) if row else None
+
+
+def build_deck(
+    user_id: str,
+    db: sqlite_utils.Database,
+    day: Optional[str] = None,
+    max_cards: int = DECK_MAX_CARDS,
+) -> Dict:
+    """Snapshot ``user_id``'s deck for ``day``, replacing any older one.
+
+    Runs in the caller's transaction.
+    """
+    day = day or today()
+    db.execute("DELETE FROM daily_deck_items WHERE user_id = ?", [user_id])
+    size = db.execute(_BUILD_SQL, [user_id, deck_end(day), max_cards]).rowcount
+    db.execute(
+        "INSERT OR REPLACE INTO daily_decks (user_id, day, built_at, size, remaining) VALUES (?, ?, ?, ?, ?)",
+        [user_id, day, datetime.utcnow().isoformat(), size, size],
+    )
+    return {"day": day, "size": size, "remaining": size}
+
+
+def ensure_deck(
+    user_id: str, db: sqlite_utils.Database, day: Optional[str] = None
+) -> Dict:
+    """The user's deck for ``day``, built on first use that day."""
+    day = day or today()
+    deck = get_deck(user_id, db)
+    if deck is not None and deck["day"] == day:
+        return deck
+    with review_db.write_transaction(db):
+        # Another request may have built it while we waited for the lock
+        deck = get_deck(user_id, db)
+        if deck is not None and deck["day"] == day:
+            return deck
+        return build_deck(user_id, db, day)
+
+
+def build_decks(
+    db: sqlite_utils.Database,
+    day: Optional[str] = None,
+    users: Optional[Iterable[str]] = None,
+    rebuild: bool = False,
+    batch_size: int = 500,
+) -> Tuple[int, int]:
+    """Build ``day``'s deck for ``users`` (default: everyone with cards due by then).
+
+    Users whose deck for ``day`` already exists are skipped unless
+    ``rebuild``. Commits every ``batch_size`` users; returns (decks, cards).
+    """
+    day = day or today()
+    if users is None:
+        users = [
+            row[0]
+            for row in db.execute(
+                "SELECT DISTINCT user_id FROM verse_reviews WHERE next_due < ? ORDER BY user_id",
+                [deck_end(day)],
+            )
+        ]
+    if not rebuild:
+        built = {
+            row[0]
+            for row in db.execute(
+                "SELECT user_id FROM daily_decks WHERE day = ?", [day]
+            )
+        }
+        users = [u for u in users if u not in built]
+    users = list(users)
+    decks = cards = 0
+    for start in range(0, len(users), batch_size):
+        with review_db.write_transaction(db):
+            for user_id in users[start : start + batch_size]:
+                cards += build_deck(user_id, db, day)["size"]
+                decks += 1
+    return decks, cards
+
+
+def get_page(
+    user_id: str,
+    db: sqlite_utils.Database,
+    after: Optional[int] = None,
+    limit: int = 20,
+    overlay: Iterable[Dict] = (),
+    day: Optional[str] = None,
+) -> Tuple[Dict, List[Dict]]:
+    """One page of the user's deck after position ``after``.
+
+    ``overlay`` holds review states not yet committed (write-behind mode);
+    cards they have moved out of the deck are skipped. Returns the deck
+    row and the page's rows (each with its ``position``).
+    """
+    deck = ensure_deck(user_id, db, day)
+    end = deck_end(deck["day"])
+    reviewed = sorted(
+        {s["verse_id"] for s in overlay if review_db._iso(s["next_due"]) >= end}
+    )
+    if reviewed:
+        popped = db.execute(
+            "SELECT COUNT(*) FROM daily_deck_items WHERE user_id = ? "
+            f"AND verse_id IN ({', '.join('?' for _ in reviewed)})",
+            [user_id, *reviewed],
+        ).fetchone()[0]
+        deck = {**deck, "remaining": deck["remaining"] - popped}
+    rows = review_db.fetch_dicts(
+        db.execute(_PAGE_SQL, [user_id, after or 0, limit + len(reviewed)])
+    )
+    items = [row for row in rows if row["verse_id"] not in reviewed][:limit]
+    return deck, items
+
+
+def pop_cards(keys: Iterable[Tuple[str, str]], db: sqlite_utils.Database) -> None:
+    """Remove reviewed (user_id, verse_id) cards from their decks; runs in the caller's transaction."""
+    db.conn.executemany(
+        "DELETE FROM daily_deck_items WHERE user_id = ? AND verse_id = ?", list(keys)
+    )
+
+
+def invalidate(db: sqlite_utils.Database) -> None:
+    """Drop every deck, e.g. after review states were rewritten in bulk; decks rebuild on next use."""
+    db.execute("DELETE FROM daily_decks")
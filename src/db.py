@@ -1,57 +1,419 @@
 """SQLite helper functions for spaced-repetition data."""
 
+import asyncio
+import functools
 import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Dict, Tuple
+
+import json
 
 import sqlite_utils
-import sqlite3
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sanctum.db")
+from src.schemas import Verse
+
+# Shared by every service and script that reads review data.
+DB_PATH = os.getenv(
+    "SANCTUM_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "sanctum.db"),
+)
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+# --- Connection pool configuration ---
+POOL_SIZE = int(os.getenv("SANCTUM_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("SANCTUM_DB_POOL_TIMEOUT", "5.0"))
+BUSY_TIMEOUT_MS = int(os.getenv("SANCTUM_DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = int(os.getenv("SANCTUM_DB_STATEMENT_CACHE_SIZE", "256"))
+# Blocking DB calls made from async endpoints run on a dedicated executor of
+# this many threads; keep it at or below the pool size.
+DB_CONCURRENCY = int(os.getenv("SANCTUM_DB_CONCURRENCY", str(POOL_SIZE)))
+
+
+def _open(path: str) -> sqlite_utils.Database:
+    """Open a tuned connection: WAL journaling, relaxed fsync and a busy timeout.
+
+    ``cached_statements`` keeps compiled statements around so the repeated
+    lookups and upserts on the hot path skip re-preparing their SQL.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return sqlite_utils.Database(conn)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection frees up within the pool timeout."""
 
-def _ensure_tables(db: sqlite_utils.Database) -> None:
-    if "verse_reviews" not in db.table_names():
-        db["verse_reviews"].create(
-            {
-                "user_id": str,
-                "verse_id": str,
-                "ease_factor": float,
-                "repetition_count": int,
-                "interval": int,
-                "next_due": datetime,
-            },
-            pk=("user_id", "verse_id"),
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections to a single file.
+
+    Connections are created lazily up to ``size`` and handed out LIFO so the
+    warmest connection (and its statement cache) is reused first.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite_utils.Database]" = queue.LifoQueue(
+            maxsize=size
         )
-        print("Database table 'verse_reviews' created.")
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> sqlite_utils.Database:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _open(self.path)
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"No database connection available after {self.timeout}s "
+                f"(pool size {self.size})."
+            )
+
+    def release(self, db: sqlite_utils.Database) -> None:
+        if db.conn.in_transaction:
+            db.conn.rollback()
+        if self._closed:
+            db.close()
+            return
+        self._idle.put_nowait(db)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite_utils.Database]:
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def close(self) -> None:
+        """Close idle connections; connections still checked out close on release."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, (re)creating it if ``DB_PATH`` changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+def close_pool() -> None:
+    """Close the process-wide pool, e.g. on service shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide executor that runs blocking DB work."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DB_CONCURRENCY, thread_name_prefix="sanctum-db"
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Wait for in-flight DB work and stop the executor, e.g. on service shutdown."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_in_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking DB work on the DB executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
 
 
 def connect() -> sqlite_utils.Database:
-    """Return a database connection ensuring tables exist."""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    db = sqlite_utils.Database(conn)
-    _ensure_tables(db)
-    return db
+    """Return a dedicated (non-pooled) database connection.
+
+    The schema is managed by :mod:`src.migrations`, applied at service startup.
+    """
+    return _open(DB_PATH)
+
+
+@contextmanager
+def _pooled(db: Optional[sqlite_utils.Database]) -> Iterator[sqlite_utils.Database]:
+    if db is not None:
+        yield db
+    else:
+        with get_pool().connection() as pooled:
+            yield pooled
+
 
+def fetch_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """Materialize a cursor's remaining rows as dicts keyed by column name."""
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-def get_review_state(user_id: str, verse_id: str) -> Optional[Dict]:
+
+_UPSERT_REVIEW_SQL = """
+INSERT INTO verse_reviews (user_id, verse_id, ease_factor, repetition_count, interval, next_due)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id, verse_id) DO UPDATE SET
+    ease_factor = excluded.ease_factor,
+    repetition_count = excluded.repetition_count,
+    interval = excluded.interval,
+    next_due = excluded.next_due
+"""
+
+
+def get_review_state(
+    user_id: str, verse_id: str, db: Optional[sqlite_utils.Database] = None
+) -> Optional[Dict]:
     """Fetches the SM-2 review state for a user and verse."""
-    db = connect()
-    try:
-        return db["verse_reviews"].get((user_id, verse_id))
-    except sqlite_utils.db.NotFoundError:
-        return None
-    finally:
-        db.close()
+    with _pooled(db) as conn:
+        rows = fetch_dicts(
+            conn.execute(
+                "SELECT user_id, verse_id, ease_factor, repetition_count, interval, next_due "
+                "FROM verse_reviews WHERE user_id = ? AND verse_id = ?",
+                [user_id, verse_id],
+            )
+        )
+        return rows[0] if rows else None
 
 
-def save_review_state(user_id: str, verse_id: str, state: Dict) -> None:
+def save_review_state(
+    user_id: str, verse_id: str, state: Dict, db: Optional[sqlite_utils.Database] = None
+) -> None:
     """Saves or updates the SM-2 review state for a user and verse."""
-    db = connect()
+    with _pooled(db) as conn:
+        with conn.conn:
+            conn.execute(
+                _UPSERT_REVIEW_SQL,
+                [
+                    user_id,
+                    verse_id,
+                    state["ease_factor"],
+                    state["repetition_count"],
+                    state["interval"],
+                    _iso(state["next_due"]),
+                ],
+            )
+
+
+def save_review_states(
+    records: Iterable[Dict], db: Optional[sqlite_utils.Database] = None
+) -> None:
+    """Upserts many review states (each carrying ``user_id``/``verse_id``) at once.
+
+    Runs inside the caller's transaction when there is one, so it can be part
+    of a larger group commit (see :func:`write_transaction`).
+    """
+    with _pooled(db) as conn:
+        rows = [
+            [
+                r["user_id"],
+                r["verse_id"],
+                r["ease_factor"],
+                r["repetition_count"],
+                r["interval"],
+                _iso(r["next_due"]),
+            ]
+            for r in records
+        ]
+        if conn.conn.in_transaction:
+            conn.conn.executemany(_UPSERT_REVIEW_SQL, rows)
+        else:
+            with conn.conn:
+                conn.conn.executemany(_UPSERT_REVIEW_SQL, rows)
+
+
+REVIEW_EVENT_COLUMNS = [
+    "user_id",
+    "verse_id",
+    "quality",
+    "reviewed_at",
+    "prior_ease_factor",
+    "prior_repetition_count",
+    "prior_interval",
+    "prior_next_due",
+    "ease_factor",
+    "repetition_count",
+    "interval",
+    "next_due",
+]
+_DATETIME_EVENT_COLUMNS = {"reviewed_at", "prior_next_due", "next_due"}
+
+_INSERT_EVENT_SQL = "INSERT INTO review_events ({}) VALUES ({})".format(
+    ", ".join(f"[{c}]" for c in REVIEW_EVENT_COLUMNS),
+    ", ".join("?" for _ in REVIEW_EVENT_COLUMNS),
+)
+
+
+def append_review_events(
+    events: Iterable[Dict], db: Optional[sqlite_utils.Database] = None
+) -> None:
+    """Appends review events (see ``REVIEW_EVENT_COLUMNS``) to ``review_events``.
+
+    Like :func:`save_review_states`, joins the caller's transaction if any.
+    """
+    with _pooled(db) as conn:
+        rows = [
+            [
+                _iso(e.get(c)) if c in _DATETIME_EVENT_COLUMNS else e.get(c)
+                for c in REVIEW_EVENT_COLUMNS
+            ]
+            for e in events
+        ]
+        if conn.conn.in_transaction:
+            conn.conn.executemany(_INSERT_EVENT_SQL, rows)
+        else:
+            with conn.conn:
+                conn.conn.executemany(_INSERT_EVENT_SQL, rows)
+
+
+def get_due_counts(
+    user_id: str,
+    first_day: str,
+    last_day: str,
+    db: Optional[sqlite_utils.Database] = None,
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Reviews due per day (``YYYY-MM-DD``) in a date range: for the user, and server-wide."""
+    with _pooled(db) as conn:
+        user_counts = dict(
+            conn.execute(
+                "SELECT day, due_count FROM user_due_histogram WHERE user_id = ? AND day BETWEEN ? AND ?",
+                [user_id, first_day, last_day],
+            ).fetchall()
+        )
+        global_counts = dict(
+            conn.execute(
+                "SELECT day, due_count FROM due_histogram WHERE day BETWEEN ? AND ?",
+                [first_day, last_day],
+            ).fetchall()
+        )
+        return user_counts, global_counts
+
+
+@contextmanager
+def write_transaction(db: sqlite_utils.Database) -> Iterator[sqlite_utils.Database]:
+    """Hold the write lock for a read-modify-write: ``BEGIN IMMEDIATE`` ... ``COMMIT``.
+
+    Taking the lock up front means concurrent writers queue on the busy
+    timeout instead of failing to upgrade a read transaction mid-way.
+    """
+    db.conn.execute("BEGIN IMMEDIATE")
     try:
-        record = dict(state)
-        record.update({"user_id": user_id, "verse_id": verse_id})
-        db["verse_reviews"].upsert(record, pk=("user_id", "verse_id"))
-    finally:
-        db.close()
+        yield db
+    except BaseException:
+        db.conn.rollback()
+        raise
+    db.conn.commit()
+
+
+VERSE_COLUMNS = list(Verse.model_fields)
+
+_UPSERT_VERSE_SQL = """
+INSERT INTO verses ({columns}) VALUES ({placeholders})
+ON CONFLICT (verse_id) DO UPDATE SET {assignments}
+""".format(
+    columns=", ".join(f"[{c}]" for c in VERSE_COLUMNS),
+    placeholders=", ".join("?" for _ in VERSE_COLUMNS),
+    assignments=", ".join(
+        f"[{c}] = excluded.[{c}]" for c in VERSE_COLUMNS if c != "verse_id"
+    ),
+)
+
+
+# (junction table, value column, index of the JSON list in a verse row)
+TAG_JUNCTIONS = (
+    ("verse_tags", "tag", VERSE_COLUMNS.index("covenant_tags")),
+    ("verse_emotions", "emotion", VERSE_COLUMNS.index("emotion_codes")),
+)
+
+
+def verse_to_row(verse: Verse) -> List:
+    """Serialize a verse into a ``verses`` row, ordered as ``VERSE_COLUMNS``."""
+    return [
+        verse.verse_id,
+        verse.text,
+        # Lists and the pivot are stored as JSON strings
+        json.dumps(verse.covenant_tags),
+        json.dumps(verse.emotion_codes),
+        verse.notes,
+        json.dumps(verse.pivot.model_dump()) if verse.pivot else None,
+        verse.repetitions,
+        verse.easiness_factor,
+        verse.interval,
+        verse.next_due.isoformat(),
+    ]
+
+
+def upsert_verses(rows: List[List], db: Optional[sqlite_utils.Database] = None) -> None:
+    """Insert or replace many serialized verses in one transaction.
+
+    The tag/emotion junction tables are rewritten for the same verses in the
+    same transaction, so they never drift from the JSON columns.
+    """
+    with _pooled(db) as conn:
+        with conn.conn:
+            conn.conn.executemany(_UPSERT_VERSE_SQL, rows)
+            verse_ids = [(row[0],) for row in rows]
+            for table, column, index in TAG_JUNCTIONS:
+                conn.conn.executemany(
+                    f"DELETE FROM [{table}] WHERE verse_id = ?", verse_ids
+                )
+                conn.conn.executemany(
+                    f"INSERT OR IGNORE INTO [{table}] ([{column}], [verse_id]) "
+                    "SELECT j.value, ? FROM json_each(?) AS j WHERE j.type = 'text'",
+                    [(row[0], row[index]) for row in rows],
+                )
+
+
+def _iso(value) -> str:
+    """Store datetimes the way sqlite-utils does: ISO 8601 with a ``T``."""
+    return value.isoformat() if isinstance(value, datetime) else value
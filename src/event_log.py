@@ -0,0 +1,161 @@
+"""Chunked columnar export of the ``review_events`` log.
+
+The log is read in ``event_id`` order, one chunk at a time, and each chunk is
+written as a NumPy ``.npz`` part (``part-00000.npz``, ...) holding one typed
+array per column. User and verse ids are dictionary-encoded: parts store
+``int32`` codes and the export directory holds ``users.npy`` and
+``verses.npy`` with the id for each code. Memory stays bounded by the chunk
+size plus the two dictionaries.
+
+Missing prior state (a card's first review) is stored as ``NaN`` for ease,
+``-1`` for counts and ``NaT`` for dates.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import sqlite_utils
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+_SELECT_SQL = """
+SELECT event_id, user_id, verse_id, quality, reviewed_at,
+       prior_ease_factor, prior_repetition_count, prior_interval, prior_next_due,
+       ease_factor, repetition_count, interval, next_due
+FROM review_events
+WHERE event_id > ?
+ORDER BY event_id
+LIMIT ?
+"""
+
+
+@dataclass
+class ExportReport:
+    events: int = 0
+    parts: int = 0
+    users: int = 0
+    verses: int = 0
+
+
+class _Dictionary:
+    """Assigns consecutive integer codes to strings in first-seen order."""
+
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, values) -> np.ndarray:
+        codes = self.codes
+        return np.fromiter(
+            (codes.setdefault(v, len(codes)) for v in values),
+            dtype=np.int32,
+            count=len(values),
+        )
+
+    def values(self) -> np.ndarray:
+        return np.array(list(self.codes), dtype=str)
+
+
+def _ints(values, missing: int = -1) -> np.ndarray:
+    return np.array([missing if v is None else v for v in values], dtype=np.int32)
+
+
+def _columns(
+    rows: List[tuple], users: _Dictionary, verses: _Dictionary
+) -> Dict[str, np.ndarray]:
+    (
+        event_id,
+        user_id,
+        verse_id,
+        quality,
+        reviewed_at,
+        prior_ease,
+        prior_reps,
+        prior_interval,
+        prior_due,
+        ease,
+        reps,
+        interval,
+        next_due,
+    ) = zip(*rows)
+    return {
+        "event_id": np.array(event_id, dtype=np.int64),
+        "user": users.encode(user_id),
+        "verse": verses.encode(verse_id),
+        "quality": np.array(quality, dtype=np.int8),
+        "reviewed_at": np.array(reviewed_at, dtype="datetime64[us]"),
+        "prior_ease_factor": np.array(prior_ease, dtype=np.float64),
+        "prior_repetition_count": _ints(prior_reps),
+        "prior_interval": _ints(prior_interval),
+        "prior_next_due": np.array(prior_due, dtype="datetime64[us]"),
+        "ease_factor": np.array(ease, dtype=np.float64),
+        "repetition_count": np.array(reps, dtype=np.int32),
+        "interval": np.array(interval, dtype=np.int32),
+        "next_due": np.array(next_due, dtype="datetime64[us]"),
+    }
+
+
+def export_events(
+    db: sqlite_utils.Database,
+    out_dir: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compress: bool = True,
+    progress: Optional[Callable[[ExportReport], None]] = None,
+) -> ExportReport:
+    """Write the whole ``review_events`` log to ``out_dir`` as columnar parts."""
+    os.makedirs(out_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(out_dir, "part-*.npz")):
+        os.remove(stale)
+    save = np.savez_compressed if compress else np.savez
+    users, verses = _Dictionary(), _Dictionary()
+    report = ExportReport()
+    after = 0
+    while True:
+        rows = db.execute(_SELECT_SQL, [after, chunk_size]).fetchall()
+        if not rows:
+            break
+        after = rows[-1][0]
+        save(
+            os.path.join(out_dir, f"part-{report.parts:05d}.npz"),
+            **_columns(rows, users, verses),
+        )
+        report.events += len(rows)
+        report.parts += 1
+        if progress:
+            progress(report)
+    np.save(os.path.join(out_dir, "users.npy"), users.values())
+    np.save(os.path.join(out_dir, "verses.npy"), verses.values())
+    report.users, report.verses = len(users.codes), len(verses.codes)
+    return report
+
+
+def iter_event_chunks(out_dir: str) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield an exported log part by part, as dicts of column arrays."""
+    for path in sorted(glob.glob(os.path.join(out_dir, "part-*.npz"))):
+        with np.load(path) as part:
+            yield {name: part[name] for name in part.files}
+
+
+def load_dictionaries(out_dir: str) -> Dict[str, np.ndarray]:
+    """The ``user`` and ``verse`` code -> id arrays of an export."""
+    return {
+        "user": np.load(os.path.join(out_dir, "users.npy")),
+        "verse": np.load(os.path.join(out_dir, "verses.npy")),
+    }
+
+
+def to_frame(
+    chunk: Dict[str, np.ndarray], dictionaries: Dict[str, np.ndarray]
+) -> pd.DataFrame:
+    """One exported chunk as a DataFrame, with user/verse ids as categoricals."""
+    columns = dict(chunk)
+    for name in ("user", "verse"):
+        columns[f"{name}_id"] = pd.Categorical.from_codes(
+            columns.pop(name), categories=dictionaries[name]
+        )
+    return pd.DataFrame(columns)
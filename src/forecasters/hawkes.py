@@ -1,14 +1,168 @@
-"""Simple Hawkes-process forecaster."""
+"""Simple Hawkes-process forecaster.
+
+The intensity is ``baseline + alpha * sum(exp(-beta * (t - e)) for e < t)``.
+Parameters can be fitted by maximum likelihood (:meth:`HawkesForecaster.fit`),
+per user with a pooled population prior (:meth:`HawkesForecaster.fit_pooled`).
+Fits keep the branching ratio ``alpha / beta`` (expected events each event
+triggers) below one, so the fitted process is stationary.
+"""
 
 from __future__ import annotations
 
-from typing import List
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
+from scipy.optimize import minimize
+from scipy.signal import lfilter
+
+# Users per vectorized pass in forecast_batch; bounds the users x horizon
+# working arrays.
+DEFAULT_CHUNK_USERS = 4096
+# Box bounds on baseline, branching ratio alpha / beta and beta while fitting.
+PARAM_BOUNDS = ((1e-6, 1e3), (1e-6, 0.95), (1e-3, 1e3))
+# Standard deviation, in log-parameter space, of the prior a per-user fit is
+# shrunk towards; smaller pulls sparse histories harder to the population.
+DEFAULT_PRIOR_SCALE = 1.0
+# Percentile bands reported by simulate
+DEFAULT_PERCENTILES = (5.0, 50.0, 95.0)
+# Events after which a simulated path stops, bounding the work of any one
+# path. Stationary but bursty parameters can still reach it on some paths;
+# those paths are counted in HawkesSimulation.truncated_paths.
+DEFAULT_MAX_EVENTS = 10_000
+
+
+def to_csr(event_lists: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack per-user event lists into (values, offsets): user i's events are
+    ``values[offsets[i]:offsets[i + 1]]``."""
+    lengths = np.fromiter(
+        (len(e) for e in event_lists), dtype=np.int64, count=len(event_lists)
+    )
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    values = (
+        np.concatenate([np.asarray(e, dtype=float) for e in event_lists])
+        if len(event_lists)
+        else np.zeros(0)
+    )
+    return values, offsets
+
+
+def _window(
+    events, start: Optional[float], end: Optional[float]
+) -> Tuple[np.ndarray, float, float]:
+    times = np.sort(np.asarray(events, dtype=float))
+    start = times[0] if start is None and times.size else (start or 0.0)
+    end = (
+        times[-1] + 1
+        if end is None and times.size
+        else (end if end is not None else start)
+    )
+    return times[(times >= start) & (times <= end)], start, end
+
+
+def log_likelihood(
+    params: Sequence[float], times: np.ndarray, start: float, end: float
+) -> Tuple[float, np.ndarray]:
+    """Log-likelihood of sorted event ``times`` observed over ``[start, end]``
+    and its gradient with respect to (baseline, alpha, beta).
+
+    O(n): the excitation at each event, ``A_i = sum(exp(-beta * (t_i - t_j)))``
+    over earlier events, and its beta derivative are running sums, computed
+    as cumulative log-sum-exps so they stay finite for long histories.
+    """
+    mu, alpha, beta = params
+    u = times - start
+    horizon = end - start
+    if not u.size:
+        return -mu * horizon, np.array([-horizon, 0.0, 0.0])
+    with np.errstate(divide="ignore"):
+        # log sum_{j<=i} exp(beta u_j) and log sum_{j<=i} u_j exp(beta u_j)
+        running = np.logaddexp.accumulate(beta * u)
+        weighted = np.logaddexp.accumulate(beta * u + np.log(u))
+    a = np.zeros_like(u)
+    c = np.zeros_like(u)
+    a[1:] = np.exp(running[:-1] - beta * u[1:])
+    c[1:] = np.exp(weighted[:-1] - beta * u[1:])
+    # d A_i / d beta = -sum (t_i - t_j) exp(-beta (t_i - t_j))
+    b = c - u * a
+    lam = mu + alpha * a
+    tail = np.exp(-beta * (horizon - u))
+    compensator = np.sum(1 - tail)
+    value = np.sum(np.log(lam)) - mu * horizon - alpha / beta * compensator
+    grad = np.array(
+        [
+            np.sum(1 / lam) - horizon,
+            np.sum(a / lam) - compensator / beta,
+            alpha * np.sum(b / lam)
+            + alpha / beta**2 * compensator
+            - alpha / beta * np.sum((horizon - u) * tail),
+        ]
+    )
+    return value, grad
+
+
+def _logit(p):
+    return np.log(p) - np.log1p(-p)
+
+
+def _maximize(objective, x0: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """Maximize ``objective(params) -> (value, grad)`` with L-BFGS-B.
+
+    The search runs over ``(log baseline, logit(alpha / beta), log beta)``
+    within :data:`PARAM_BOUNDS`, so every candidate has ``alpha < beta``.
+    Returns the parameters and whether any of them ended on a bound.
+    """
+
+    def params_of(x):
+        n = 1 / (1 + np.exp(-x[1]))
+        return np.array([np.exp(x[0]), n * np.exp(x[2]), np.exp(x[2])]), n
+
+    def negative(x):
+        params, n = params_of(x)
+        value, grad = objective(params)
+        # Chain rule for the reparameterization; alpha = n * beta
+        mu, alpha, beta = params
+        return -value, -np.array(
+            [
+                grad[0] * mu,
+                grad[1] * beta * n * (1 - n),
+                grad[1] * alpha + grad[2] * beta,
+            ]
+        )
+
+    bounds = np.array([[np.log(low), np.log(high)] for low, high in PARAM_BOUNDS])
+    bounds[1] = _logit(np.array(PARAM_BOUNDS[1]))
+    mu, alpha, beta = x0
+    x0 = np.clip(
+        [np.log(mu), _logit(min(alpha / beta, PARAM_BOUNDS[1][1])), np.log(beta)],
+        *bounds.T,
+    )
+    x = minimize(negative, x0, jac=True, method="L-BFGS-B", bounds=bounds).x
+    at_bound = bool(np.any((x - bounds[:, 0] < 1e-6) | (bounds[:, 1] - x < 1e-6)))
+    return params_of(x)[0], at_bound
+
+
+@dataclass
+class HawkesSimulation:
+    """Summary of simulated sample paths, per timestep 1..horizon."""
+
+    paths: int
+    seed: Optional[int]
+    expected_counts: np.ndarray
+    expected_cumulative: np.ndarray
+    # percentile -> counts in each timestep / cumulative counts up to it
+    count_bands: Dict[float, np.ndarray]
+    cumulative_bands: Dict[float, np.ndarray]
+    # Paths stopped at max_events; their later timesteps undercount, which
+    # pulls the expectations and bands down.
+    truncated_paths: int = 0
 
 
 class HawkesForecaster:
-    """Very small Hawkes-like process using exponential kernel."""
+    """Very small Hawkes-like process using exponential kernel.
+
+    For batch forecasting the parameters may also be per-user arrays.
+    """
 
     def __init__(
         self, baseline: float = 0.1, alpha: float = 0.5, beta: float = 1.0
@@ -16,17 +170,273 @@ class HawkesForecaster:
         self.baseline = baseline
         self.alpha = alpha
         self.beta = beta
+        # Whether the last fit ended on a bound of PARAM_BOUNDS
+        self.at_bound = False
+
+    @property
+    def params(self) -> np.ndarray:
+        return np.array([self.baseline, self.alpha, self.beta], dtype=float)
+
+    def fit(
+        self,
+        events: Sequence[float],
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        prior: Optional["HawkesForecaster"] = None,
+        prior_scale: float = DEFAULT_PRIOR_SCALE,
+    ) -> "HawkesForecaster":
+        """Set the parameters to the maximum-likelihood estimate for ``events``.
+
+        The observation window defaults to the first event up to one timestep
+        past the last. With a ``prior`` (e.g. from :meth:`fit_pooled`) the
+        estimate is MAP under a log-normal prior centred on its parameters,
+        so users with few events stay close to the population; a user with
+        no events gets the prior's parameters. The estimate always has
+        ``alpha < beta``; ``at_bound`` records whether it was held at a bound
+        of :data:`PARAM_BOUNDS` (e.g. a history too bursty for a stationary
+        fit). Returns ``self``.
+        """
+        times, start, end = _window(events, start, end)
+        if not times.size:
+            if prior is None:
+                raise ValueError("Cannot fit a Hawkes process without events")
+            self.baseline, self.alpha, self.beta = prior.params
+            self.at_bound = False
+            return self
+
+        def objective(params):
+            value, grad = log_likelihood(params, times, start, end)
+            if prior is not None:
+                z = (np.log(params) - np.log(prior.params)) / prior_scale
+                value -= 0.5 * np.sum(z**2)
+                grad = grad - z / (prior_scale * params)
+            return value, grad
+
+        params, self.at_bound = _maximize(
+            objective, prior.params if prior else self.params
+        )
+        self.baseline, self.alpha, self.beta = params
+        return self
+
+    @classmethod
+    def fit_pooled(
+        cls,
+        event_lists: Sequence[Sequence[float]],
+        windows: Optional[Sequence[Tuple[Optional[float], Optional[float]]]] = None,
+    ) -> "HawkesForecaster":
+        """One set of parameters maximizing the summed likelihood of many users,
+        each over its own window (default as in :meth:`fit`)."""
+        windows = windows or [(None, None)] * len(event_lists)
+        histories = [
+            _window(events, *window) for events, window in zip(event_lists, windows)
+        ]
+        histories = [h for h in histories if h[0].size]
+        if not histories:
+            raise ValueError("Cannot fit a Hawkes process without events")
+
+        def objective(params):
+            value, grad = 0.0, np.zeros(3)
+            for times, start, end in histories:
+                v, g = log_likelihood(params, times, start, end)
+                value, grad = value + v, grad + g
+            return value, grad
+
+        forecaster = cls()
+        params, forecaster.at_bound = _maximize(objective, forecaster.params)
+        forecaster.baseline, forecaster.alpha, forecaster.beta = params
+        return forecaster
+
+    def excitation_csr(
+        self, values: np.ndarray, offsets: np.ndarray, horizon: int
+    ) -> np.ndarray:
+        """Users x horizon matrix of ``sum(exp(-beta * (t - e)) for e < t)``, t = 1..horizon.
+
+        O(n + users * horizon): each event's kernel mass is binned into the
+        first timestep it reaches, then carried forward along every row with
+        the exponential-kernel recursion ``S(t) = exp(-beta) * S(t - 1) + new
+        mass at t``.
+        """
+        values = np.asarray(values, dtype=float)
+        users = len(offsets) - 1
+        if horizon <= 0:
+            return np.zeros((users, 0))
+        user = np.repeat(np.arange(users), np.diff(offsets))
+        keep = values < horizon
+        values, user = values[keep], user[keep]
+        beta = np.asarray(self.beta, dtype=float)
+        # An event at e first counts at timestep floor(e) + 1 (index floor(e)),
+        # or at t = 1 if it precedes the window.
+        index = np.clip(np.floor(values), 0, None).astype(np.int64)
+        mass = np.bincount(
+            user * horizon + index,
+            weights=np.exp(-(beta[user] if beta.ndim else beta) * (index + 1 - values)),
+            minlength=users * horizon,
+        ).reshape(users, horizon)
+        if not beta.ndim:
+            return lfilter([1.0], [1.0, -np.exp(-beta)], mass, axis=1)
+        # Per-user decay: run the recursion across all users one timestep at a time
+        decay = np.exp(-beta)
+        for t in range(1, horizon):
+            mass[:, t] += decay * mass[:, t - 1]
+        return mass
+
+    def excitation(self, events: List[float], horizon: int) -> np.ndarray:
+        """:meth:`excitation_csr` for a single user's events."""
+        events = np.asarray(events, dtype=float)
+        return self.excitation_csr(events, np.array([0, len(events)]), horizon)[0]
 
     def forecast(self, events: List[int], horizon: int) -> List[float]:
-        times = np.arange(1, horizon + 1)
-        intensity = np.full_like(times, self.baseline, dtype=float)
-        past_events = np.array(events)
-        for t in times:
-            # Filter events that occurred before the current time t
-            relevant_events = past_events[past_events < t]
-            if relevant_events.size > 0:
-                intensity[t - 1] += self.alpha * np.sum(
-                    np.exp(-self.beta * (t - relevant_events))
-                )
+        intensity = self.baseline + self.alpha * self.excitation(events, horizon)
         prob = 1 - np.exp(-intensity)
         return prob.tolist()
+
+    def forecast_state(
+        self, last_event: np.ndarray, excitation: np.ndarray, horizon: int
+    ) -> np.ndarray:
+        """Users x horizon probabilities from each user's running state alone.
+
+        ``excitation`` is ``sum(exp(-beta * (last_event - e)))`` over the
+        user's events and ``last_event`` the latest one, relative to now
+        (timestep 0); the same as :meth:`forecast` on the events themselves,
+        in O(horizon) per user whatever the history length. Parameters may be
+        scalars or per-user arrays.
+        """
+        last_event = np.minimum(
+            np.atleast_1d(np.asarray(last_event, dtype=float)), 0.0
+        )[:, None]
+        excitation = np.atleast_1d(np.asarray(excitation, dtype=float))[:, None]
+        baseline, alpha, beta = (
+            np.reshape(p, (-1, 1)) for p in (self.baseline, self.alpha, self.beta)
+        )
+        t = np.arange(1, horizon + 1)[None, :]
+        intensity = baseline + alpha * excitation * np.exp(-beta * (t - last_event))
+        return 1 - np.exp(-intensity)
+
+    def expected_cumulative(
+        self, horizon: int, last_event: float = 0.0, excitation: float = 0.0
+    ) -> np.ndarray:
+        """Closed-form ``E[N(t)]``, t = 1..horizon, from the running state of
+        :meth:`forecast_state`; requires ``alpha < beta``.
+
+        ``E[S]`` relaxes from its current value to ``baseline / (beta - alpha)``
+        at rate ``beta - alpha``, and ``E[N(t)]`` integrates
+        ``baseline + alpha * E[S]``.
+        """
+        rate = self.beta - self.alpha
+        steady = self.baseline / rate
+        s0 = excitation * np.exp(-self.beta * -min(last_event, 0.0))
+        t = np.arange(1, horizon + 1)
+        return self.baseline * t + self.alpha * (
+            steady * t + (s0 - steady) * (1 - np.exp(-rate * t)) / rate
+        )
+
+    def simulate(
+        self,
+        horizon: int,
+        paths: int = 1000,
+        seed: Optional[int] = None,
+        last_event: float = 0.0,
+        excitation: float = 0.0,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        max_events: int = DEFAULT_MAX_EVENTS,
+    ) -> HawkesSimulation:
+        """Draw ``paths`` sample paths over ``(0, horizon]`` by Ogata thinning.
+
+        Paths start from the running state of :meth:`forecast_state`
+        (``excitation`` at ``last_event``, relative to now) and are advanced
+        together: each round proposes one candidate event per unfinished path
+        from the current intensity, which bounds the intensity until the next
+        event because the kernel only decays. Events are counted in the
+        timestep ``ceil(t)`` they fall in. Reproducible for a given ``seed``.
+
+        Raises ValueError unless ``alpha < beta``: explosive paths never end
+        on their own. Work grows with ``paths`` times the expected event
+        count (:meth:`expected_cumulative`); callers should bound that.
+        """
+        if self.alpha >= self.beta:
+            raise ValueError(
+                "Cannot simulate a non-stationary Hawkes process (alpha >= beta)"
+            )
+        rng = np.random.default_rng(seed)
+        counts = np.zeros(paths * horizon, dtype=np.int64)
+        events = np.zeros(paths, dtype=np.int64)
+        t = np.zeros(paths)
+        s = np.full(paths, excitation * np.exp(-self.beta * -min(last_event, 0.0)))
+        active = np.arange(paths)
+        while active.size:
+            bound = self.baseline + self.alpha * s[active]
+            wait = rng.exponential(1 / bound)
+            t[active] += wait
+            s[active] *= np.exp(-self.beta * wait)
+            inside = t[active] <= horizon
+            accepted = inside & (
+                rng.uniform(size=active.size) * bound
+                <= self.baseline + self.alpha * s[active]
+            )
+            hits = active[accepted]
+            np.add.at(counts, hits * horizon + np.ceil(t[hits]).astype(np.int64) - 1, 1)
+            s[hits] += 1
+            events[hits] += 1
+            active = active[inside & (events[active] < max_events)]
+        counts = counts.reshape(paths, horizon)
+        cumulative = np.cumsum(counts, axis=1)
+        percentiles = list(percentiles)
+        return HawkesSimulation(
+            paths=paths,
+            seed=seed,
+            expected_counts=counts.mean(axis=0),
+            expected_cumulative=cumulative.mean(axis=0),
+            count_bands=dict(
+                zip(percentiles, np.percentile(counts, percentiles, axis=0))
+            ),
+            cumulative_bands=dict(
+                zip(percentiles, np.percentile(cumulative, percentiles, axis=0))
+            ),
+            truncated_paths=int((events >= max_events).sum()),
+        )
+
+    def iter_forecast_batch(
+        self,
+        values: np.ndarray,
+        offsets: np.ndarray,
+        horizon: int,
+        chunk_users: int = DEFAULT_CHUNK_USERS,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield ``(first_user, probabilities)`` per chunk of ``chunk_users`` users."""
+        values = np.asarray(values, dtype=float)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        users = len(offsets) - 1
+        for start in range(0, users, chunk_users):
+            stop = min(start + chunk_users, users)
+            chunk = offsets[start : stop + 1]
+            part = HawkesForecaster(
+                *(
+                    np.asarray(p)[start:stop] if np.ndim(p) else p
+                    for p in (self.baseline, self.alpha, self.beta)
+                )
+            )
+            excitation = part.excitation_csr(
+                values[chunk[0] : chunk[-1]], chunk - chunk[0], horizon
+            )
+            intensity = (
+                np.reshape(part.baseline, (-1, 1))
+                + np.reshape(part.alpha, (-1, 1)) * excitation
+            )
+            yield start, 1 - np.exp(-intensity)
+
+    def forecast_batch(
+        self,
+        values: np.ndarray,
+        offsets: np.ndarray,
+        horizon: int,
+        chunk_users: int = DEFAULT_CHUNK_USERS,
+    ) -> np.ndarray:
+        """:meth:`forecast` for many users at once, from events in CSR layout
+        (see :func:`to_csr`); returns a users x horizon matrix. Parameters
+        may be scalars or per-user arrays."""
+        out = np.empty((len(offsets) - 1, horizon))
+        for start, probs in self.iter_forecast_batch(
+            values, offsets, horizon, chunk_users
+        ):
+            out[start : start + len(probs)] = probs
+        return out
@@ -0,0 +1,169 @@
+"""Fitted Hawkes forecaster parameters, persisted per user.
+
+:func:`fit_all` fits a pooled population prior on a sample of users, then
+every user's own parameters as a MAP estimate under that prior, from their
+review history (``review_events``, in days). Results go to ``hawkes_params``
+so forecasts read them instead of refitting; users without a row fall back
+to the population row, then to the forecaster defaults.
+"""
+
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import sqlite_utils
+
+from src import db as review_db
+from src.forecasters.hawkes import DEFAULT_PRIOR_SCALE, HawkesForecaster
+
+POPULATION = "*"
+# Users whose histories the pooled prior is fitted on.
+DEFAULT_POOL_SAMPLE = 2000
+_PARAMS = ("baseline", "alpha", "beta")
+
+_UPSERT_SQL = """
+INSERT INTO hawkes_params (user_id, baseline, alpha, beta, events, fitted_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    baseline = excluded.baseline,
+    alpha = excluded.alpha,
+    beta = excluded.beta,
+    events = excluded.events,
+    fitted_at = excluded.fitted_at
+"""
+
+
+@dataclass
+class FitReport:
+    users: int = 0
+    events: int = 0
+    prior: Dict[str, float] = field(default_factory=dict)
+    # Fits held at a bound of PARAM_BOUNDS, e.g. too bursty to be stationary
+    prior_at_bound: bool = False
+    users_at_bound: int = 0
+
+
+def get_params_many(
+    user_ids: Iterable[str], db: sqlite_utils.Database
+) -> Dict[str, Dict[str, float]]:
+    """Parameters for each user that has any, the population's standing in
+    for users never fitted; empty if nothing was ever fitted."""
+    user_ids = list(dict.fromkeys(user_ids))
+    rows = {}
+    for start in range(0, len(user_ids) + 1, 500):
+        keys = user_ids[start : start + 500] + [POPULATION]
+        rows.update(
+            (row[0], dict(zip(_PARAMS, row[1:])))
+            for row in db.execute(
+                f"SELECT user_id, {', '.join(_PARAMS)} FROM hawkes_params "
+                f"WHERE user_id IN ({', '.join('?' for _ in keys)})",
+                keys,
+            )
+        )
+    population = rows.get(POPULATION)
+    return {
+        u: rows.get(u, population)
+        for u in user_ids
+        if rows.get(u, population) is not None
+    }
+
+
+def get_params(user_id: str, db: sqlite_utils.Database) -> Optional[Dict[str, float]]:
+    return get_params_many([user_id], db).get(user_id)
+
+
+def save_params(
+    rows: Iterable[Tuple[str, HawkesForecaster, int]], db: sqlite_utils.Database
+) -> None:
+    """Upsert ``(user_id, forecaster, events)`` rows; joins the caller's transaction if any."""
+    fitted_at = datetime.utcnow().isoformat()
+    values = [
+        [user_id, *map(float, f.params), events, fitted_at]
+        for user_id, f, events in rows
+    ]
+    if db.conn.in_transaction:
+        db.conn.executemany(_UPSERT_SQL, values)
+    else:
+        with db.conn:
+            db.conn.executemany(_UPSERT_SQL, values)
+
+
+def iter_user_events(
+    db: sqlite_utils.Database, user_ids: Optional[List[str]] = None
+) -> Iterator[Tuple[str, np.ndarray]]:
+    """Each user's review times, in days (Julian day numbers), in ``user_id`` order."""
+    if user_ids is None:
+        cursor = db.execute(
+            "SELECT user_id, julianday(reviewed_at) FROM review_events ORDER BY user_id"
+        )
+    else:
+        cursor = db.execute(
+            "SELECT user_id, julianday(reviewed_at) FROM review_events "
+            f"WHERE user_id IN ({', '.join('?' for _ in user_ids)}) ORDER BY user_id",
+            user_ids,
+        )
+    for user_id, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+        yield user_id, np.sort(np.fromiter((row[1] for row in rows), dtype=float))
+
+
+def fit_all(
+    db: sqlite_utils.Database,
+    now: Optional[datetime] = None,
+    pool_sample: int = DEFAULT_POOL_SAMPLE,
+    prior_scale: float = DEFAULT_PRIOR_SCALE,
+    batch_size: int = 1000,
+    seed: int = 0,
+    progress: Optional[Callable[[FitReport], None]] = None,
+) -> FitReport:
+    """Fit and persist the population prior and every user's parameters.
+
+    Each user's window runs from their first review to ``now``; users are
+    loaded, fitted and committed ``batch_size`` at a time.
+    """
+    end = julian_day(now or datetime.utcnow())
+    users = [
+        row[0]
+        for row in db.execute(
+            "SELECT DISTINCT user_id FROM review_events ORDER BY user_id"
+        )
+    ]
+    report = FitReport()
+    if not users:
+        return report
+    rng = np.random.default_rng(seed)
+    sample = sorted(
+        rng.choice(users, size=min(pool_sample, len(users)), replace=False).tolist()
+    )
+    histories = [events for _, events in iter_user_events(db, sample)]
+    prior = HawkesForecaster.fit_pooled(histories, [(None, end)] * len(histories))
+    report.prior = dict(zip(_PARAMS, map(float, prior.params)))
+    report.prior_at_bound = prior.at_bound
+    with review_db.write_transaction(db):
+        save_params([(POPULATION, prior, sum(len(h) for h in histories))], db)
+
+    for start in range(0, len(users), batch_size):
+        rows = []
+        for user_id, events in iter_user_events(db, users[start : start + batch_size]):
+            forecaster = HawkesForecaster().fit(
+                events, end=end, prior=prior, prior_scale=prior_scale
+            )
+            rows.append((user_id, forecaster, len(events)))
+            report.users += 1
+            report.events += len(events)
+            report.users_at_bound += forecaster.at_bound
+        with review_db.write_transaction(db):
+            save_params(rows, db)
+        if progress:
+            progress(report)
+    return report
+
+
+def julian_day(moment) -> float:
+    """A naive UTC datetime (or ISO string) on the scale of SQLite's julianday()."""
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    return (moment - datetime(1970, 1, 1)).total_seconds() / 86400.0 + 2440587.5
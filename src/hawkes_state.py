@@ -0,0 +1,182 @@
+"""Per-user Hawkes intensity state, maintained incrementally from reviews.
+
+For each user ``hawkes_state`` keeps the time of their latest review and the
+excitation at that moment, ``sum(exp(-beta * (last_event - t)))`` over all
+their reviews, under the user's fitted ``beta`` (see :mod:`src.hawkes_params`).
+A new review at ``t`` only has to decay that sum to ``t`` and add one, so the
+state is updated in O(1) per review, in the review's own transaction, and a
+forecast reads one row instead of the user's history.
+
+Times are in days (Julian day numbers, as SQLite's ``julianday()``). Refitting
+changes ``beta``; :func:`rebuild` recomputes every state from ``review_events``.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import sqlite_utils
+
+from src import hawkes_params
+from src.hawkes_params import julian_day
+from src.forecasters.hawkes import DEFAULT_CHUNK_USERS, HawkesForecaster
+
+_UPSERT_SQL = """
+INSERT INTO hawkes_state (user_id, last_event, excitation, events)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    last_event = excluded.last_event,
+    excitation = excluded.excitation,
+    events = excluded.events
+"""
+
+
+def get_states(
+    user_ids: Iterable[str], db: sqlite_utils.Database
+) -> Dict[str, Tuple[float, float, int]]:
+    """``(last_event, excitation, events)`` for each user that has reviews."""
+    user_ids = list(dict.fromkeys(user_ids))
+    states = {}
+    for start in range(0, len(user_ids), 500):
+        keys = user_ids[start : start + 500]
+        states.update(
+            (row[0], tuple(row[1:]))
+            for row in db.execute(
+                "SELECT user_id, last_event, excitation, events FROM hawkes_state "
+                f"WHERE user_id IN ({', '.join('?' for _ in keys)})",
+                keys,
+            )
+        )
+    return states
+
+
+def betas(user_ids: List[str], db: sqlite_utils.Database) -> Dict[str, float]:
+    """Decay rate each user's state is kept under: fitted, population, or default."""
+    params = hawkes_params.get_params_many(user_ids, db)
+    default = HawkesForecaster().beta
+    return {u: params[u]["beta"] if u in params else default for u in user_ids}
+
+
+def apply_review_events(events: Iterable[Dict], db: sqlite_utils.Database) -> None:
+    """Fold review events into ``hawkes_state``; runs in the caller's transaction.
+
+    Reviews older than the stored ``last_event`` (e.g. replayed late) are
+    decayed into the sum at ``last_event`` instead.
+    """
+    times: Dict[str, List[float]] = defaultdict(list)
+    for e in events:
+        times[e["user_id"]].append(julian_day(e["reviewed_at"]))
+    if not times:
+        return
+    users = list(times)
+    states = get_states(users, db)
+    decay = betas(users, db)
+    rows = []
+    for user_id in users:
+        last, excitation, count = states.get(user_id, (None, 0.0, 0))
+        beta = decay[user_id]
+        for t in sorted(times[user_id]):
+            if last is None:
+                last, excitation = t, 1.0
+            elif t >= last:
+                last, excitation = t, excitation * np.exp(-beta * (t - last)) + 1.0
+            else:
+                excitation += np.exp(-beta * (last - t))
+            count += 1
+        rows.append([user_id, last, float(excitation), count])
+    db.conn.executemany(_UPSERT_SQL, rows)
+
+
+def rebuild(db: sqlite_utils.Database, batch_size: int = 1000) -> int:
+    """Recompute every user's state from ``review_events`` under their current
+    parameters; returns the number of users. Runs in the caller's transaction, if any.
+    """
+    db.execute("DELETE FROM hawkes_state")
+    users = [
+        row[0]
+        for row in db.execute(
+            "SELECT DISTINCT user_id FROM review_events ORDER BY user_id"
+        )
+    ]
+    for start in range(0, len(users), batch_size):
+        batch = users[start : start + batch_size]
+        decay = betas(batch, db)
+        rows = []
+        for user_id, times in hawkes_params.iter_user_events(db, batch):
+            last = times[-1]
+            rows.append(
+                [
+                    user_id,
+                    last,
+                    float(np.exp(-decay[user_id] * (last - times)).sum()),
+                    len(times),
+                ]
+            )
+        db.conn.executemany(_UPSERT_SQL, rows)
+    return len(users)
+
+
+def iter_forecast_users(
+    user_ids: List[str],
+    horizon: int,
+    db: sqlite_utils.Database,
+    now: Optional[datetime] = None,
+    chunk_users: int = DEFAULT_CHUNK_USERS,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield ``(first_user, probabilities)`` per chunk of ``chunk_users`` users,
+    from the stored states and parameters.
+
+    One row per user, whatever the length of their history; users without
+    reviews get the baseline alone. Chunking bounds the users x horizon
+    working arrays, as in :meth:`HawkesForecaster.iter_forecast_batch`.
+    """
+    now_day = julian_day(now or datetime.utcnow())
+    default = HawkesForecaster()
+    for start in range(0, len(user_ids), chunk_users):
+        chunk = user_ids[start : start + chunk_users]
+        states = get_states(chunk, db)
+        params = hawkes_params.get_params_many(chunk, db)
+        forecaster = HawkesForecaster(
+            *(
+                np.array(
+                    [
+                        params[u][name] if u in params else getattr(default, name)
+                        for u in chunk
+                    ]
+                )
+                for name in ("baseline", "alpha", "beta")
+            )
+        )
+        last = np.array([states[u][0] if u in states else now_day for u in chunk])
+        excitation = np.array([states[u][1] if u in states else 0.0 for u in chunk])
+        yield start, forecaster.forecast_state(last - now_day, excitation, horizon)
+
+
+def forecast_users(
+    user_ids: List[str],
+    horizon: int,
+    db: sqlite_utils.Database,
+    now: Optional[datetime] = None,
+    chunk_users: int = DEFAULT_CHUNK_USERS,
+) -> np.ndarray:
+    """Users x horizon probabilities; see :func:`iter_forecast_users`."""
+    out = np.empty((len(user_ids), horizon))
+    for start, probs in iter_forecast_users(user_ids, horizon, db, now, chunk_users):
+        out[start : start + len(probs)] = probs
+    return out
+
+
+def user_state(
+    user_id: str, db: sqlite_utils.Database, now: Optional[datetime] = None
+) -> Tuple[HawkesForecaster, float, float]:
+    """The user's forecaster and ``(last_event, excitation)`` relative to now,
+    as taken by :meth:`HawkesForecaster.forecast_state` and ``simulate``."""
+    params = hawkes_params.get_params(user_id, db)
+    forecaster = HawkesForecaster(**params) if params else HawkesForecaster()
+    state = get_states([user_id], db).get(user_id)
+    if state is None:
+        return forecaster, 0.0, 0.0
+    return forecaster, state[0] - julian_day(now or datetime.utcnow()), state[1]
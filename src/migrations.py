@@ -0,0 +1,488 @@
+"""Versioned schema migrations keyed on ``PRAGMA user_version``.
+
+Each migration runs once, in order, inside its own transaction together with
+the ``user_version`` bump, so a database is always at a well-defined version.
+Migrations run at service startup (and from ``scripts/migrate.py``); request
+handlers never inspect the schema.
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import Callable, List, NamedTuple
+
+import numpy as np
+import sqlite_utils
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite_utils.Database], None]
+
+
+def _columns(db: sqlite_utils.Database, table: str) -> List[str]:
+    return [row[1] for row in db.execute(f"PRAGMA table_info([{table}])").fetchall()]
+
+
+def _create_verses(db: sqlite_utils.Database) -> None:
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [verses] (
+            [verse_id] TEXT PRIMARY KEY,
+            [text] TEXT,
+            [covenant_tags] TEXT,
+            [emotion_codes] TEXT,
+            [notes] TEXT,
+            [pivot] TEXT,
+            [repetitions] INTEGER,
+            [easiness_factor] FLOAT,
+            [interval] INTEGER,
+            [next_due] TEXT
+        )
+        """
+    )
+    # Databases created before the pivot lens existed lack the column.
+    if "pivot" not in _columns(db, "verses"):
+        db.execute("ALTER TABLE [verses] ADD COLUMN [pivot] TEXT")
+
+
+def _create_verse_reviews(db: sqlite_utils.Database) -> None:
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [verse_reviews] (
+            [user_id] TEXT,
+            [verse_id] TEXT,
+            [ease_factor] FLOAT,
+            [repetition_count] INTEGER,
+            [interval] INTEGER,
+            [next_due] TEXT,
+            PRIMARY KEY ([user_id], [verse_id])
+        )
+        """
+    )
+
+
+def _index_verses_next_due(db: sqlite_utils.Database) -> None:
+    db.execute("CREATE INDEX IF NOT EXISTS idx_verses_next_due ON verses (next_due)")
+
+
+def _index_verse_reviews_user_due(db: sqlite_utils.Database) -> None:
+    # Covering index: per-user due lookups are answered from the index alone,
+    # in next_due order, without touching the table rows.
+    db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_verse_reviews_user_due ON verse_reviews
+            (user_id, next_due, verse_id, ease_factor, repetition_count, interval)
+        """
+    )
+
+
+def _create_tag_junctions(db: sqlite_utils.Database) -> None:
+    # Normalized copies of verses.covenant_tags / verses.emotion_codes so tag
+    # filters and facet counts resolve through indexes instead of JSON decoding.
+    for table, column, source in (
+        ("verse_tags", "tag", "covenant_tags"),
+        ("verse_emotions", "emotion", "emotion_codes"),
+    ):
+        db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS [{table}] (
+                [{column}] TEXT NOT NULL,
+                [verse_id] TEXT NOT NULL,
+                PRIMARY KEY ([{column}], [verse_id])
+            ) WITHOUT ROWID
+            """
+        )
+        db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_verse ON [{table}] (verse_id)"
+        )
+        db.execute(
+            f"""
+            INSERT OR IGNORE INTO [{table}] ([{column}], [verse_id])
+            SELECT j.value, v.verse_id
+            FROM verses AS v, json_each(v.[{source}]) AS j
+            WHERE json_valid(v.[{source}]) AND j.type = 'text'
+            """
+        )
+
+
+def _create_due_histograms(db: sqlite_utils.Database) -> None:
+    # Per-day counts of scheduled reviews, per user and server-wide, kept in
+    # step with verse_reviews by triggers so every write path maintains them.
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [due_histogram] (
+            [day] TEXT PRIMARY KEY,
+            [due_count] INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [user_due_histogram] (
+            [user_id] TEXT NOT NULL,
+            [day] TEXT NOT NULL,
+            [due_count] INTEGER NOT NULL,
+            PRIMARY KEY ([user_id], [day])
+        ) WITHOUT ROWID
+        """
+    )
+    db.execute(
+        """
+        INSERT OR REPLACE INTO [user_due_histogram] ([user_id], [day], [due_count])
+        SELECT user_id, substr(next_due, 1, 10), COUNT(*) FROM verse_reviews GROUP BY 1, 2
+        """
+    )
+    db.execute(
+        """
+        INSERT OR REPLACE INTO [due_histogram] ([day], [due_count])
+        SELECT substr(next_due, 1, 10), COUNT(*) FROM verse_reviews GROUP BY 1
+        """
+    )
+    # (table, key columns before [day])
+    histograms = (("due_histogram", []), ("user_due_histogram", ["user_id"]))
+
+    def bump(row: str) -> str:
+        statements = []
+        for table, keys in histograms:
+            columns = ", ".join(f"[{k}]" for k in keys + ["day"])
+            values = ", ".join(
+                [f"{row}.{k}" for k in keys] + [f"substr({row}.next_due, 1, 10)"]
+            )
+            statements.append(
+                f"""
+                INSERT INTO [{table}] ({columns}, [due_count]) VALUES ({values}, 1)
+                ON CONFLICT ({columns}) DO UPDATE SET due_count = due_count + 1;
+                """
+            )
+        return "".join(statements)
+
+    def drop() -> str:
+        statements = []
+        for table, keys in histograms:
+            where = " AND ".join(
+                [f"{k} = OLD.{k}" for k in keys] + ["day = substr(OLD.next_due, 1, 10)"]
+            )
+            statements.append(
+                f"""
+                UPDATE [{table}] SET due_count = due_count - 1 WHERE {where};
+                DELETE FROM [{table}] WHERE {where} AND due_count <= 0;
+                """
+            )
+        return "".join(statements)
+
+    db.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS verse_reviews_due_insert AFTER INSERT ON verse_reviews
+        BEGIN {bump("NEW")} END
+        """
+    )
+    db.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS verse_reviews_due_update AFTER UPDATE OF next_due ON verse_reviews
+        WHEN substr(OLD.next_due, 1, 10) IS NOT substr(NEW.next_due, 1, 10)
+        BEGIN {drop()} {bump("NEW")} END
+        """
+    )
+    db.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS verse_reviews_due_delete AFTER DELETE ON verse_reviews
+        BEGIN {drop()} END
+        """
+    )
+
+
+def _create_review_events(db: sqlite_utils.Database) -> None:
+    # Append-only history of reviews; verse_reviews keeps only the latest
+    # state. prior_* columns are NULL for a card's first review.
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [review_events] (
+            [event_id] INTEGER PRIMARY KEY,
+            [user_id] TEXT NOT NULL,
+            [verse_id] TEXT NOT NULL,
+            [quality] INTEGER NOT NULL,
+            [reviewed_at] TEXT NOT NULL,
+            [prior_ease_factor] FLOAT,
+            [prior_repetition_count] INTEGER,
+            [prior_interval] INTEGER,
+            [prior_next_due] TEXT,
+            [ease_factor] FLOAT NOT NULL,
+            [repetition_count] INTEGER NOT NULL,
+            [interval] INTEGER NOT NULL,
+            [next_due] TEXT NOT NULL
+        )
+        """
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_review_events_user_verse ON review_events (user_id, verse_id, event_id)"
+    )
+    # Last journal segment each review buffer has committed (see src.review_buffer)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [review_journal_checkpoints] (
+            [journal] TEXT PRIMARY KEY,
+            [segment] INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _create_replay_checkpoints(db: sqlite_utils.Database) -> None:
+    # Shards finished by a replay run (see src.replay), for resuming.
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [replay_checkpoints] (
+            [run_id] TEXT NOT NULL,
+            [shard] TEXT NOT NULL,
+            [events] INTEGER NOT NULL,
+            [states] INTEGER NOT NULL,
+            [completed_at] TEXT NOT NULL,
+            PRIMARY KEY ([run_id], [shard])
+        )
+        """
+    )
+
+
+def _create_user_stats(db: sqlite_utils.Database) -> None:
+    # Per-user rollup maintained from review events (see src.user_stats).
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [user_stats] (
+            [user_id] TEXT PRIMARY KEY,
+            [total_reviews] INTEGER NOT NULL,
+            [lapses] INTEGER NOT NULL,
+            [recall_reviews] INTEGER NOT NULL,
+            [recall_passed] INTEGER NOT NULL,
+            [cards] INTEGER NOT NULL,
+            [ease_sum] FLOAT NOT NULL,
+            [mature_cards] INTEGER NOT NULL,
+            [reviews_today] INTEGER NOT NULL,
+            [today] TEXT NOT NULL
+        )
+        """
+    )
+    # Backfill as of this version; later changes to src.user_stats must not
+    # change what migrating an old database does.
+    db.execute(
+        """
+        INSERT OR REPLACE INTO user_stats (
+            user_id, total_reviews, lapses, recall_reviews, recall_passed, cards, ease_sum, mature_cards,
+            reviews_today, today
+        )
+        SELECT
+            u.user_id,
+            coalesce(e.total_reviews, 0),
+            coalesce(e.lapses, 0),
+            coalesce(e.recall_reviews, 0),
+            coalesce(e.recall_passed, 0),
+            coalesce(c.cards, 0),
+            coalesce(c.ease_sum, 0),
+            coalesce(c.mature_cards, 0),
+            coalesce(t.reviews_today, 0),
+            coalesce(e.today, '')
+        FROM (SELECT user_id FROM verse_reviews UNION SELECT user_id FROM review_events) AS u
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS cards, SUM(ease_factor) AS ease_sum, SUM(interval >= 21) AS mature_cards
+            FROM verse_reviews GROUP BY user_id
+        ) AS c ON c.user_id = u.user_id
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) AS total_reviews,
+                   SUM(prior_repetition_count > 0 AND quality < 3) AS lapses,
+                   SUM(prior_repetition_count > 0) AS recall_reviews,
+                   SUM(prior_repetition_count > 0 AND quality >= 3) AS recall_passed,
+                   MAX(substr(reviewed_at, 1, 10)) AS today
+            FROM review_events GROUP BY user_id
+        ) AS e ON e.user_id = u.user_id
+        LEFT JOIN (
+            SELECT r.user_id, COUNT(*) AS reviews_today
+            FROM review_events AS r
+            JOIN (
+                SELECT user_id, MAX(substr(reviewed_at, 1, 10)) AS today FROM review_events GROUP BY user_id
+            ) AS last ON last.user_id = r.user_id AND substr(r.reviewed_at, 1, 10) = last.today
+            GROUP BY r.user_id
+        ) AS t ON t.user_id = u.user_id
+        """
+    )
+
+
+def _create_daily_decks(db: sqlite_utils.Database) -> None:
+    # Per-user snapshot of the day's due cards (see src.daily_deck).
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [daily_decks] (
+            [user_id] TEXT PRIMARY KEY,
+            [day] TEXT NOT NULL,
+            [built_at] TEXT NOT NULL,
+            [size] INTEGER NOT NULL,
+            [remaining] INTEGER NOT NULL
+        )
+        """
+    )
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [daily_deck_items] (
+            [user_id] TEXT NOT NULL,
+            [position] INTEGER NOT NULL,
+            [verse_id] TEXT NOT NULL,
+            PRIMARY KEY ([user_id], [position])
+        ) WITHOUT ROWID
+        """
+    )
+    # Reviews pop cards by (user_id, verse_id)
+    db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_deck_items_card ON daily_deck_items (user_id, verse_id)"
+    )
+    db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS daily_deck_items_pop AFTER DELETE ON daily_deck_items
+        BEGIN
+            UPDATE [daily_decks] SET remaining = remaining - 1 WHERE user_id = OLD.user_id;
+        END
+        """
+    )
+
+
+def _add_priority_keys(db: sqlite_utils.Database) -> None:
+    # Backlog triage order (lower is more urgent): the due date pushed back
+    # by the card's memory strength, interval x ease, i.e. roughly the next
+    # interval SM-2 would grant. Among cards overdue by the same amount the
+    # weakest comes first. Unlike "days overdue / interval" the key does not
+    # depend on the current time, so a virtual column can be indexed and
+    # top-k read straight off the index.
+    for table, ease in (
+        ("verse_reviews", "ease_factor"),
+        ("verses", "easiness_factor"),
+    ):
+        # Generated columns are hidden from PRAGMA table_info
+        if "priority_key" not in [
+            row[1] for row in db.execute(f"PRAGMA table_xinfo([{table}])")
+        ]:
+            db.execute(
+                f"ALTER TABLE [{table}] ADD COLUMN [priority_key] FLOAT "
+                f"GENERATED ALWAYS AS (julianday(next_due) + interval * {ease}) VIRTUAL"
+            )
+    # Covering, like idx_verse_reviews_user_due
+    db.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_verse_reviews_user_priority ON verse_reviews
+            (user_id, priority_key, next_due, verse_id, ease_factor, repetition_count, interval)
+        """
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_verses_priority ON verses (priority_key, next_due)"
+    )
+
+
+def _create_hawkes_params(db: sqlite_utils.Database) -> None:
+    # Fitted forecaster parameters per user (see src.hawkes_params); the
+    # pooled population prior is stored under user_id '*'.
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [hawkes_params] (
+            [user_id] TEXT PRIMARY KEY,
+            [baseline] FLOAT NOT NULL,
+            [alpha] FLOAT NOT NULL,
+            [beta] FLOAT NOT NULL,
+            [events] INTEGER NOT NULL,
+            [fitted_at] TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _create_hawkes_state(db: sqlite_utils.Database) -> None:
+    # Running forecaster state per user (see src.hawkes_state).
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS [hawkes_state] (
+            [user_id] TEXT PRIMARY KEY,
+            [last_event] FLOAT NOT NULL,
+            [excitation] FLOAT NOT NULL,
+            [events] INTEGER NOT NULL
+        )
+        """
+    )
+    # Backfill as of this version (see _create_user_stats): each user's
+    # excitation at their last review under their fitted beta, else the
+    # population's, else the forecaster default of 1.0.
+    beta = dict(db.execute("SELECT user_id, beta FROM hawkes_params").fetchall())
+    default = beta.get("*", 1.0)
+    cursor = db.execute(
+        "SELECT user_id, julianday(reviewed_at) FROM review_events ORDER BY user_id"
+    )
+    for user_id, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+        times = np.fromiter((row[1] for row in rows), dtype=float)
+        last = times.max()
+        excitation = np.exp(-beta.get(user_id, default) * (last - times)).sum()
+        db.execute(
+            "INSERT OR REPLACE INTO hawkes_state (user_id, last_event, excitation, events) VALUES (?, ?, ?, ?)",
+            [user_id, last, float(excitation), len(times)],
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create verses table", _create_verses),
+    Migration(2, "create verse_reviews table", _create_verse_reviews),
+    Migration(3, "index verses.next_due", _index_verses_next_due),
+    Migration(
+        4, "index verse_reviews by (user_id, next_due)", _index_verse_reviews_user_due
+    ),
+    Migration(
+        5, "create verse_tags and verse_emotions junction tables", _create_tag_junctions
+    ),
+    Migration(
+        6,
+        "create per-day due histograms maintained by triggers",
+        _create_due_histograms,
+    ),
+    Migration(7, "create review_events log", _create_review_events),
+    Migration(8, "create replay_checkpoints table", _create_replay_checkpoints),
+    Migration(9, "create user_stats rollup", _create_user_stats),
+    Migration(10, "create daily_decks and daily_deck_items", _create_daily_decks),
+    Migration(
+        11,
+        "add indexed overdue priority_key to verse_reviews and verses",
+        _add_priority_keys,
+    ),
+    Migration(12, "create hawkes_params table", _create_hawkes_params),
+    Migration(13, "create hawkes_state table", _create_hawkes_state),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(db: sqlite_utils.Database) -> int:
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending(db: sqlite_utils.Database) -> List[Migration]:
+    """Return the migrations not yet applied to ``db``, in order."""
+    version = current_version(db)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(db: sqlite_utils.Database, target: int = LATEST_VERSION) -> List[Migration]:
+    """Apply pending migrations up to ``target`` and return the ones applied."""
+    applied = []
+    conn = db.conn
+    for migration in pending(db):
+        if migration.version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        if current_version(db) >= migration.version:
+            # Another process migrated while we waited for the write lock.
+            conn.rollback()
+            continue
+        try:
+            migration.apply(db)
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(migration)
+        print(f"Applied migration {migration.version}: {migration.description}")
+    return applied
@@ -1,12 +1,24 @@
-
 import os
+import secrets
 from fastapi import FastAPI, Depends, HTTPException, Header
 import re
 from typing import List
 
 # Import the schemas
-from src.schemas import PivotIn, PivotOut, PivotPoint, ForecastRequest, ForecastPoint
-from src.forecasters.hawkes import HawkesForecaster
+from src.schemas import (
+    PivotIn,
+    PivotOut,
+    PivotPoint,
+    ForecastRequest,
+    ForecastPoint,
+    ForecastBatchRequest,
+    ForecastBatchResponse,
+    ForecastSimulationRequest,
+    ForecastSimulationResponse,
+    SimulationBand,
+)
+from src import db as review_db
+from src import hawkes_state, migrations
 
 # Import the modular detectors
 from src.detectors import chiastic, golden
@@ -15,6 +27,8 @@ from src.detectors import chiastic, golden
 API_KEY = os.getenv("SANCTUM_API_KEY")
 if not API_KEY:
     raise ValueError("SANCTUM_API_KEY environment variable not set.")
+# Most events one /forecast/simulate request may expect to draw (paths x E[N(horizon)])
+SIMULATION_MAX_EVENTS = int(os.getenv("SANCTUM_SIMULATION_MAX_EVENTS", "2000000"))
 
 app = FastAPI(
     title="Sanctum Pivot Analyzer Service",
@@ -22,24 +36,95 @@ app = FastAPI(
     version="1.2.0",
 )
 
+
 # --- API Key Dependency ---
 async def verify_api_key(x_api_key: str = Header(...)):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
 
-# --- Dummy Data for Forecaster ---
-# In a real system, this would come from a user event database.
-DUMMY_USER_EVENTS = {
-    "u1": [1, 2, 5, 8, 12, 13],
-    "u2": [3, 7, 9],
-}
+
+def forecast_users(user_ids: List[str], horizon: int) -> List[List[float]]:
+    """
+    Users x horizon probabilities from each user's stored intensity state and
+    fitted parameters (see src.hawkes_state), independent of history length.
+    Computed a chunk of users at a time, so only one chunk's arrays are held.
+    """
+    probabilities: List[List[float]] = []
+    with review_db.get_pool().connection() as db:
+        for _, probs in hawkes_state.iter_forecast_users(user_ids, horizon, db):
+            probabilities.extend(probs.tolist())
+    return probabilities
+
+
+def simulate_user(
+    req: ForecastSimulationRequest, seed: int
+) -> ForecastSimulationResponse:
+    """Monte Carlo paths for one user, starting from their stored intensity state."""
+    with review_db.get_pool().connection() as db:
+        forecaster, last_event, excitation = hawkes_state.user_state(req.user_id, db)
+    if forecaster.alpha >= forecaster.beta:
+        raise HTTPException(
+            status_code=422,
+            detail="The user's fitted parameters are not stationary (alpha >= beta); "
+            "refit them with scripts/fit_hawkes.py",
+        )
+    expected = forecaster.expected_cumulative(req.horizon, last_event, excitation)[-1]
+    if req.paths * expected > SIMULATION_MAX_EVENTS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Simulation would draw about {req.paths * expected:.0f} events "
+            f"(limit {SIMULATION_MAX_EVENTS}); request fewer paths or a shorter horizon",
+        )
+    result = forecaster.simulate(
+        req.horizon,
+        paths=req.paths,
+        seed=seed,
+        last_event=last_event,
+        excitation=excitation,
+        percentiles=req.percentiles,
+    )
+    return ForecastSimulationResponse(
+        user_id=req.user_id,
+        horizon=req.horizon,
+        paths=req.paths,
+        seed=seed,
+        expected_counts=result.expected_counts.tolist(),
+        expected_cumulative=result.expected_cumulative.tolist(),
+        bands=[
+            SimulationBand(
+                percentile=p,
+                counts=result.count_bands[p].tolist(),
+                cumulative=result.cumulative_bands[p].tolist(),
+            )
+            for p in req.percentiles
+        ],
+        truncated_paths=result.truncated_paths,
+    )
+
 
 # --- API Endpoints ---
-@app.post("/analyze_text", response_model=List[PivotOut], dependencies=[Depends(verify_api_key)])
+@app.on_event("startup")
+async def startup_event():
+    # Bring the schema up to date once, before serving any request
+    with review_db.get_pool().connection() as db:
+        migrations.migrate(db)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    review_db.shutdown_executor()
+    review_db.close_pool()
+
+
+@app.post(
+    "/analyze_text",
+    response_model=List[PivotOut],
+    dependencies=[Depends(verify_api_key)],
+)
 async def perform_analysis(payload: PivotIn) -> List[PivotOut]:
     """Analyzes text for chiastic and golden ratio patterns based on selected lenses."""
     try:
-        tokens = re.findall(r'\b\w+\b', payload.text_section.lower())
+        tokens = re.findall(r"\b\w+\b", payload.text_section.lower())
         points: List[PivotPoint] = []
 
         if "CHIASMUS" in payload.lens:
@@ -48,36 +133,37 @@ async def perform_analysis(payload: PivotIn) -> List[PivotOut]:
                 points.append(
                     PivotPoint(detector="chiastic", position=res[0], score=res[1])
                 )
-        
+
         if "GOLDEN" in payload.lens:
             idx = golden.detect(tokens)
             if idx is not None:
                 points.append(PivotPoint(detector="golden", position=idx, score=1.0))
-        
+
         pivot_result = PivotOut(
-            text_section=payload.text_section,
-            scale=payload.scale,
-            points=points
+            text_section=payload.text_section, scale=payload.scale, points=points
         )
-        
+
         return [pivot_result]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/forecast", response_model=List[ForecastPoint], dependencies=[Depends(verify_api_key)])
+
+@app.post(
+    "/forecast",
+    response_model=List[ForecastPoint],
+    dependencies=[Depends(verify_api_key)],
+)
 async def forecast_events(req: ForecastRequest) -> List[ForecastPoint]:
     """
     Forecasts the probability of a pivot event for a user over a given horizon.
     """
     try:
-        # Get historical events for the user (using dummy data for now)
-        events = DUMMY_USER_EVENTS.get(req.user_id, [])
+        # One state row and one parameter row; never refitted here
+        probabilities = (
+            await review_db.run_in_db(forecast_users, [req.user_id], req.horizon)
+        )[0]
 
-        # Initialize and run the forecaster
-        forecaster = HawkesForecaster()
-        probabilities = forecaster.forecast(events=events, horizon=req.horizon)
-        
         # Format the response
         response = [
             ForecastPoint(timestep=i + 1, probability=prob)
@@ -89,7 +175,44 @@ async def forecast_events(req: ForecastRequest) -> List[ForecastPoint]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post(
+    "/forecast/batch",
+    response_model=ForecastBatchResponse,
+    dependencies=[Depends(verify_api_key)],
+)
+async def forecast_events_batch(req: ForecastBatchRequest) -> ForecastBatchResponse:
+    """
+    Forecasts many users at once, computing the intensity curves in
+    vectorized passes over their stored states, one chunk of users at a time.
+    """
+    probabilities = await review_db.run_in_db(forecast_users, req.user_ids, req.horizon)
+    return ForecastBatchResponse(
+        horizon=req.horizon, user_ids=req.user_ids, probabilities=probabilities
+    )
+
+
+@app.post(
+    "/forecast/simulate",
+    response_model=ForecastSimulationResponse,
+    dependencies=[Depends(verify_api_key)],
+)
+async def simulate_forecast(
+    req: ForecastSimulationRequest,
+) -> ForecastSimulationResponse:
+    """
+    Simulates many sample paths of the user's process (Ogata thinning) and
+    returns expected event counts with percentile bands per timestep. Pass the
+    returned `seed` back to reproduce a result. Requests expected to draw
+    more than `SANCTUM_SIMULATION_MAX_EVENTS` events in total are rejected;
+    `truncated_paths` counts paths stopped early by the per-path event cap,
+    which pull the expectations and bands down.
+    """
+    seed = req.seed if req.seed is not None else secrets.randbits(32)
+    return await review_db.run_in_db(simulate_user, req, seed)
+
+
 if __name__ == "__main__":
     import uvicorn
+
     print("Starting Pivot Analyzer Service. Ensure SANCTUM_API_KEY is set.")
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,328 @@
+"""Rebuild ``verse_reviews`` from the recorded review history.
+
+Events are grouped by (user, verse) and applied in ``reviewed_at`` order
+with :func:`~src.algorithms.sm2.update_sm2_stats` semantics, each review
+using its historical timestamp as ``now``, starting from a fresh card. The
+result is plain SM-2: due dates moved by load balancing are not reproduced.
+Cards without events are left untouched.
+
+History is processed in shards of whole users, so memory is bounded by the
+shard size. Shards run in a process pool; each one writes its states and a
+``replay_checkpoints`` row in one transaction, so an interrupted run resumes
+where it stopped when started again with the same ``run_id``.
+
+The history can come from the ``review_events`` table or from an export
+written by :mod:`src.event_log`; the export is first partitioned by user
+into per-shard spill files.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import db as review_db
+from src.algorithms.sm2 import sm2_arrays
+from src.event_log import iter_event_chunks, load_dictionaries
+
+DEFAULT_SHARD_EVENTS = 1_000_000
+# Shards commit one large transaction each; wait for other workers' commits.
+REPLAY_BUSY_TIMEOUT_MS = 600_000
+
+
+class Events(NamedTuple):
+    user_id: np.ndarray
+    verse_id: np.ndarray
+    quality: np.ndarray
+    reviewed_at: np.ndarray  # datetime64[us]
+    event_id: np.ndarray
+
+
+@dataclass(frozen=True)
+class Shard:
+    key: str
+    first_user: Optional[str] = None
+    last_user: Optional[str] = None
+    path: Optional[str] = None
+
+
+@dataclass
+class ReplayReport:
+    shards: int = 0
+    skipped: int = 0
+    events: int = 0
+    states: int = 0
+
+
+def replay_events(events: Events) -> List[Dict]:
+    """Final SM-2 state of every (user, verse) in ``events``.
+
+    Vectorized across cards: events are ranked within their card, and step
+    ``k`` applies every card's ``k``-th review in one array operation.
+    """
+    if not len(events.quality):
+        return []
+    if ((events.quality < 0) | (events.quality > 5)).any():
+        raise ValueError("q rating must be between 0 and 5")
+    user_code, users = pd.factorize(events.user_id)
+    verse_code, verses = pd.factorize(events.verse_id)
+    card = user_code.astype(np.int64) * len(verses) + verse_code
+    order = np.lexsort((events.event_id, events.reviewed_at, card))
+    card = card[order]
+    quality = events.quality[order].astype(np.int64)
+    reviewed_at = events.reviewed_at[order]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(card)) + 1))
+    sizes = np.diff(np.append(starts, len(card)))
+    rank = np.arange(len(card)) - np.repeat(starts, sizes)
+    # Card index (0..cards-1) of each event
+    slot = np.repeat(np.arange(len(starts)), sizes)
+
+    ease = np.full(len(starts), 2.5)
+    reps = np.zeros(len(starts), dtype=np.int64)
+    interval = np.zeros(len(starts), dtype=np.int64)
+    by_rank = np.argsort(rank, kind="stable")
+    bounds = np.searchsorted(rank[by_rank], np.arange(sizes.max() + 1))
+    for step in range(sizes.max()):
+        index = by_rank[bounds[step] : bounds[step + 1]]
+        cards = slot[index]
+        ease[cards], reps[cards], interval[cards] = sm2_arrays(
+            ease[cards], reps[cards], interval[cards], quality[index]
+        )
+
+    last = starts + sizes - 1
+    next_due = (reviewed_at[last] + interval.astype("timedelta64[D]")).astype(object)
+    card_user = np.asarray(users)[user_code[order][starts]]
+    card_verse = np.asarray(verses)[verse_code[order][starts]]
+    return [
+        {
+            "user_id": str(u),
+            "verse_id": str(v),
+            "ease_factor": float(e),
+            "repetition_count": int(n),
+            "interval": int(i),
+            "next_due": d,
+        }
+        for u, v, e, n, i, d in zip(
+            card_user, card_verse, ease, reps, interval, next_due
+        )
+    ]
+
+
+class TableSource:
+    """Review history from the ``review_events`` table, sharded by user range."""
+
+    def __init__(self, db_path: str, shard_events: int = DEFAULT_SHARD_EVENTS) -> None:
+        self.db_path = db_path
+        self.shard_events = shard_events
+
+    def shards(self) -> List[Shard]:
+        shards: List[Shard] = []
+        first, last, count = None, None, 0
+        db = review_db._open(self.db_path)
+        try:
+            # Walks idx_review_events_user_verse; only shard bounds are kept.
+            for user_id, events in db.execute(
+                "SELECT user_id, COUNT(*) FROM review_events GROUP BY user_id ORDER BY user_id"
+            ):
+                if first is not None and count + events > self.shard_events:
+                    shards.append(Shard(f"users:{first}..{last}", first, last))
+                    first, count = None, 0
+                first = user_id if first is None else first
+                last, count = user_id, count + events
+        finally:
+            db.close()
+        if first is not None:
+            shards.append(Shard(f"users:{first}..{last}", first, last))
+        return shards
+
+    def load(self, shard: Shard) -> Events:
+        db = review_db._open(self.db_path)
+        try:
+            rows = db.execute(
+                "SELECT user_id, verse_id, quality, reviewed_at, event_id FROM review_events "
+                "WHERE user_id BETWEEN ? AND ?",
+                [shard.first_user, shard.last_user],
+            ).fetchall()
+        finally:
+            db.close()
+        if not rows:
+            return _empty_events()
+        user_id, verse_id, quality, reviewed_at, event_id = zip(*rows)
+        return Events(
+            np.array(user_id, dtype=object),
+            np.array(verse_id, dtype=object),
+            np.array(quality, dtype=np.int64),
+            np.array(reviewed_at, dtype="datetime64[us]"),
+            np.array(event_id, dtype=np.int64),
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class ExportSource:
+    """Review history from an :mod:`src.event_log` export.
+
+    :meth:`shards` partitions the export by user code into ``shard_count``
+    spill directories (one pass, one export part in memory at a time).
+    """
+
+    def __init__(
+        self, export_dir: str, shard_count: int = 16, spill_dir: Optional[str] = None
+    ) -> None:
+        self.export_dir = export_dir
+        self.shard_count = shard_count
+        self._owns_spill = spill_dir is None
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="sanctum-replay-")
+
+    def shards(self) -> List[Shard]:
+        paths = [
+            os.path.join(self.spill_dir, f"shard-{i:04d}")
+            for i in range(self.shard_count)
+        ]
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+        for part, chunk in enumerate(iter_event_chunks(self.export_dir)):
+            target = chunk["user"] % self.shard_count
+            for i, path in enumerate(paths):
+                mask = target == i
+                if mask.any():
+                    np.savez(
+                        os.path.join(path, f"part-{part:05d}.npz"),
+                        **{
+                            name: chunk[name][mask]
+                            for name in (
+                                "user",
+                                "verse",
+                                "quality",
+                                "reviewed_at",
+                                "event_id",
+                            )
+                        },
+                    )
+        return [
+            Shard(f"export:{i}/{self.shard_count}", path=path)
+            for i, path in enumerate(paths)
+            if os.listdir(path)
+        ]
+
+    def load(self, shard: Shard) -> Events:
+        parts = []
+        for path in sorted(glob.glob(os.path.join(shard.path, "part-*.npz"))):
+            with np.load(path) as part:
+                parts.append({name: part[name] for name in part.files})
+        if not parts:
+            return _empty_events()
+        columns = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        dictionaries = load_dictionaries(self.export_dir)
+        return Events(
+            dictionaries["user"][columns["user"]],
+            dictionaries["verse"][columns["verse"]],
+            columns["quality"].astype(np.int64),
+            columns["reviewed_at"],
+            columns["event_id"],
+        )
+
+    def close(self) -> None:
+        if self._owns_spill:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def _empty_events() -> Events:
+    return Events(
+        np.array([], dtype=object),
+        np.array([], dtype=object),
+        np.array([], dtype=np.int64),
+        np.array([], dtype="datetime64[us]"),
+        np.array([], dtype=np.int64),
+    )
+
+
+def _completed_shards(db_path: str, run_id: str) -> set:
+    db = review_db._open(db_path)
+    try:
+        return {
+            row[0]
+            for row in db.execute(
+                "SELECT shard FROM replay_checkpoints WHERE run_id = ?", [run_id]
+            )
+        }
+    finally:
+        db.close()
+
+
+def replay_shard(db_path: str, run_id: str, source, shard: Shard) -> Tuple[int, int]:
+    """Replay one shard and commit its states with its checkpoint; returns (events, states)."""
+    events = source.load(shard)
+    states = replay_events(events)
+    db = review_db._open(db_path)
+    try:
+        db.execute(f"PRAGMA busy_timeout={REPLAY_BUSY_TIMEOUT_MS}")
+        with review_db.write_transaction(db):
+            review_db.save_review_states(states, db=db)
+            db.execute(
+                "INSERT OR REPLACE INTO replay_checkpoints (run_id, shard, events, states, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    run_id,
+                    shard.key,
+                    len(events.quality),
+                    len(states),
+                    datetime.utcnow().isoformat(),
+                ],
+            )
+    finally:
+        db.close()
+    return len(events.quality), len(states)
+
+
+def run_replay(
+    db_path: str,
+    source,
+    run_id: str = "replay",
+    workers: int = 1,
+    progress: Optional[Callable[[ReplayReport], None]] = None,
+) -> ReplayReport:
+    """Replay every shard of ``source`` not yet checkpointed under ``run_id``.
+
+    ``workers > 1`` runs shards in a process pool; ``source`` must pickle.
+    """
+    report = ReplayReport()
+    try:
+        shards = source.shards()
+        done = _completed_shards(db_path, run_id)
+        todo = [s for s in shards if s.key not in done]
+        report.skipped = len(shards) - len(todo)
+
+        def finished(events: int, states: int) -> None:
+            report.shards += 1
+            report.events += events
+            report.states += states
+            if progress:
+                progress(report)
+
+        if workers <= 1:
+            for shard in todo:
+                finished(*replay_shard(db_path, run_id, source, shard))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(replay_shard, db_path, run_id, source, shard)
+                    for shard in todo
+                ]
+                for future in as_completed(futures):
+                    finished(*future.result())
+    finally:
+        source.close()
+    return report
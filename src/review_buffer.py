@@ -0,0 +1,297 @@
+"""Write-behind buffer for user review states.
+
+In write-behind mode a review is acknowledged once it is appended to a local
+journal; the new SM-2 state is kept in memory (so later reads see it) and
+written to ``verse_reviews``, with its ``review_events`` rows, by a
+background thread in group commits, every ``flush_interval_ms`` or as soon
+as ``flush_max_items`` states are pending.
+
+The journal is a sequence of NDJSON segments (``<journal>.<seq>``). A flush
+seals the active segment and starts a new one; sealed segments are deleted
+only after their reviews are committed. The flush records the last sealed
+segment in ``review_journal_checkpoints`` in the same transaction, so on
+startup exactly the uncommitted segments are replayed and flushed: reviews
+acknowledged before a crash are neither lost nor logged twice.
+
+Write-behind mode is single-process: buffered states live in one process's
+memory and its journal is replayed by whichever process starts next. A
+buffer holds an exclusive lock on ``<journal>.lock`` while running, so a
+second worker or container on the same journal refuses to start instead of
+replaying (and deleting) the live segments of the first. Run the service
+with one worker when ``SANCTUM_REVIEW_WRITE_BEHIND=1``.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src import daily_deck, db as review_db, hawkes_state, user_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single worker by convention
+    fcntl = None
+
+WRITE_BEHIND = os.getenv("SANCTUM_REVIEW_WRITE_BEHIND", "0") == "1"
+FLUSH_INTERVAL_MS = int(os.getenv("SANCTUM_REVIEW_FLUSH_INTERVAL_MS", "200"))
+FLUSH_MAX_ITEMS = int(os.getenv("SANCTUM_REVIEW_FLUSH_MAX_ITEMS", "500"))
+# fsync each journal append; without it a power loss (not a process crash)
+# can drop the last acknowledged reviews.
+JOURNAL_FSYNC = os.getenv("SANCTUM_REVIEW_JOURNAL_FSYNC", "1") == "1"
+
+Key = Tuple[str, str]
+
+
+def default_journal_path() -> str:
+    return os.getenv("SANCTUM_REVIEW_JOURNAL", review_db.DB_PATH + "-reviews.journal")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode(record: Dict) -> str:
+    return json.dumps(record, default=_json_default)
+
+
+class ReviewBuffer:
+    """In-memory review states, journaled locally and flushed in group commits."""
+
+    def __init__(
+        self,
+        journal_path: Optional[str] = None,
+        flush_interval_ms: int = FLUSH_INTERVAL_MS,
+        flush_max_items: int = FLUSH_MAX_ITEMS,
+        fsync: bool = JOURNAL_FSYNC,
+    ) -> None:
+        self.journal_path = journal_path or default_journal_path()
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_items = flush_max_items
+        self.fsync = fsync
+        # Held by callers across a read-modify-write of buffered states.
+        self.lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Key, Dict] = {}
+        self._flushing: Dict[Key, Dict] = {}
+        self._events: List[Dict] = []
+        self._seq = 0
+        self._journal = None
+        self._lock_file = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+    def start(self, background: bool = True) -> "ReviewBuffer":
+        """Replay and flush any journal left by a previous run, then start flushing.
+
+        Raises RuntimeError if another process is using the journal.
+        """
+        self._lock_journal()
+        self.recover()
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="sanctum-review-flush", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the flusher and commit everything still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self.lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _lock_journal(self) -> None:
+        if fcntl is None or self._lock_file is not None:
+            return
+        path = self.journal_path + ".lock"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        lock_file = open(path, "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Review journal {self.journal_path} is in use by another process. "
+                "Write-behind mode supports a single worker per database; run one "
+                "worker or set SANCTUM_REVIEW_WRITE_BEHIND=0."
+            )
+        self._lock_file = lock_file
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # keep the states buffered and retry next tick
+                print(f"Review buffer flush failed: {e}")
+
+    # --- reads and writes ---
+    def get(self, user_id: str, verse_id: str) -> Optional[Dict]:
+        """Return the buffered state for a (user, verse), or None if not buffered."""
+        key = (user_id, verse_id)
+        with self.lock:
+            return self._pending.get(key) or self._flushing.get(key)
+
+    def states_for_user(self, user_id: str) -> List[Dict]:
+        """All buffered (not yet committed) states of one user."""
+        with self.lock:
+            merged = {**self._flushing, **self._pending}
+        return [state for (uid, _), state in merged.items() if uid == user_id]
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return len(self._pending)
+
+    def record(self, states: Iterable[Dict], events: Iterable[Dict] = ()) -> None:
+        """Journal new states and their review events (durably, before
+        returning) and make the states visible to reads."""
+        states = list(states)
+        events = list(events)
+        if not states and not events:
+            return
+        with self.lock:
+            journal = self._active_journal()
+            journal.write(
+                "".join(_encode(s) + "\n" for s in states)
+                + "".join(_encode({"event": e}) + "\n" for e in events)
+            )
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+            for state in states:
+                self._pending[(state["user_id"], state["verse_id"])] = state
+            self._events.extend(events)
+            if len(self._pending) >= self.flush_max_items:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """Commit pending states and events in one transaction; returns the state count."""
+        with self._flush_lock:
+            with self.lock:
+                if not self._pending and not self._events:
+                    return 0
+                batch, events = self._pending, self._events
+                self._pending, self._events = {}, []
+                self._flushing = batch
+                sealed = self._seq
+                self._seal_journal()
+            try:
+                with review_db.get_pool().connection() as db:
+                    with review_db.write_transaction(db):
+                        review_db.save_review_states(batch.values(), db=db)
+                        review_db.append_review_events(events, db=db)
+                        user_stats.apply_review_events(events, db)
+                        hawkes_state.apply_review_events(events, db)
+                        daily_deck.pop_cards(batch.keys(), db)
+                        db.execute(
+                            "INSERT INTO review_journal_checkpoints (journal, segment) VALUES (?, ?) "
+                            "ON CONFLICT (journal) DO UPDATE SET segment = excluded.segment",
+                            [self._checkpoint_key, sealed],
+                        )
+            except Exception:
+                with self.lock:
+                    # Newer states recorded meanwhile win over the failed batch.
+                    self._pending = {**batch, **self._pending}
+                    self._events = events + self._events
+                    self._flushing = {}
+                raise
+            with self.lock:
+                self._flushing = {}
+            for seq, path in self._segments():
+                if seq <= sealed:
+                    os.remove(path)
+            return len(batch)
+
+    # --- journal ---
+    def recover(self) -> int:
+        """Load reviews from uncommitted journal segments and flush them; returns the state count."""
+        recovered: Dict[Key, Dict] = {}
+        events: List[Dict] = []
+        committed = self._committed_segment()
+        segments = self._segments()
+        for seq, path in segments:
+            if seq <= committed:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append; the review
+                        # was never acknowledged.
+                        continue
+                    if "event" in record:
+                        events.append(record["event"])
+                    else:
+                        recovered[(record["user_id"], record["verse_id"])] = record
+        with self.lock:
+            # Never reuse a segment number the checkpoint already covers.
+            self._seq = max(segments[-1][0] + 1 if segments else 0, committed + 1)
+            self._pending = {**recovered, **self._pending}
+            self._events = events + self._events
+        if recovered:
+            print(
+                f"Recovered {len(recovered)} buffered review states from the journal."
+            )
+        self.flush()
+        # flush() only removes segments it sealed; drop empty leftovers too.
+        for seq, path in self._segments():
+            if seq < self._seq:
+                os.remove(path)
+        return len(recovered)
+
+    @property
+    def _checkpoint_key(self) -> str:
+        return os.path.abspath(self.journal_path)
+
+    def _committed_segment(self) -> int:
+        with review_db.get_pool().connection() as db:
+            row = db.execute(
+                "SELECT segment FROM review_journal_checkpoints WHERE journal = ?",
+                [self._checkpoint_key],
+            ).fetchone()
+        return row[0] if row else -1
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for path in glob.glob(glob.escape(self.journal_path) + ".*"):
+            suffix = path.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                segments.append((int(suffix), path))
+        return sorted(segments)
+
+    def _active_journal(self):
+        if self._journal is None:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True
+            )
+            self._journal = open(
+                f"{self.journal_path}.{self._seq:08d}", "a", encoding="utf-8"
+            )
+        return self._journal
+
+    def _seal_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._seq += 1
@@ -0,0 +1,130 @@
+"""In-memory per-user due queues for "what should this user review next".
+
+Each active user gets a min-heap of ``(next_due, verse_id)``, hydrated from
+``verse_reviews`` on first access and updated in place as reviews land, so
+the next card is a heap peek instead of a query. The database stays the
+source of truth: a user's heap can be evicted (least recently used first)
+whenever the configured caps are exceeded and is simply rebuilt on demand.
+
+Heaps use lazy deletion: a review pushes the card's new entry and leaves
+the old one behind; stale entries are skipped when they reach the top, and
+a heap is compacted once stale entries outnumber live ones.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlite_utils
+
+MAX_USERS = int(os.getenv("SANCTUM_SCHEDULER_MAX_USERS", "10000"))
+MAX_CARDS = int(os.getenv("SANCTUM_SCHEDULER_MAX_CARDS", "2000000"))
+
+
+def _due_key(next_due) -> str:
+    # verse_reviews stores ISO 8601 strings, which sort chronologically.
+    return next_due.isoformat() if isinstance(next_due, datetime) else next_due
+
+
+class _UserQueue:
+    __slots__ = ("heap", "due")
+
+    def __init__(self, cards: Iterable[Tuple[str, str]]) -> None:
+        self.due: Dict[str, str] = {verse_id: due for verse_id, due in cards}
+        self.heap: List[Tuple[str, str]] = [
+            (due, verse_id) for verse_id, due in self.due.items()
+        ]
+        heapq.heapify(self.heap)
+
+    def push(self, verse_id: str, due: str) -> None:
+        self.due[verse_id] = due
+        heapq.heappush(self.heap, (due, verse_id))
+        if len(self.heap) > 2 * len(self.due) + 16:
+            self.heap = [(d, v) for v, d in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        heap = self.heap
+        while heap and self.due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+
+class DueScheduler:
+    """LRU-bounded collection of per-user due heaps."""
+
+    def __init__(self, max_users: int = MAX_USERS, max_cards: int = MAX_CARDS) -> None:
+        self.max_users = max_users
+        self.max_cards = max_cards
+        self._users: "OrderedDict[str, _UserQueue]" = OrderedDict()
+        self._cards = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def next_card(
+        self, user_id: str, db: sqlite_utils.Database, overlay: Iterable[Dict] = ()
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Return ``(verse_id, next_due)`` of the user's earliest-due card, or
+        None if they have none. ``overlay`` holds states newer than the
+        database (e.g. buffered reviews) and is only used when hydrating.
+        """
+        with self._lock:
+            queue = self._users.get(user_id)
+            if queue is None:
+                queue = self._hydrate(user_id, db, overlay)
+            else:
+                self._users.move_to_end(user_id)
+            before = len(queue.heap)
+            top = queue.peek()
+            self._cards -= before - len(queue.heap)
+        return (top[1], top[0]) if top else None
+
+    def update(self, user_id: str, verse_id: str, next_due) -> None:
+        """Record a card's new due date; a no-op for users not held in memory."""
+        with self._lock:
+            queue = self._users.get(user_id)
+            if queue is None:
+                return
+            self._users.move_to_end(user_id)
+            before = len(queue.heap)
+            queue.push(verse_id, _due_key(next_due))
+            self._cards += len(queue.heap) - before
+            self._evict()
+
+    def evict(self, user_id: str) -> None:
+        with self._lock:
+            queue = self._users.pop(user_id, None)
+            if queue is not None:
+                self._cards -= len(queue.heap)
+
+    def _hydrate(
+        self, user_id: str, db: sqlite_utils.Database, overlay: Iterable[Dict]
+    ) -> _UserQueue:
+        # Reads straight off idx_verse_reviews_user_due.
+        cards = db.execute(
+            "SELECT verse_id, next_due FROM verse_reviews WHERE user_id = ?", [user_id]
+        ).fetchall()
+        cards.extend((s["verse_id"], _due_key(s["next_due"])) for s in overlay)
+        queue = _UserQueue(cards)
+        self._users[user_id] = queue
+        self._cards += len(queue.heap)
+        self._evict(keep=user_id)
+        return queue
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while len(self._users) > 1 and (
+            len(self._users) > self.max_users or self._cards > self.max_cards
+        ):
+            user_id = next(iter(self._users))
+            if user_id == keep:
+                self._users.move_to_end(user_id)
+                user_id = next(iter(self._users))
+            self._cards -= len(self._users.pop(user_id).heap)
@@ -1,12 +1,12 @@
-
-"""Pydantic schemas for the pivot service."""
+"""Pydantic schemas shared by the Sanctum services."""
 
 from __future__ import annotations
 
+from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class Scale(str, Enum):
@@ -40,3 +40,102 @@ class ForecastRequest(BaseModel):
 class ForecastPoint(BaseModel):
     timestep: int
     probability: float
+
+
+class ForecastBatchRequest(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=10000)
+    horizon: int = Field(30, ge=1, le=365)
+
+
+class ForecastSimulationRequest(BaseModel):
+    user_id: str
+    horizon: int = Field(30, ge=1, le=365)
+    paths: int = Field(1000, ge=1, le=10000, description="Sample paths to draw.")
+    seed: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Fixes the draws; a random one is chosen and returned if omitted.",
+    )
+    percentiles: List[float] = Field([5.0, 50.0, 95.0], min_length=1, max_length=10)
+
+    @field_validator("percentiles")
+    @classmethod
+    def _check_percentiles(cls, value: List[float]) -> List[float]:
+        if any(not 0 <= p <= 100 for p in value):
+            raise ValueError("percentiles must be between 0 and 100")
+        return value
+
+
+class SimulationBand(BaseModel):
+    percentile: float
+    counts: List[float] = Field(..., description="Events in each timestep.")
+    cumulative: List[float] = Field(
+        ..., description="Events up to and including each timestep."
+    )
+
+
+class ForecastSimulationResponse(BaseModel):
+    user_id: str
+    horizon: int
+    paths: int
+    seed: int
+    expected_counts: List[float]
+    expected_cumulative: List[float]
+    bands: List[SimulationBand]
+    truncated_paths: int = Field(
+        ...,
+        description="Paths stopped early by the per-path event cap; when non-zero, expectations and bands undercount.",
+    )
+
+
+class ForecastBatchResponse(BaseModel):
+    horizon: int
+    user_ids: List[str]
+    probabilities: List[List[float]] = Field(
+        ...,
+        description="One row per user (in `user_ids` order); column i is timestep i + 1.",
+    )
+
+
+# --- Covenant Memory Engine ---
+class Pivot(BaseModel):
+    type: str
+    center: Optional[str] = None
+    elements: Optional[List[str]] = []
+    score: Optional[float] = None
+    match_count: Optional[int] = None
+    depth: Optional[int] = None
+    total_words: Optional[int] = None
+    major_pivot: Optional[dict] = None
+    minor_pivot: Optional[dict] = None
+
+
+class Verse(BaseModel):
+    verse_id: str = Field(
+        ..., description="Canonical verse reference, e.g., 'John_3_16'"
+    )
+    text: str = Field(..., description="The full text of the scripture.")
+    covenant_tags: Optional[List[str]] = []
+    emotion_codes: Optional[List[str]] = []
+    notes: Optional[str] = ""
+    pivot: Optional[Pivot] = None
+    # SM-2 Spaced Repetition Fields (for general, non-user-specific reviews)
+    repetitions: int = 0
+    easiness_factor: float = 2.5
+    interval: int = 0  # in days
+    next_due: datetime = Field(default_factory=datetime.utcnow)
+
+
+class VerseProjection(BaseModel):
+    """A Verse cut down to the `fields=` requested; only those keys are sent."""
+
+    verse_id: Optional[str] = None
+    text: Optional[str] = None
+    covenant_tags: Optional[List[str]] = None
+    emotion_codes: Optional[List[str]] = None
+    notes: Optional[str] = None
+    pivot: Optional[Pivot] = None
+    repetitions: Optional[int] = None
+    easiness_factor: Optional[float] = None
+    interval: Optional[int] = None
+    next_due: Optional[datetime] = None
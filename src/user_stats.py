@@ -0,0 +1,170 @@
+"""Per-user review statistics, rolled up incrementally from review events.
+
+Every review event carries the card's state before and after the review,
+so each one changes a user's totals by a fixed delta: no scan of the user's
+cards is ever needed. Deltas are summed per user and applied with one
+UPSERT per user in the review's own transaction. :func:`rebuild`
+recomputes the table from ``verse_reviews`` and ``review_events``.
+
+``reviews_today`` counts reviews on ``today`` (a UTC date); readers treat
+it as 0 once ``today`` is in the past.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import sqlite_utils
+
+# Cards whose interval reaches this many days count as mature.
+MATURE_INTERVAL = 21
+
+_COUNTERS = (
+    "total_reviews",
+    "lapses",
+    "recall_reviews",
+    "recall_passed",
+    "cards",
+    "ease_sum",
+    "mature_cards",
+)
+
+_UPSERT_SQL = """
+INSERT INTO user_stats (user_id, {counters}, reviews_today, today)
+VALUES (?, {placeholders}, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    {increments},
+    reviews_today = CASE
+        WHEN user_stats.today = excluded.today THEN user_stats.reviews_today + excluded.reviews_today
+        WHEN user_stats.today > excluded.today THEN user_stats.reviews_today
+        ELSE excluded.reviews_today
+    END,
+    today = max(user_stats.today, excluded.today)
+""".format(
+    counters=", ".join(_COUNTERS),
+    placeholders=", ".join("?" for _ in _COUNTERS),
+    increments=",\n    ".join(
+        f"{c} = user_stats.{c} + excluded.{c}" for c in _COUNTERS
+    ),
+)
+
+
+def _day(value) -> str:
+    return value.date().isoformat() if isinstance(value, datetime) else value[:10]
+
+
+def stat_deltas(events: Iterable[Dict]) -> Dict[str, Dict]:
+    """Sum the change each review event makes to its user's stats."""
+    deltas: Dict[str, Dict] = {}
+    for e in events:
+        d = deltas.get(e["user_id"])
+        if d is None:
+            d = deltas[e["user_id"]] = dict.fromkeys(_COUNTERS, 0)
+            d["reviews_today"], d["today"] = 0, ""
+        new_card = e["prior_repetition_count"] is None
+        learned = not new_card and e["prior_repetition_count"] > 0
+        d["total_reviews"] += 1
+        d["lapses"] += learned and e["quality"] < 3
+        d["recall_reviews"] += learned
+        d["recall_passed"] += learned and e["quality"] >= 3
+        d["cards"] += new_card
+        d["ease_sum"] += e["ease_factor"] - (
+            0.0 if new_card else e["prior_ease_factor"]
+        )
+        d["mature_cards"] += (e["interval"] >= MATURE_INTERVAL) - (
+            not new_card and e["prior_interval"] >= MATURE_INTERVAL
+        )
+        day = _day(e["reviewed_at"])
+        if day > d["today"]:
+            d["today"], d["reviews_today"] = day, 1
+        elif day == d["today"]:
+            d["reviews_today"] += 1
+    return deltas
+
+
+def apply_review_events(events: Iterable[Dict], db: sqlite_utils.Database) -> None:
+    """Fold review events into ``user_stats``; runs in the caller's transaction."""
+    rows = [
+        [user_id, *(d[c] for c in _COUNTERS), d["reviews_today"], d["today"]]
+        for user_id, d in stat_deltas(events).items()
+    ]
+    db.conn.executemany(_UPSERT_SQL, rows)
+
+
+def rebuild(db: sqlite_utils.Database) -> int:
+    """Recompute ``user_stats`` from scratch; returns the number of users.
+
+    Runs in the caller's transaction, if any.
+    """
+    db.execute("DELETE FROM user_stats")
+    db.execute(
+        f"""
+        INSERT INTO user_stats (user_id, {", ".join(_COUNTERS)}, reviews_today, today)
+        SELECT
+            u.user_id,
+            coalesce(e.total_reviews, 0),
+            coalesce(e.lapses, 0),
+            coalesce(e.recall_reviews, 0),
+            coalesce(e.recall_passed, 0),
+            coalesce(c.cards, 0),
+            coalesce(c.ease_sum, 0),
+            coalesce(c.mature_cards, 0),
+            coalesce(t.reviews_today, 0),
+            coalesce(e.today, '')
+        FROM (SELECT user_id FROM verse_reviews UNION SELECT user_id FROM review_events) AS u
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) AS cards,
+                   SUM(ease_factor) AS ease_sum,
+                   SUM(interval >= {MATURE_INTERVAL}) AS mature_cards
+            FROM verse_reviews GROUP BY user_id
+        ) AS c ON c.user_id = u.user_id
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) AS total_reviews,
+                   SUM(prior_repetition_count > 0 AND quality < 3) AS lapses,
+                   SUM(prior_repetition_count > 0) AS recall_reviews,
+                   SUM(prior_repetition_count > 0 AND quality >= 3) AS recall_passed,
+                   MAX(substr(reviewed_at, 1, 10)) AS today
+            FROM review_events GROUP BY user_id
+        ) AS e ON e.user_id = u.user_id
+        LEFT JOIN (
+            SELECT r.user_id, COUNT(*) AS reviews_today
+            FROM review_events AS r
+            JOIN (
+                SELECT user_id, MAX(substr(reviewed_at, 1, 10)) AS today FROM review_events GROUP BY user_id
+            ) AS last ON last.user_id = r.user_id AND substr(r.reviewed_at, 1, 10) = last.today
+            GROUP BY r.user_id
+        ) AS t ON t.user_id = u.user_id
+        """
+    )
+    return db.execute("SELECT COUNT(*) FROM user_stats").fetchone()[0]
+
+
+def get_user_stats(
+    user_id: str, db: sqlite_utils.Database, today: Optional[str] = None
+) -> Optional[Dict]:
+    """The dashboard view of a user's rollup row, or None if they have none."""
+    row = db.execute(
+        f"SELECT {', '.join(_COUNTERS)}, reviews_today, today FROM user_stats WHERE user_id = ?",
+        [user_id],
+    ).fetchone()
+    if row is None:
+        return None
+    stats = dict(zip(_COUNTERS + ("reviews_today", "today"), row))
+    today = today or datetime.utcnow().date().isoformat()
+    return {
+        "user_id": user_id,
+        "reviews_today": stats["reviews_today"] if stats["today"] == today else 0,
+        "total_reviews": stats["total_reviews"],
+        "lapses": stats["lapses"],
+        "cards": stats["cards"],
+        "mature_cards": stats["mature_cards"],
+        "mean_ease": stats["ease_sum"] / stats["cards"] if stats["cards"] else None,
+        "retention_rate": (
+            stats["recall_passed"] / stats["recall_reviews"]
+            if stats["recall_reviews"]
+            else None
+        ),
+    }
@@ -0,0 +1,137 @@
+"""Streaming bulk import of verses into the ``verses`` table.
+
+Rows are validated against the :class:`~src.schemas.Verse` model and written
+in large chunks (one transaction per chunk), so memory stays bounded by the
+chunk size no matter how large the source is.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import sqlite_utils
+import yaml
+from pydantic import ValidationError
+
+from src import db as review_db
+from src.schemas import Verse
+
+DEFAULT_CHUNK_SIZE = 5000
+# Cap the per-row errors kept in a report; the count is always exact.
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, index: int, verse_id: Optional[str], error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "verse_id": verse_id, "error": error})
+
+
+def iter_ndjson(lines: Iterable[Union[str, bytes]]) -> Iterator[Union[str, bytes]]:
+    """Yield the non-blank lines of an NDJSON source (parsed during validation)."""
+    for line in lines:
+        if line.strip():
+            yield line
+
+
+def iter_yaml(path: str) -> Iterator[Dict]:
+    """Yield verse mappings from a YAML file.
+
+    Accepts the seed-file layout (a top-level list of verses) as well as a
+    multi-document stream with one verse per document; only the latter is
+    parsed incrementally.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for document in yaml.safe_load_all(f):
+            if document is None:
+                continue
+            if isinstance(document, list):
+                yield from document
+            else:
+                yield document
+
+
+def _validate(item: Union[str, bytes, Dict]) -> Verse:
+    if isinstance(item, dict):
+        return Verse.model_validate(item)
+    return Verse.model_validate_json(item)
+
+
+def _verse_id_of(item: Union[str, bytes, Dict]) -> Optional[str]:
+    if isinstance(item, dict):
+        return item.get("verse_id")
+    try:
+        return json.loads(item).get("verse_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+class VerseImporter:
+    """Validates and upserts verses chunk by chunk.
+
+    Feed items with :meth:`add` (or :meth:`add_all`) and call :meth:`finish`
+    to write the last partial chunk. ``progress`` is called with the running
+    :class:`ImportReport` after every chunk is committed.
+    """
+
+    def __init__(
+        self,
+        db: Optional[sqlite_utils.Database] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[Callable[[ImportReport], None]] = None,
+    ) -> None:
+        self.db = db
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.report = ImportReport()
+        self._index = 0
+        self._chunk: List[List] = []
+
+    def add(self, item: Union[str, bytes, Dict]) -> None:
+        index = self._index
+        self._index += 1
+        try:
+            verse = _validate(item)
+        except ValidationError as e:
+            self.report.add_error(index, _verse_id_of(item), str(e))
+            return
+        self._chunk.append(review_db.verse_to_row(verse))
+        if len(self._chunk) >= self.chunk_size:
+            self._flush()
+
+    def add_all(self, items: Iterable[Union[str, bytes, Dict]]) -> None:
+        for item in items:
+            self.add(item)
+
+    def finish(self) -> ImportReport:
+        self._flush()
+        return self.report
+
+    def _flush(self) -> None:
+        if not self._chunk:
+            return
+        review_db.upsert_verses(self._chunk, db=self.db)
+        self.report.imported += len(self._chunk)
+        self._chunk = []
+        if self.progress:
+            self.progress(self.report)
+
+
+def import_verses(
+    items: Iterable[Union[str, bytes, Dict]],
+    db: Optional[sqlite_utils.Database] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Validate and upsert every verse in ``items``; invalid rows are reported, not fatal."""
+    importer = VerseImporter(db=db, chunk_size=chunk_size, progress=progress)
+    importer.add_all(items)
+    return importer.finish()
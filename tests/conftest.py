@@ -1,4 +1,3 @@
-
 import os
 import pytest
 from fastapi.testclient import TestClient
@@ -11,14 +10,58 @@ os.environ["SANCTUM_API_KEY"] = "test-key"
 
 from src.pivot_service import app as pivot_app
 from src.cme_service import app as cme_app
-from src import cme_service, db as review_db
+from src import cme_service, db as review_db, migrations
+from src.schemas import Verse
+
+
+@pytest.fixture
+def db():
+    """An in-memory database migrated to the latest schema."""
+    db = sqlite_utils.Database(memory=True)
+    migrations.migrate(db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def save_review():
+    """
+    Returns a helper that stores a one-day SM-2 state for a card due at
+    ``next_due``, creating the verse too since decks only hold cards whose
+    verse exists.
+    """
+
+    def save(db, user_id, verse_id, next_due):
+        review_db.upsert_verses(
+            [review_db.verse_to_row(Verse(verse_id=verse_id, text=verse_id))], db=db
+        )
+        review_db.save_review_state(
+            user_id,
+            verse_id,
+            {
+                "ease_factor": 2.5,
+                "repetition_count": 1,
+                "interval": 1,
+                "next_due": next_due,
+            },
+            db=db,
+        )
+
+    return save
 
 
 @pytest.fixture(scope="module")
 def pivot_client():
-    """Fixture for the Pivot Service test client."""
-    with TestClient(pivot_app) as c:
-        yield c
+    """
+    Fixture for the Pivot Service test client, backed by a temporary
+    database (it reads fitted forecaster parameters).
+    """
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as mp:
+        mp.setattr(review_db, "DB_PATH", os.path.join(tmp, "pivot.db"))
+        with TestClient(pivot_app) as c:
+            yield c
+        review_db.close_pool()
+
 
 @pytest.fixture(scope="function")
 def cme_client(monkeypatch):
@@ -29,16 +72,18 @@ def cme_client(monkeypatch):
     # Create a temporary file to act as the database
     with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp:
         db_path = tmp.name
-    
-    # Use monkeypatch to redirect DB_PATH constants in the relevant modules
-    monkeypatch.setattr(cme_service, "DB_PATH", db_path)
+
+    # Use monkeypatch to redirect the shared DB_PATH; the connection pool
+    # is rebuilt against the new path on first use.
     monkeypatch.setattr(review_db, "DB_PATH", db_path)
 
     # The TestClient context manager handles app startup/shutdown,
     # which will create the tables in our temporary database.
     with TestClient(cme_app) as c:
         yield c
-    
-    # Teardown: remove the temporary database file after the test is done
-    if os.path.exists(db_path):
-        os.remove(db_path)
+
+    # Teardown: remove the temporary database file (and its WAL sidecars)
+    review_db.close_pool()
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
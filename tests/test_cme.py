@@ -1,23 +1,27 @@
-
 import pytest
 from datetime import datetime, timedelta
 import sqlite_utils
 import json
-from src import db as review_db
+from src import cme_service, db as review_db
+from src.schemas import Verse
 import uuid
 
 # All fixtures are now defined in `tests/conftest.py` and are automatically used.
 # The `cme_client` fixture provides an isolated, temporary database for each test.
 
+
 def test_unauthorized_access(cme_client):
     response = cme_client.post("/add_verse", json={})
     assert response.status_code == 422  # No header
 
-    response = cme_client.post("/add_verse", headers={"X-API-Key": "wrong-key"}, json={
-        "verse_id": "Test_1_1", "text": "Test text"
-    })
+    response = cme_client.post(
+        "/add_verse",
+        headers={"X-API-Key": "wrong-key"},
+        json={"verse_id": "Test_1_1", "text": "Test text"},
+    )
     assert response.status_code == 401
 
+
 def test_add_verse(cme_client):
     headers = {"X-API-Key": "test-key"}
     verse_data = {
@@ -25,7 +29,7 @@ def test_add_verse(cme_client):
         "text": "For God so loved the world...",
         "covenant_tags": ["Love", "Atonement"],
         "emotion_codes": ["Love"],
-        "notes": "A test note."
+        "notes": "A test note.",
     }
     response = cme_client.post("/add_verse", headers=headers, json=verse_data)
     assert response.status_code == 201
@@ -41,6 +45,7 @@ def test_add_verse(cme_client):
     finally:
         db.close()
 
+
 def test_add_verse_with_pivot_data(cme_client):
     headers = {"X-API-Key": "test-key"}
     pivot_data = {
@@ -49,12 +54,12 @@ def test_add_verse_with_pivot_data(cme_client):
         "elements": ["A <-> A", "B <-> B"],
         "score": 1.0,
         "match_count": 2,
-        "depth": 2
+        "depth": 2,
     }
     verse_data = {
         "verse_id": "Test_Pivot_1",
         "text": "Test with pivot",
-        "pivot": pivot_data
+        "pivot": pivot_data,
     }
     response = cme_client.post("/add_verse", headers=headers, json=verse_data)
     assert response.status_code == 201
@@ -76,12 +81,15 @@ def test_get_flashcards_empty(cme_client):
     assert response.status_code == 200
     assert response.json() == []
 
+
 def test_get_due_flashcard(cme_client):
     headers = {"X-API-Key": "test-key"}
     verse_data = {
         "verse_id": "Gen_1_1",
         "text": "In the beginning...",
-        "next_due": (datetime.utcnow() - timedelta(days=1)).isoformat()  # Due yesterday
+        "next_due": (
+            datetime.utcnow() - timedelta(days=1)
+        ).isoformat(),  # Due yesterday
     }
     cme_client.post("/add_verse", headers=headers, json=verse_data)
 
@@ -91,6 +99,7 @@ def test_get_due_flashcard(cme_client):
     assert len(data) == 1
     assert data[0]["verse_id"] == "Gen_1_1"
 
+
 def test_review_verse(cme_client):
     headers = {"X-API-Key": "test-key"}
     verse_data = {"verse_id": "Phil_4_13", "text": "I can do all things..."}
@@ -98,7 +107,9 @@ def test_review_verse(cme_client):
 
     # Review with "Good" quality (a passing score in the new algorithm is >= 3)
     review_data = {"quality": 3}
-    response = cme_client.post("/review_verse/Phil_4_13", headers=headers, json=review_data)
+    response = cme_client.post(
+        "/review_verse/Phil_4_13", headers=headers, json=review_data
+    )
     assert response.status_code == 200
     assert response.json()["status"] == "review_recorded"
 
@@ -116,21 +127,28 @@ def test_review_verse(cme_client):
 
 def test_review_nonexistent_verse(cme_client):
     headers = {"X-API-Key": "test-key"}
-    response = cme_client.post("/review_verse/Non_Existent_1_1", headers=headers, json={"quality": 3})
+    response = cme_client.post(
+        "/review_verse/Non_Existent_1_1", headers=headers, json={"quality": 3}
+    )
     assert response.status_code == 404
 
+
 def test_user_review(cme_client):
     headers = {"X-API-Key": "test-key"}
     verse_id = "1Cor_13_4"
     user_id = str(uuid.uuid4())
-    
+
     # Add the verse first (though it's not strictly required by the review logic)
-    cme_client.post("/add_verse", headers=headers, json={"verse_id": verse_id, "text": "Love is patient..."})
-    
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={"verse_id": verse_id, "text": "Love is patient..."},
+    )
+
     # First review (q=5, perfect)
     review_data = {"user_id": user_id, "verse_id": verse_id, "q": 5}
     response = cme_client.post("/review", headers=headers, json=review_data)
-    
+
     assert response.status_code == 200
     data = response.json()
     assert data["user_id"] == user_id
@@ -144,10 +162,10 @@ def test_user_review(cme_client):
         assert state is not None
         assert state["repetition_count"] == 1
         assert state["interval"] == 1
-        assert state["ease_factor"] > 2.5 # Easiness should increase
+        assert state["ease_factor"] > 2.5  # Easiness should increase
     finally:
         db.close()
-    
+
     # Second review (q=4, good)
     review_data_2 = {"user_id": user_id, "verse_id": verse_id, "q": 4}
     response_2 = cme_client.post("/review", headers=headers, json=review_data_2)
@@ -169,21 +187,506 @@ def test_user_review_failure(cme_client):
     headers = {"X-API-Key": "test-key"}
     verse_id = "Prov_3_5"
     user_id = str(uuid.uuid4())
-    
+
     # Review with a failing score (q=1)
     review_data = {"user_id": user_id, "verse_id": verse_id, "q": 1}
     response = cme_client.post("/review", headers=headers, json=review_data)
-    
+
     assert response.status_code == 200
     data = response.json()
     assert "Your next review is in 1 days" in data["message"]
-    
+
     # Verify state in DB
     db = review_db.connect()
     try:
         state = db["verse_reviews"].get((user_id, verse_id))
-        assert state["repetition_count"] == 0 # Reps reset
-        assert state["interval"] == 1 # Interval resets
-        assert state["ease_factor"] < 2.5 # Easiness should decrease
+        assert state["repetition_count"] == 0  # Reps reset
+        assert state["interval"] == 1  # Interval resets
+        assert state["ease_factor"] < 2.5  # Easiness should decrease
+    finally:
+        db.close()
+
+
+def test_user_due_queue(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    for verse_id in ("Ps_23_1", "Ps_23_2", "Ps_23_3"):
+        cme_client.post(
+            "/add_verse", headers=headers, json={"verse_id": verse_id, "text": verse_id}
+        )
+
+    db = review_db.connect()
+    try:
+        now = datetime.utcnow()
+        for verse_id, days in (("Ps_23_1", -1), ("Ps_23_2", -3), ("Ps_23_3", 2)):
+            review_db.save_review_state(
+                user_id,
+                verse_id,
+                {
+                    "ease_factor": 2.5,
+                    "repetition_count": 1,
+                    "interval": 1,
+                    "next_due": now + timedelta(days=days),
+                },
+                db=db,
+            )
+        # Another user's due card must not leak into this queue
+        review_db.save_review_state(
+            "someone-else",
+            "Ps_23_3",
+            {
+                "ease_factor": 2.5,
+                "repetition_count": 1,
+                "interval": 1,
+                "next_due": now - timedelta(days=5),
+            },
+            db=db,
+        )
+    finally:
+        db.close()
+
+    response = cme_client.get(f"/users/{user_id}/due", headers=headers)
+    assert response.status_code == 200
+    assert [card["verse_id"] for card in response.json()] == ["Ps_23_2", "Ps_23_1"]
+
+
+def test_user_due_query_uses_covering_index(cme_client):
+    db = review_db.connect()
+    try:
+        plan = " | ".join(
+            row[3]
+            for row in db.execute(
+                "EXPLAIN QUERY PLAN " + cme_service.DUE_FOR_USER_SQL,
+                ["u", "2024-01-01", 10],
+            )
+        )
     finally:
         db.close()
+    assert (
+        "USING COVERING INDEX idx_verse_reviews_user_due (user_id=? AND next_due<?)"
+        in plan
+    )
+    assert "TEMP B-TREE" not in plan
+
+
+def test_due_priority_order(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    # (verse, days overdue, interval, ease): priority key = due + interval * ease
+    cards = (("Ps_1_1", 10, 30, 2.5), ("Ps_1_2", 2, 1, 2.5), ("Ps_1_3", 20, 1, 1.3))
+    for verse_id, overdue, interval, ease in cards:
+        cme_client.post(
+            "/add_verse",
+            headers=headers,
+            json={
+                "verse_id": verse_id,
+                "text": verse_id,
+                "interval": interval,
+                "easiness_factor": ease,
+                "next_due": (now - timedelta(days=overdue)).isoformat(),
+            },
+        )
+    db = review_db.connect()
+    try:
+        for verse_id, overdue, interval, ease in cards:
+            review_db.save_review_state(
+                user_id,
+                verse_id,
+                {
+                    "ease_factor": ease,
+                    "repetition_count": 3,
+                    "interval": interval,
+                    "next_due": now - timedelta(days=overdue),
+                },
+                db=db,
+            )
+    finally:
+        db.close()
+
+    def verse_ids(url):
+        response = cme_client.get(url, headers=headers)
+        assert response.status_code == 200
+        return [card["verse_id"] for card in response.json()]
+
+    assert verse_ids(f"/users/{user_id}/due") == ["Ps_1_3", "Ps_1_1", "Ps_1_2"]
+    assert verse_ids(f"/users/{user_id}/due?order=priority") == [
+        "Ps_1_3",
+        "Ps_1_2",
+        "Ps_1_1",
+    ]
+    assert verse_ids("/flashcards?order=priority&limit=2") == ["Ps_1_3", "Ps_1_2"]
+    assert (
+        cme_client.get("/flashcards?order=random", headers=headers).status_code == 422
+    )
+
+
+def test_priority_queries_read_the_index_in_order(cme_client):
+    db = review_db.connect()
+    try:
+
+        def plan(sql, params):
+            return " | ".join(
+                row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)
+            )
+
+        user_plan = plan(
+            cme_service.DUE_FOR_USER_BY_PRIORITY_SQL, ["u", "2024-01-01", 10]
+        )
+        verses_plan = plan(
+            *cme_service._due_verses_query(10, order=cme_service.DueOrder.priority)
+        )
+    finally:
+        db.close()
+    assert (
+        "USING COVERING INDEX idx_verse_reviews_user_priority (user_id=?)" in user_plan
+    )
+    assert "USING INDEX idx_verses_priority" in verses_plan
+    assert "TEMP B-TREE" not in user_plan + verses_plan
+
+
+def test_review_batch(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    reviews = [
+        {"user_id": user_id, "verse_id": "Rom_8_28", "q": 5},
+        {"user_id": user_id, "verse_id": "Rom_12_2", "q": 1},
+        {"user_id": user_id, "verse_id": "Rom_8_28", "q": 4},
+    ]
+    response = cme_client.post(
+        "/reviews/batch", headers=headers, json={"reviews": reviews}
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["verse_id"] for r in results] == ["Rom_8_28", "Rom_12_2", "Rom_8_28"]
+    # The second review of Rom_8_28 builds on the first, as with POST /review
+    assert "Your next review is in 1 days" in results[0]["message"]
+    assert "Your next review is in 6 days" in results[2]["message"]
+
+    db = review_db.connect()
+    try:
+        assert db["verse_reviews"].get((user_id, "Rom_8_28"))["repetition_count"] == 2
+        assert db["verse_reviews"].get((user_id, "Rom_12_2"))["repetition_count"] == 0
+    finally:
+        db.close()
+
+
+def test_review_batch_rejects_invalid_items(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    reviews = [
+        {"user_id": "u", "verse_id": "v", "q": 5},
+        {"user_id": "u", "verse_id": "v", "q": 9},
+    ]
+    response = cme_client.post(
+        "/reviews/batch", headers=headers, json={"reviews": reviews}
+    )
+    assert response.status_code == 422
+    response = cme_client.post("/reviews/batch", headers=headers, json={"reviews": []})
+    assert response.status_code == 422
+
+
+def test_import_verses_ndjson(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    lines = [
+        json.dumps(
+            {"verse_id": f"Ps_119_{i}", "text": f"Verse {i}", "covenant_tags": ["Law"]}
+        )
+        for i in range(1, 8)
+    ]
+    lines.insert(3, json.dumps({"verse_id": "Broken_1_1"}))  # missing text
+    body = "\n".join(lines) + "\n"
+
+    response = cme_client.post(
+        "/verses/import?chunk_size=3", headers=headers, content=body
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 7
+    assert report["failed"] == 1
+    assert report["errors"][0]["index"] == 3
+    assert report["errors"][0]["verse_id"] == "Broken_1_1"
+
+    db = review_db.connect()
+    try:
+        assert db.execute("SELECT COUNT(*) FROM verses").fetchone()[0] == 7
+        assert json.loads(db["verses"].get("Ps_119_5")["covenant_tags"]) == ["Law"]
+    finally:
+        db.close()
+
+
+def test_flashcards_tag_filter_and_facets(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    tomorrow = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    verses = [
+        {
+            "verse_id": "Isa_53_5",
+            "text": "...",
+            "covenant_tags": ["Atonement", "Mercy"],
+            "emotion_codes": ["Grief"],
+            "next_due": yesterday,
+        },
+        {
+            "verse_id": "Heb_9_22",
+            "text": "...",
+            "covenant_tags": ["Atonement"],
+            "emotion_codes": ["Awe"],
+            "next_due": yesterday,
+        },
+        {
+            "verse_id": "Ps_23_1",
+            "text": "...",
+            "covenant_tags": ["Mercy"],
+            "emotion_codes": ["Awe"],
+            "next_due": yesterday,
+        },
+        {
+            "verse_id": "Rom_3_25",
+            "text": "...",
+            "covenant_tags": ["Atonement"],
+            "next_due": tomorrow,
+        },
+    ]
+    for verse in verses:
+        cme_client.post("/add_verse", headers=headers, json=verse)
+
+    response = cme_client.get(
+        "/flashcards", headers=headers, params={"tag": "Atonement"}
+    )
+    assert sorted(v["verse_id"] for v in response.json()) == ["Heb_9_22", "Isa_53_5"]
+    response = cme_client.get(
+        "/flashcards", headers=headers, params={"tag": "Atonement", "emotion": "Awe"}
+    )
+    assert [v["verse_id"] for v in response.json()] == ["Heb_9_22"]
+
+    # Re-tagging a verse keeps the junction tables in sync
+    cme_client.post(
+        "/add_verse", headers=headers, json={**verses[0], "covenant_tags": ["Mercy"]}
+    )
+    response = cme_client.get(
+        "/flashcards", headers=headers, params={"tag": "Atonement"}
+    )
+    assert [v["verse_id"] for v in response.json()] == ["Heb_9_22"]
+
+    facets = cme_client.get("/facets", headers=headers).json()
+    assert facets["covenant_tags"] == [
+        {"value": "Atonement", "count": 2},
+        {"value": "Mercy", "count": 2},
+    ]
+    due_facets = cme_client.get(
+        "/facets", headers=headers, params={"due_only": True}
+    ).json()
+    assert due_facets["covenant_tags"] == [
+        {"value": "Mercy", "count": 2},
+        {"value": "Atonement", "count": 1},
+    ]
+    assert due_facets["emotion_codes"] == [
+        {"value": "Awe", "count": 2},
+        {"value": "Grief", "count": 1},
+    ]
+
+
+def test_list_verses_keyset_pagination(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    verse_ids = [f"Prov_3_{i}" for i in range(1, 8)]
+    for verse_id in reversed(verse_ids):
+        cme_client.post(
+            "/add_verse", headers=headers, json={"verse_id": verse_id, "text": verse_id}
+        )
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"after": cursor} if cursor else {})}
+        page = cme_client.get("/verses", headers=headers, params=params).json()
+        seen.extend(v["verse_id"] for v in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(verse_ids)
+
+
+def test_export_verses_ndjson(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={"verse_id": "B_1", "text": "b", "covenant_tags": ["Grace"]},
+    )
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={"verse_id": "A_1", "text": "a", "pivot": {"type": "Chiastic"}},
+    )
+
+    response = cme_client.get("/verses/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["verse_id"] for r in rows] == ["A_1", "B_1"]
+    assert rows[0]["pivot"]["type"] == "Chiastic"
+    assert rows[1]["covenant_tags"] == ["Grace"]
+
+
+def test_export_does_not_hold_a_pooled_connection(cme_client, monkeypatch):
+    headers = {"X-API-Key": "test-key"}
+    cme_client.post(
+        "/add_verse", headers=headers, json={"verse_id": "A_1", "text": "a"}
+    )
+    pool = review_db.get_pool()
+    monkeypatch.setattr(pool, "timeout", 0.1)
+    held = [pool.acquire() for _ in range(pool.size)]
+    try:
+        # Every pooled connection is busy; the export still streams
+        response = cme_client.get("/verses/export", headers=headers)
+        assert [
+            json.loads(line)["verse_id"] for line in response.text.splitlines()
+        ] == ["A_1"]
+    finally:
+        for db in held:
+            pool.release(db)
+
+
+def test_flashcards_fast_path_matches_models(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={
+            "verse_id": "Mic_6_8",
+            "text": "He hath shewed thee, O man, what is good; “walk humbly”",
+            "covenant_tags": ["Justice"],
+            "notes": None,
+            "easiness_factor": 1.3000000000000003,
+            "pivot": {"type": "Chiastic", "center": "C", "elements": ["A <-> A"]},
+            "next_due": yesterday,
+        },
+    )
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={"verse_id": "Gen_1_1", "text": "In the beginning", "next_due": yesterday},
+    )
+
+    fast = cme_client.get("/flashcards", headers=headers).json()
+
+    db = review_db.connect()
+    try:
+        expected = [
+            v.model_dump(mode="json")
+            for v in cme_service.CMEService(db).get_flashcards()
+        ]
+    finally:
+        db.close()
+    assert fast == expected
+
+
+def test_flashcards_field_projection(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    cme_client.post(
+        "/add_verse",
+        headers=headers,
+        json={
+            "verse_id": "Jas_1_5",
+            "text": "If any of you lack wisdom",
+            "notes": "n",
+            "next_due": yesterday,
+        },
+    )
+
+    response = cme_client.get(
+        "/flashcards", headers=headers, params={"fields": "verse_id,text,next_due,text"}
+    )
+    assert response.status_code == 200
+    assert list(response.json()[0]) == ["verse_id", "text", "next_due"]
+
+    response = cme_client.get(
+        "/flashcards", headers=headers, params={"fields": "verse_id,secret"}
+    )
+    assert response.status_code == 422
+    assert "secret" in response.json()["detail"]
+
+    # The schema documents projected rows separately from full verses
+    schema = cme_client.get("/openapi.json").json()
+    items = schema["paths"]["/flashcards"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]["anyOf"]
+    assert [i["items"]["$ref"].rsplit("/", 1)[1] for i in items] == [
+        "Verse",
+        "VerseProjection",
+    ]
+    assert list(
+        schema["components"]["schemas"]["VerseProjection"]["properties"]
+    ) == list(Verse.model_fields)
+
+
+def test_user_next_card(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    response = cme_client.get(f"/users/{user_id}/next", headers=headers)
+    assert response.status_code == 404
+
+    cme_client.post(
+        "/review",
+        headers=headers,
+        json={"user_id": user_id, "verse_id": "Josh_1_8", "q": 5},
+    )
+    cme_client.post(
+        "/reviews/batch",
+        headers=headers,
+        json={
+            "reviews": [
+                {"user_id": user_id, "verse_id": "Josh_1_9", "q": 1},
+                {"user_id": user_id, "verse_id": "Josh_1_9", "q": 4},
+            ]
+        },
+    )
+    # Both are due in 1 day (q=1 resets Josh_1_9); Josh_1_8 was reviewed first
+    response = cme_client.get(f"/users/{user_id}/next", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["verse_id"] == "Josh_1_8"
+    assert response.json()["due"] is False
+
+    # The user's heap is now held by the shared scheduler; reviews update it in place
+    assert len(cme_service.due_scheduler) == 1
+    cme_client.post(
+        "/reviews/batch",
+        headers=headers,
+        json={
+            "reviews": [
+                {"user_id": user_id, "verse_id": "Josh_1_8", "q": 5},
+                {"user_id": user_id, "verse_id": "Josh_1_8", "q": 5},
+            ]
+        },
+    )
+    assert (
+        cme_client.get(f"/users/{user_id}/next", headers=headers).json()["verse_id"]
+        == "Josh_1_9"
+    )
+
+
+def test_user_next_card_served_from_shared_scheduler(cme_client, monkeypatch):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    cme_client.post(
+        "/review",
+        headers=headers,
+        json={"user_id": user_id, "verse_id": "Josh_1_8", "q": 5},
+    )
+
+    scheduler = cme_service.due_scheduler
+    hydrate = scheduler._hydrate
+    reads = []
+
+    def counting_hydrate(*args, **kwargs):
+        reads.append(args[0])
+        return hydrate(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler, "_hydrate", counting_hydrate)
+    for _ in range(3):
+        response = cme_client.get(f"/users/{user_id}/next", headers=headers)
+        assert response.json()["verse_id"] == "Josh_1_8"
+    # Hydrated from the database once, then served from the heap
+    assert reads == [user_id]
+    assert len(scheduler) == 1
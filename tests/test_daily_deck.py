@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timedelta
+
+from src import daily_deck, db as review_db
+from src.cme_service import CMEService
+
+
+def _verse_ids(rows):
+    return [row["verse_id"] for row in rows]
+
+
+def test_deck_is_a_stable_snapshot(db, save_review):
+    now = datetime.utcnow()
+    for i, hours in enumerate((-30, -2, -50, 20 * 24, -10)):
+        save_review(db, "u1", f"v{i}", now + timedelta(hours=hours))
+    save_review(db, "u2", "v5", now - timedelta(days=1))
+
+    deck, rows = daily_deck.get_page("u1", db, limit=2)
+    assert (deck["size"], deck["remaining"]) == (4, 4)
+    assert _verse_ids(rows) == ["v2", "v0"]
+    assert [row["position"] for row in rows] == [1, 2]
+
+    # Cards that become due later do not reshuffle the snapshot
+    save_review(db, "u1", "v3", now - timedelta(days=9))
+    _, rows = daily_deck.get_page("u1", db, after=2, limit=10)
+    assert _verse_ids(rows) == ["v4", "v1"]
+
+
+def test_reviews_pop_cards(db, save_review):
+    now = datetime.utcnow()
+    for i in range(3):
+        save_review(db, "u1", f"v{i}", now - timedelta(days=i + 1))
+    service = CMEService(db)
+    assert _verse_ids(daily_deck.get_page("u1", db)[1]) == ["v2", "v1", "v0"]
+
+    service.process_user_reviews([("u1", "v1", 1), ("u1", "v5", 4)])
+    deck, rows = daily_deck.get_page("u1", db)
+    assert _verse_ids(rows) == ["v2", "v0"]
+    assert deck["remaining"] == 2
+
+    # Buffered states not yet flushed are filtered out the same way
+    overlay = [{"verse_id": "v2", "next_due": now + timedelta(days=1)}]
+    deck, rows = daily_deck.get_page("u1", db, overlay=overlay)
+    assert _verse_ids(rows) == ["v0"]
+    assert deck["remaining"] == 1
+
+
+def test_deck_rebuilds_on_a_new_day(db, save_review):
+    save_review(db, "u1", "v0", datetime(2024, 1, 1, 12))
+    save_review(db, "u1", "v1", datetime(2024, 1, 2, 12))
+    assert _verse_ids(daily_deck.get_page("u1", db, day="2024-01-01")[1]) == ["v0"]
+    deck, rows = daily_deck.get_page("u1", db, day="2024-01-02")
+    assert deck["day"] == "2024-01-02"
+    assert _verse_ids(rows) == ["v0", "v1"]
+
+
+def test_build_decks_skips_existing(db, save_review):
+    save_review(db, "u1", "v0", datetime(2024, 1, 1))
+    save_review(db, "u2", "v0", datetime(2024, 1, 1))
+    save_review(db, "u3", "v0", datetime(2024, 3, 1))
+    assert daily_deck.build_decks(db, "2024-01-01") == (2, 2)
+    assert daily_deck.build_decks(db, "2024-01-01") == (0, 0)
+    assert daily_deck.build_decks(db, "2024-01-01", rebuild=True) == (2, 2)
+
+
+def test_deck_endpoint_paginates(cme_client, save_review):
+    headers = {"X-API-Key": "test-key"}
+    user_id = str(uuid.uuid4())
+    for verse_id in ("Ps_23_1", "Ps_23_2", "Ps_23_3"):
+        cme_client.post(
+            "/add_verse", headers=headers, json={"verse_id": verse_id, "text": verse_id}
+        )
+    db = review_db.connect()
+    try:
+        for days, verse_id in enumerate(("Ps_23_1", "Ps_23_2", "Ps_23_3"), start=1):
+            save_review(db, user_id, verse_id, datetime.utcnow() - timedelta(days=days))
+    finally:
+        db.close()
+
+    page = cme_client.get(f"/users/{user_id}/deck?limit=2", headers=headers).json()
+    assert [card["verse_id"] for card in page["items"]] == ["Ps_23_3", "Ps_23_2"]
+    cme_client.post(
+        "/review",
+        headers=headers,
+        json={"user_id": user_id, "verse_id": "Ps_23_1", "q": 5},
+    )
+    page = cme_client.get(
+        f"/users/{user_id}/deck?after={page['next_cursor']}", headers=headers
+    ).json()
+    assert page["items"] == []
+    assert page["remaining"] == 2
+    assert page["next_cursor"] is None
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import numpy as np
+
+from src.cme_service import CMEService
+from src.event_log import export_events, iter_event_chunks, load_dictionaries, to_frame
+
+
+def test_reviews_append_events_with_prior_state(db):
+    service = CMEService(db)
+    service.process_user_reviews([("u1", "v1", 5), ("u1", "v1", 4)])
+    service.process_user_review("v1", "u1", 1)
+
+    events = db.execute(
+        "SELECT quality, prior_repetition_count, prior_interval, repetition_count, interval "
+        "FROM review_events ORDER BY event_id"
+    ).fetchall()
+    assert events == [(5, None, None, 1, 1), (4, 1, 1, 2, 6), (1, 2, 6, 0, 1)]
+    # The latest event matches the stored state
+    state = db.execute("SELECT next_due FROM verse_reviews").fetchone()
+    assert (
+        db.execute("SELECT next_due FROM review_events WHERE event_id = 3").fetchone()
+        == state
+    )
+
+
+def test_export_round_trips_in_chunks(db, tmp_path):
+    service = CMEService(db)
+    service.process_user_reviews([(f"u{i % 3}", f"v{i % 4}", i % 6) for i in range(25)])
+
+    report = export_events(db, str(tmp_path), chunk_size=10)
+    assert (report.events, report.parts, report.users, report.verses) == (25, 3, 3, 4)
+
+    chunks = list(iter_event_chunks(str(tmp_path)))
+    assert [len(c["event_id"]) for c in chunks] == [10, 10, 5]
+    dictionaries = load_dictionaries(str(tmp_path))
+    frame = to_frame(chunks[0], dictionaries)
+    assert frame["user_id"].tolist()[:4] == ["u0", "u1", "u2", "u0"]
+    assert frame["quality"].tolist()[:3] == [0, 1, 2]
+    # First reviews carry no prior state
+    assert np.isnan(frame["prior_ease_factor"][0]) and frame["prior_interval"][0] == -1
+    assert np.isnat(chunks[0]["prior_next_due"][0])
+
+    stored = db.execute(
+        "SELECT reviewed_at, ease_factor FROM review_events WHERE event_id = 25"
+    ).fetchone()
+    assert chunks[2]["reviewed_at"][-1].astype(datetime) == datetime.fromisoformat(
+        stored[0]
+    )
+    assert chunks[2]["ease_factor"][-1] == stored[1]
@@ -1,13 +1,24 @@
-
+import numpy as np
 import pytest
+from scipy.optimize import approx_fprime
+
+from src.forecasters.hawkes import (
+    PARAM_BOUNDS,
+    HawkesForecaster,
+    log_likelihood,
+    to_csr,
+)
+from src import db as review_db, hawkes_params
 from src.schemas import ForecastRequest
 
 # Fixtures are defined in conftest.py and are used automatically.
 
+
 def test_forecast_unauthorized(pivot_client):
     req = ForecastRequest(user_id="u1", horizon=5)
     response = pivot_client.post("/forecast", json=req.model_dump())
-    assert response.status_code == 422 # Missing X-API-Key header
+    assert response.status_code == 422  # Missing X-API-Key header
+
 
 def test_forecast_success(pivot_client):
     headers = {"X-API-Key": "test-key"}
@@ -19,6 +30,7 @@ def test_forecast_success(pivot_client):
     assert all(isinstance(pt["timestep"], int) for pt in data)
     assert all(0 <= pt["probability"] <= 1 for pt in data)
 
+
 def test_forecast_for_unknown_user(pivot_client):
     headers = {"X-API-Key": "test-key"}
     req = ForecastRequest(user_id="unknown_user", horizon=5)
@@ -28,3 +40,224 @@ def test_forecast_for_unknown_user(pivot_client):
     assert len(data) == 5
     # For a user with no events, probability should still be valid
     assert all(pt["probability"] > 0 for pt in data)
+
+
+@pytest.mark.parametrize("beta", [0.05, 1.0, 5.0])
+def test_forecast_matches_direct_kernel_sum(beta):
+    rng = np.random.default_rng(0)
+    # Fractional, integer-valued, pre-window and beyond-horizon events
+    events = np.concatenate(
+        [rng.uniform(-20, 60, 300), rng.integers(0, 60, 100), [0.0, 1.0, 1.0]]
+    )
+    forecaster = HawkesForecaster(beta=beta)
+    t = np.arange(1, 51)[:, None]
+    excitation = np.where(events < t, np.exp(-beta * (t - events)), 0.0).sum(axis=1)
+    expected = 1 - np.exp(-(forecaster.baseline + forecaster.alpha * excitation))
+    np.testing.assert_allclose(
+        forecaster.forecast(events.tolist(), 50), expected, rtol=1e-12, atol=0
+    )
+    assert forecaster.forecast([], 0) == []
+
+
+def test_forecast_batch_matches_single_user_forecasts():
+    rng = np.random.default_rng(1)
+    event_lists = [
+        rng.uniform(-10, 40, rng.integers(0, 50)).tolist() for _ in range(23)
+    ]
+    forecaster = HawkesForecaster(beta=0.3)
+    values, offsets = to_csr(event_lists)
+    batch = forecaster.forecast_batch(values, offsets, 30, chunk_users=5)
+    assert batch.shape == (23, 30)
+    for row, events in zip(batch, event_lists):
+        np.testing.assert_allclose(row, forecaster.forecast(events, 30), rtol=1e-12)
+
+
+def test_forecast_batch_endpoint(pivot_client):
+    headers = {"X-API-Key": "test-key"}
+    response = pivot_client.post(
+        "/forecast/batch",
+        headers=headers,
+        json={"user_ids": ["u1", "u2", "nobody"], "horizon": 5},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["user_ids"] == ["u1", "u2", "nobody"]
+    single = pivot_client.post(
+        "/forecast", headers=headers, json={"user_id": "u2", "horizon": 5}
+    ).json()
+    assert data["probabilities"][1] == pytest.approx(
+        [pt["probability"] for pt in single]
+    )
+    assert (
+        pivot_client.post(
+            "/forecast/batch", headers=headers, json={"user_ids": []}
+        ).status_code
+        == 422
+    )
+    too_long = {"user_ids": ["u1"], "horizon": 366}
+    assert (
+        pivot_client.post("/forecast/batch", headers=headers, json=too_long).status_code
+        == 422
+    )
+
+
+def _simulate(baseline, alpha, beta, end, rng):
+    # Ogata thinning; the intensity only decays between events.
+    t, events, excitation = 0.0, [], 0.0
+    while True:
+        bound = baseline + alpha * excitation
+        wait = rng.exponential(1 / bound)
+        t, excitation = t + wait, excitation * np.exp(-beta * wait)
+        if t > end:
+            return np.array(events)
+        if rng.uniform() * bound <= baseline + alpha * excitation:
+            events.append(t)
+            excitation += 1
+
+
+def test_log_likelihood_gradient_matches_finite_differences():
+    rng = np.random.default_rng(2)
+    times = np.sort(np.concatenate([rng.uniform(0, 100, 80), [10.0, 10.0]]))
+    for params in ([0.3, 0.5, 1.0], [0.05, 2.0, 0.1], [1.0, 0.01, 20.0]):
+        value, grad = log_likelihood(params, times, 0.0, 110.0)
+        numeric = approx_fprime(
+            np.array(params), lambda p: log_likelihood(p, times, 0.0, 110.0)[0], 1e-7
+        )
+        np.testing.assert_allclose(grad, numeric, rtol=1e-4, atol=1e-4)
+    # Direct O(n^2) evaluation of the same likelihood
+    mu, alpha, beta = 0.3, 0.5, 1.0
+    direct = sum(
+        np.log(mu + alpha * np.exp(-beta * (t - times[:i])).sum())
+        for i, t in enumerate(times)
+    )
+    direct -= mu * 110 + alpha / beta * np.sum(1 - np.exp(-beta * (110 - times)))
+    assert log_likelihood([mu, alpha, beta], times, 0.0, 110.0)[0] == pytest.approx(
+        direct, rel=1e-12
+    )
+
+
+def test_fit_recovers_parameters():
+    rng = np.random.default_rng(1)
+    events = _simulate(0.2, 0.6, 1.5, 3000, rng)
+    fitted = HawkesForecaster().fit(events, start=0, end=3000)
+    np.testing.assert_allclose(fitted.params, [0.2, 0.6, 1.5], rtol=0.25)
+    assert not fitted.at_bound
+
+
+def test_fit_is_always_stationary():
+    rng = np.random.default_rng(4)
+    accelerating = np.cumsum(np.arange(200, 0, -1) / 100.0)
+    sessions = np.concatenate(
+        [day + np.sort(rng.uniform(0, 0.01, 30)) for day in range(0, 60, 3)]
+    )
+    for events in (accelerating, sessions, _simulate(0.2, 0.6, 1.5, 300, rng)):
+        fitted = HawkesForecaster().fit(events)
+        assert fitted.alpha < fitted.beta
+        assert fitted.alpha / fitted.beta <= PARAM_BOUNDS[1][1] + 1e-9
+    # Too bursty for a stationary fit: held at the branching-ratio bound
+    assert HawkesForecaster().fit(sessions).at_bound
+
+
+def test_pooled_prior_shrinks_sparse_users():
+    rng = np.random.default_rng(3)
+    users = [_simulate(0.2, 0.6, 1.5, 100, rng) for _ in range(100)]
+    prior = HawkesForecaster.fit_pooled(users, [(0, 100)] * len(users))
+    np.testing.assert_allclose(prior.params, [0.2, 0.6, 1.5], rtol=0.25)
+
+    sparse = [3.0, 40.0]
+    free = HawkesForecaster().fit(sparse, start=0, end=100)
+    shrunk = HawkesForecaster().fit(
+        sparse, start=0, end=100, prior=prior, prior_scale=0.5
+    )
+
+    def distance(f):
+        return np.abs(np.log(f.params) - np.log(prior.params)).sum()
+
+    assert distance(shrunk) < distance(free)
+    assert list(HawkesForecaster().fit([], prior=prior).params) == list(prior.params)
+    with pytest.raises(ValueError):
+        HawkesForecaster().fit([])
+
+
+def test_simulation_matches_expected_counts_and_is_reproducible():
+    mu, alpha, beta, s0 = 0.2, 0.6, 1.0, 3.0
+    forecaster = HawkesForecaster(baseline=mu, alpha=alpha, beta=beta)
+    result = forecaster.simulate(100, paths=4000, seed=7, excitation=s0)
+
+    # E[N(t)] = mu t + alpha * integral of E[S], with E[S] relaxing to mu / (beta - alpha)
+    t = np.arange(1, 101)
+    rate, steady = beta - alpha, mu / (beta - alpha)
+    expected = mu * t + alpha * (
+        steady * t + (s0 - steady) * (1 - np.exp(-rate * t)) / rate
+    )
+    np.testing.assert_allclose(
+        forecaster.expected_cumulative(100, excitation=s0), expected
+    )
+    np.testing.assert_allclose(result.expected_cumulative, expected, rtol=0.05)
+    assert np.all(result.cumulative_bands[5.0] <= result.cumulative_bands[95.0])
+    assert result.truncated_paths == 0
+
+    again = forecaster.simulate(100, paths=4000, seed=7, excitation=s0)
+    np.testing.assert_array_equal(again.expected_counts, result.expected_counts)
+    bursty = HawkesForecaster(alpha=0.9, beta=1.0)
+    assert (
+        bursty.simulate(
+            30, paths=10, seed=0, excitation=20.0, max_events=5
+        ).truncated_paths
+        == 10
+    )
+    with pytest.raises(ValueError):
+        HawkesForecaster(alpha=2.0, beta=1.0).simulate(30, paths=10, seed=0)
+
+
+def test_simulate_endpoint(pivot_client):
+    headers = {"X-API-Key": "test-key"}
+    body = {
+        "user_id": "u1",
+        "horizon": 10,
+        "paths": 500,
+        "seed": 3,
+        "percentiles": [10, 90],
+    }
+    response = pivot_client.post("/forecast/simulate", headers=headers, json=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["seed"] == 3 and len(data["expected_counts"]) == 10
+    assert [band["percentile"] for band in data["bands"]] == [10, 90]
+    assert (
+        pivot_client.post("/forecast/simulate", headers=headers, json=body).json()
+        == data
+    )
+
+    unseeded = pivot_client.post(
+        "/forecast/simulate", headers=headers, json={"user_id": "u1"}
+    ).json()
+    assert isinstance(unseeded["seed"], int)
+    bad = pivot_client.post(
+        "/forecast/simulate",
+        headers=headers,
+        json={"user_id": "u1", "percentiles": [120]},
+    )
+    assert bad.status_code == 422
+
+    db = review_db.connect()
+    try:
+        hawkes_params.save_params(
+            [
+                ("explosive", HawkesForecaster(alpha=2.0, beta=1.0), 3),
+                ("busy", HawkesForecaster(baseline=50.0), 3),
+            ],
+            db,
+        )
+    finally:
+        db.close()
+    explosive = pivot_client.post(
+        "/forecast/simulate", headers=headers, json={"user_id": "explosive"}
+    )
+    assert explosive.status_code == 422
+    # 10000 paths x ~36500 expected events each is over the work limit
+    busy = {"user_id": "busy", "horizon": 365, "paths": 10000}
+    assert (
+        pivot_client.post("/forecast/simulate", headers=headers, json=busy).status_code
+        == 422
+    )
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src import db as review_db, hawkes_params
+from src.forecasters.hawkes import HawkesForecaster
+
+
+def _events(user_id, times):
+    return [
+        {
+            "user_id": user_id,
+            "verse_id": "v",
+            "quality": 4,
+            "reviewed_at": t,
+            "ease_factor": 2.5,
+            "repetition_count": 1,
+            "interval": 1,
+            "next_due": t + timedelta(days=1),
+        }
+        for t in times
+    ]
+
+
+def test_fit_all_persists_users_and_population(db):
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 1, 1)
+    for i in range(5):
+        days = np.sort(rng.uniform(0, 60, 20 + 10 * i))
+        review_db.append_review_events(
+            _events(f"u{i}", [start + timedelta(days=float(d)) for d in days]), db=db
+        )
+
+    report = hawkes_params.fit_all(db, now=start + timedelta(days=60), batch_size=2)
+    assert (report.users, report.events) == (5, sum(20 + 10 * i for i in range(5)))
+
+    params = hawkes_params.get_params_many(["u0", "u4", "never-reviewed"], db)
+    assert params["never-reviewed"] == pytest.approx(report.prior)
+    assert params["u0"] != params["u4"]
+    assert all(value > 0 for value in params["u4"].values())
+    assert hawkes_params.get_params("u1", db)["beta"] > 0
+
+
+def test_fit_all_without_history(db):
+    assert hawkes_params.fit_all(db).users == 0
+    assert hawkes_params.get_params("u1", db) is None
+
+
+def test_forecast_uses_persisted_params(pivot_client):
+    headers = {"X-API-Key": "test-key"}
+    before = pivot_client.post(
+        "/forecast", headers=headers, json={"user_id": "fitted", "horizon": 3}
+    ).json()
+
+    db = review_db.connect()
+    try:
+        hawkes_params.save_params(
+            [("fitted", HawkesForecaster(baseline=2.0, alpha=0.1, beta=0.5), 3)], db
+        )
+    finally:
+        db.close()
+
+    after = pivot_client.post(
+        "/forecast", headers=headers, json={"user_id": "fitted", "horizon": 3}
+    ).json()
+    # No reviews recorded: the fitted baseline alone
+    assert [pt["probability"] for pt in after] == pytest.approx([1 - np.exp(-2.0)] * 3)
+    assert after != before
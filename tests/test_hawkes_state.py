@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src import db as review_db, hawkes_params, hawkes_state
+from src.cme_service import CMEService
+from src.forecasters.hawkes import HawkesForecaster
+
+
+def _event(user_id, reviewed_at):
+    return {"user_id": user_id, "reviewed_at": reviewed_at}
+
+
+def test_incremental_state_matches_forecast_from_history(db):
+    now = datetime(2024, 3, 1)
+    hawkes_params.save_params(
+        [("u1", HawkesForecaster(baseline=0.2, alpha=0.6, beta=0.7), 0)], db
+    )
+    days = [-30.5, -12.25, -12.0, -3.0, -0.5]
+    times = [now + timedelta(days=d) for d in days]
+    # In order, in separate batches, and with one review arriving late
+    hawkes_state.apply_review_events([_event("u1", t) for t in times[:2]], db)
+    hawkes_state.apply_review_events(
+        [_event("u1", t) for t in (times[3], times[4])], db
+    )
+    hawkes_state.apply_review_events([_event("u1", times[2].isoformat())], db)
+
+    forecast = hawkes_state.forecast_users(["u1", "nobody"], 20, db, now=now)
+    expected = HawkesForecaster(baseline=0.2, alpha=0.6, beta=0.7).forecast(days, 20)
+    np.testing.assert_allclose(forecast[0], expected, rtol=1e-9)
+    np.testing.assert_allclose(forecast[1], HawkesForecaster().forecast([], 20))
+    chunked = hawkes_state.forecast_users(
+        ["u1", "nobody"], 20, db, now=now, chunk_users=1
+    )
+    np.testing.assert_array_equal(chunked, forecast)
+    assert hawkes_state.get_states(["u1"], db)["u1"][2] == 5
+
+
+def test_reviews_update_state_and_rebuild_agrees(db):
+    service = CMEService(db)
+    service.process_user_reviews([("u1", "v1", 4), ("u2", "v1", 5), ("u1", "v2", 3)])
+    service.process_user_review("v1", "u1", 5)
+    incremental = hawkes_state.get_states(["u1", "u2"], db)
+    assert incremental["u1"][2] == 3 and incremental["u2"][2] == 1
+
+    assert hawkes_state.rebuild(db) == 2
+    rebuilt = hawkes_state.get_states(["u1", "u2"], db)
+    for user_id in ("u1", "u2"):
+        assert rebuilt[user_id] == pytest.approx(incremental[user_id])
+
+
+def test_forecast_endpoints_read_state(pivot_client):
+    headers = {"X-API-Key": "test-key"}
+    db = review_db.connect()
+    try:
+        with db.conn:
+            hawkes_state.apply_review_events(
+                [_event("busy", datetime.utcnow() - timedelta(hours=1))] * 4, db
+            )
+    finally:
+        db.close()
+
+    busy = pivot_client.post(
+        "/forecast", headers=headers, json={"user_id": "busy", "horizon": 5}
+    ).json()
+    idle = pivot_client.post(
+        "/forecast", headers=headers, json={"user_id": "idle", "horizon": 5}
+    ).json()
+    assert busy[0]["probability"] > idle[0]["probability"]
+    assert [pt["probability"] for pt in busy] == sorted(
+        (pt["probability"] for pt in busy), reverse=True
+    )
+    batch = pivot_client.post(
+        "/forecast/batch",
+        headers=headers,
+        json={"user_ids": ["idle", "busy"], "horizon": 5},
+    ).json()
+    assert batch["probabilities"][1] == pytest.approx(
+        [pt["probability"] for pt in busy], rel=1e-6
+    )
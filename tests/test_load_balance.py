@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.algorithms.load_balance import fuzz_window, pick_interval, water_fill
+from src.algorithms.workload import Cards, _balance, simulate_workload, synthetic_cards
+from src.cme_service import CMEService
+
+
+def test_short_intervals_are_not_moved():
+    assert fuzz_window(1) == (1, 1)
+    assert fuzz_window(6) == (5, 7)
+    assert fuzz_window(30) == (27, 33)
+    assert fuzz_window(400) == (393, 407)
+
+
+def test_pick_interval_prefers_user_then_global_then_closeness():
+    assert pick_interval(10, {}, {}) == 10
+    assert pick_interval(10, {10: 2, 9: 1}, {}) == 11
+    assert pick_interval(10, {}, {9: 5, 10: 5, 11: 3}) == 11
+    assert pick_interval(10, {11: 1}, {9: 5, 10: 5, 11: 3}) == 10
+
+
+def test_water_fill_levels_the_lightest_days():
+    assert water_fill(np.array([5, 2, 0]), 4, ideal=1).tolist() == [0, 1, 3]
+    assert water_fill(np.array([1, 1, 1]), 4, ideal=1).tolist() == [1, 2, 1]
+    assert water_fill(np.array([3, 3]), 0, ideal=0).tolist() == [0, 0]
+
+
+def test_load_balanced_reviews_spread_over_the_window(db):
+    service = CMEService(db, load_balance=True)
+    # Two passing reviews put a card on the fixed 6-day step
+    for verse in range(3):
+        service.process_user_reviews([("u1", f"v{verse}", 5), ("u1", f"v{verse}", 5)])
+    intervals = sorted(
+        (datetime.fromisoformat(row[0]) - datetime.utcnow() + timedelta(hours=1)).days
+        for row in db.execute("SELECT next_due FROM verse_reviews").fetchall()
+    )
+    assert intervals == [5, 6, 7]
+
+
+def test_load_balancing_lowers_simulated_peak_to_mean():
+    cards = synthetic_cards(2000, 200, 20)
+    plain = simulate_workload([cards], 90, seed=5)
+    balanced = simulate_workload([cards], 90, seed=5, load_balance=True)
+    assert balanced.peak_to_mean < plain.peak_to_mean
+    # Cards are only moved, never dropped: both runs start the same cards
+    assert balanced.reviews[0] == plain.reviews[0]
+
+
+def test_windows_past_the_horizon_are_left_unbalanced():
+    load = np.zeros(90, dtype=np.int64)
+    cards = Cards(
+        ease=np.array([2.5, 2.5]),
+        reps=np.array([3, 3]),
+        interval=np.array([30, 10]),
+        due_day=np.array([100, 80]),
+        count=np.array([50, 50]),
+    )
+    balanced = _balance(cards, 70, load)
+    # The 30-day window runs past day 89: untouched, and adds no load inside the horizon
+    assert balanced.due_day[balanced.interval >= 25].tolist() == [100]
+    assert load.sum() == 50 and load[79:82].sum() == 50
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import pytest
+import sqlite_utils
+
+from src import migrations
+from src.cme_service import CMEService
+
+
+def test_migrate_fresh_database(tmp_path):
+    db = sqlite_utils.Database(str(tmp_path / "fresh.db"))
+    applied = migrations.migrate(db)
+    assert [m.version for m in applied] == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.current_version(db) == migrations.LATEST_VERSION
+    assert {"verses", "verse_reviews"} <= set(db.table_names())
+    assert migrations.pending(db) == []
+
+
+def test_migrate_is_idempotent(tmp_path):
+    db = sqlite_utils.Database(str(tmp_path / "twice.db"))
+    migrations.migrate(db)
+    assert migrations.migrate(db) == []
+
+
+def test_migrate_legacy_database_without_pivot(tmp_path):
+    db = sqlite_utils.Database(str(tmp_path / "legacy.db"))
+    db["verses"].create(
+        {
+            "verse_id": str,
+            "text": str,
+            "covenant_tags": str,
+            "emotion_codes": str,
+            "notes": str,
+            "repetitions": int,
+            "easiness_factor": float,
+            "interval": int,
+            "next_due": datetime,
+        },
+        pk="verse_id",
+    )
+    db["verses"].insert({"verse_id": "Gen_1_1", "text": "In the beginning..."})
+    assert "pivot" not in db["verses"].columns_dict
+
+    migrations.migrate(db)
+
+    assert "pivot" in db["verses"].columns_dict
+    assert db["verses"].get("Gen_1_1")["text"] == "In the beginning..."
+
+
+def test_tag_junctions_backfilled_from_json(tmp_path):
+    db = sqlite_utils.Database(str(tmp_path / "tags.db"))
+    migrations.migrate(db, target=4)
+    db["verses"].insert(
+        {
+            "verse_id": "John_3_16",
+            "text": "...",
+            "covenant_tags": '["Love", "Atonement"]',
+            "emotion_codes": "null",
+        }
+    )
+
+    migrations.migrate(db)
+
+    assert sorted(db.execute("SELECT tag, verse_id FROM verse_tags").fetchall()) == [
+        ("Atonement", "John_3_16"),
+        ("Love", "John_3_16"),
+    ]
+    assert db.execute("SELECT COUNT(*) FROM verse_emotions").fetchone()[0] == 0
+
+
+def test_due_histograms_follow_verse_reviews(tmp_path):
+    db = sqlite_utils.Database(str(tmp_path / "histogram.db"))
+    migrations.migrate(db, target=5)
+    with db.conn:
+        db.execute(
+            "INSERT INTO verse_reviews VALUES ('u1', 'v1', 2.5, 1, 1, '2024-01-01T08:00:00')"
+        )
+    migrations.migrate(db)
+    # Backfilled, then maintained on insert, update and delete
+    db.execute(
+        "INSERT INTO verse_reviews VALUES ('u2', 'v1', 2.5, 1, 1, '2024-01-01T09:00:00')"
+    )
+    db.execute(
+        "UPDATE verse_reviews SET next_due = '2024-01-07T08:00:00' WHERE user_id = 'u1'"
+    )
+    db.execute(
+        "UPDATE verse_reviews SET next_due = '2024-01-07T10:00:00' WHERE user_id = 'u1'"
+    )
+    db.execute(
+        "INSERT INTO verse_reviews VALUES ('u1', 'v2', 2.5, 1, 1, '2024-01-07T11:00:00')"
+    )
+    db.execute("DELETE FROM verse_reviews WHERE user_id = 'u2'")
+
+    assert db.execute("SELECT * FROM due_histogram").fetchall() == [("2024-01-07", 2)]
+    assert db.execute("SELECT * FROM user_due_histogram").fetchall() == [
+        ("u1", "2024-01-07", 2)
+    ]
+
+
+def test_rollups_backfilled_from_review_history(tmp_path):
+    live = sqlite_utils.Database(str(tmp_path / "live.db"))
+    migrations.migrate(live)
+    CMEService(live).process_user_reviews(
+        [("u1", "v1", 5), ("u1", "v2", 2), ("u2", "v1", 4), ("u1", "v1", 4)]
+    )
+
+    # The same history in a database that predates the rollup tables
+    old = sqlite_utils.Database(str(tmp_path / "old.db"))
+    migrations.migrate(old, target=8)
+    for table in ("verse_reviews", "review_events"):
+        columns = [row[1] for row in old.execute(f"PRAGMA table_info([{table}])")]
+        rows = live.execute(f"SELECT {', '.join(columns)} FROM [{table}]").fetchall()
+        old[table].insert_all([dict(zip(columns, row)) for row in rows])
+    migrations.migrate(old)
+
+    for table in ("user_stats", "hawkes_state"):
+        query = f"SELECT * FROM [{table}] ORDER BY user_id"
+        backfilled, maintained = (
+            old.execute(query).fetchall(),
+            live.execute(query).fetchall(),
+        )
+        assert [r[0] for r in backfilled] == [r[0] for r in maintained] == ["u1", "u2"]
+        for got, want in zip(backfilled, maintained):
+            assert got == pytest.approx(want)
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src import db as review_db, migrations
+from src.algorithms.sm2 import update_sm2_stats
+from src.cme_service import CMEService
+from src.event_log import export_events
+from src.replay import Events, ExportSource, TableSource, replay_events, run_replay
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "replay.db")
+    db = review_db._open(path)
+    migrations.migrate(db)
+    service = CMEService(db)
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        service.process_user_reviews(
+            [
+                (f"u{rng.integers(6)}", f"v{rng.integers(5)}", int(rng.integers(6)))
+                for _ in range(5)
+            ]
+        )
+    db.close()
+    return path
+
+
+def _states(path):
+    db = review_db._open(path)
+    try:
+        return db.execute(
+            "SELECT * FROM verse_reviews ORDER BY user_id, verse_id"
+        ).fetchall()
+    finally:
+        db.close()
+
+
+def _corrupt(path):
+    db = review_db._open(path)
+    with db.conn:
+        db.execute("UPDATE verse_reviews SET ease_factor = 0, interval = 999")
+    db.close()
+
+
+def test_replay_events_matches_scalar_updates():
+    start = datetime(2024, 1, 1, 9, 30)
+    events = [
+        ("u1", "v1", 5, 0),
+        ("u1", "v1", 4, 1),
+        ("u1", "v1", 3, 7),
+        ("u2", "v1", 1, 2),
+        ("u1", "v2", 5, 3),
+    ]
+    # Out of order on purpose: replay sorts by review time
+    events = events[::-1]
+    replayed = replay_events(
+        Events(
+            np.array([e[0] for e in events], dtype=object),
+            np.array([e[1] for e in events], dtype=object),
+            np.array([e[2] for e in events]),
+            np.array(
+                [start + timedelta(days=e[3]) for e in events], dtype="datetime64[us]"
+            ),
+            np.arange(len(events)),
+        )
+    )
+    expected = update_sm2_stats(2.5, 0, 0, 5, now=start)
+    expected = update_sm2_stats(
+        expected["easiness_factor"], 1, 1, 4, now=start + timedelta(days=1)
+    )
+    expected = update_sm2_stats(
+        expected["easiness_factor"], 2, 6, 3, now=start + timedelta(days=7)
+    )
+    u1v1 = next(s for s in replayed if (s["user_id"], s["verse_id"]) == ("u1", "v1"))
+    assert u1v1 == {
+        "user_id": "u1",
+        "verse_id": "v1",
+        "ease_factor": expected["easiness_factor"],
+        "repetition_count": 3,
+        "interval": expected["interval"],
+        "next_due": expected["next_due"],
+    }
+    assert len(replayed) == 3
+
+
+def test_replay_from_table_rebuilds_state(db_path):
+    expected = _states(db_path)
+    _corrupt(db_path)
+    report = run_replay(db_path, TableSource(db_path, shard_events=30))
+    assert report.shards > 1 and report.events == 200
+    assert _states(db_path) == expected
+
+
+def test_replay_from_export_in_processes(db_path, tmp_path):
+    expected = _states(db_path)
+    db = review_db._open(db_path)
+    export_events(db, str(tmp_path / "export"), chunk_size=64)
+    db.close()
+    _corrupt(db_path)
+    report = run_replay(
+        db_path, ExportSource(str(tmp_path / "export"), shard_count=3), workers=2
+    )
+    assert report.shards == 3 and report.events == 200
+    assert _states(db_path) == expected
+
+
+def test_replay_resumes_from_checkpoints(db_path):
+    expected = _states(db_path)
+    source = TableSource(db_path, shard_events=30)
+    first, *rest = source.shards()
+    db = review_db._open(db_path)
+    with db.conn:
+        db.execute(
+            "INSERT INTO replay_checkpoints VALUES ('rebuild', ?, 0, 0, '2024-01-01')",
+            [first.key],
+        )
+    db.close()
+    _corrupt(db_path)
+
+    report = run_replay(db_path, source, run_id="rebuild")
+    assert report.skipped == 1 and report.shards == len(rest)
+    # The checkpointed shard was not touched
+    states = _states(db_path)
+    assert [s for s in states if s[0] > first.last_user] == [
+        s for s in expected if s[0] > first.last_user
+    ]
+    assert all(s[4] == 999 for s in states if s[0] <= first.last_user)
@@ -0,0 +1,234 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import cme_service, db as review_db, migrations
+from src.review_buffer import ReviewBuffer
+from src.schemas import Verse
+
+
+@pytest.fixture
+def review_db_path(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "buffer.db")
+    monkeypatch.setattr(review_db, "DB_PATH", db_path)
+    db = review_db.connect()
+    migrations.migrate(db)
+    db.close()
+    yield db_path
+    review_db.close_pool()
+
+
+def _state(user_id, verse_id, reps):
+    return {
+        "user_id": user_id,
+        "verse_id": verse_id,
+        "ease_factor": 2.5,
+        "repetition_count": reps,
+        "interval": 1,
+        "next_due": datetime(2024, 1, 1),
+    }
+
+
+def _crash(buffer):
+    # The process dies without flushing or closing cleanly; the OS drops its lock.
+    buffer._journal.close()
+    buffer._lock_file.close()
+
+
+def _stored(user_id, verse_id):
+    return review_db.get_review_state(user_id, verse_id)
+
+
+def test_buffered_state_is_visible_before_flush(review_db_path, tmp_path):
+    buffer = ReviewBuffer(str(tmp_path / "journal"), flush_max_items=100).start(
+        background=False
+    )
+    buffer.record([_state("u1", "v1", 1)])
+
+    assert buffer.get("u1", "v1")["repetition_count"] == 1
+    assert _stored("u1", "v1") is None
+
+    assert buffer.flush() == 1
+    assert _stored("u1", "v1")["repetition_count"] == 1
+    buffer.close()
+
+
+def test_close_flushes_pending_states(review_db_path, tmp_path):
+    buffer = ReviewBuffer(str(tmp_path / "journal")).start()
+    buffer.record([_state("u1", "v1", 1), _state("u1", "v2", 2)])
+    buffer.close()
+
+    assert _stored("u1", "v2")["repetition_count"] == 2
+    # Only the lock file is left
+    assert [f for f in os.listdir(tmp_path) if f.startswith("journal.")] == [
+        "journal.lock"
+    ]
+
+
+def test_background_flush_on_max_items(review_db_path, tmp_path):
+    buffer = ReviewBuffer(
+        str(tmp_path / "journal"), flush_interval_ms=60_000, flush_max_items=2
+    ).start()
+    try:
+        buffer.record([_state("u1", "v1", 1), _state("u1", "v2", 1)])
+        # _wake stays set until the flusher picks it up, so poll on a clock
+        deadline = time.monotonic() + 5
+        while _stored("u1", "v2") is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _stored("u1", "v2") is not None
+    finally:
+        buffer.close()
+
+
+def test_second_process_cannot_share_the_journal(review_db_path, tmp_path):
+    journal = str(tmp_path / "journal")
+    running = ReviewBuffer(journal).start(background=False)
+    running.record([_state("u1", "v1", 1)])
+    with pytest.raises(RuntimeError, match="single worker"):
+        ReviewBuffer(journal).start(background=False)
+    # The running buffer's segment was not replayed or removed
+    assert _stored("u1", "v1") is None and running._segments()
+    running.close()
+    assert _stored("u1", "v1")["repetition_count"] == 1
+    ReviewBuffer(journal).start(background=False).close()
+
+
+def test_recovery_after_crash(review_db_path, tmp_path):
+    journal = str(tmp_path / "journal")
+    crashed = ReviewBuffer(journal).start(background=False)
+    crashed.record([_state("u1", "v1", 1)])
+    crashed.record([_state("u1", "v1", 2), _state("u2", "v1", 1)])
+    _crash(crashed)
+    with open(crashed._journal.name, "a") as f:
+        f.write('{"user_id": "u3", "verse')  # torn, unacknowledged append
+
+    restarted = ReviewBuffer(journal).start(background=False)
+    assert _stored("u1", "v1")["repetition_count"] == 2
+    assert _stored("u2", "v1")["repetition_count"] == 1
+    assert _stored("u3", "v1") is None
+    assert restarted._segments() == []
+    restarted.close()
+
+
+def test_recovery_after_crash_mid_flush(review_db_path, tmp_path, monkeypatch):
+    journal = str(tmp_path / "journal")
+    crashed = ReviewBuffer(journal).start(background=False)
+    crashed.record([_state("u1", "v1", 1)])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    save_review_states = review_db.save_review_states
+    monkeypatch.setattr(review_db, "save_review_states", fail)
+    with pytest.raises(RuntimeError):
+        crashed.flush()
+    # The failed batch stays buffered and journaled
+    assert crashed.get("u1", "v1")["repetition_count"] == 1
+    crashed.record([_state("u2", "v1", 3)])
+    monkeypatch.setattr(review_db, "save_review_states", save_review_states)
+    _crash(crashed)
+
+    restarted = ReviewBuffer(journal).start(background=False)
+    assert _stored("u1", "v1")["repetition_count"] == 1
+    assert _stored("u2", "v1")["repetition_count"] == 3
+    restarted.close()
+
+
+def test_review_endpoint_in_write_behind_mode(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "cme.db")
+    monkeypatch.setattr(review_db, "DB_PATH", db_path)
+    monkeypatch.setattr(cme_service, "WRITE_BEHIND", True)
+    monkeypatch.setenv("SANCTUM_REVIEW_JOURNAL", str(tmp_path / "journal"))
+    headers = {"X-API-Key": "test-key"}
+
+    with TestClient(cme_service.app) as client:
+        for q, interval in ((5, 1), (4, 6)):
+            response = client.post(
+                "/review",
+                headers=headers,
+                json={"user_id": "u1", "verse_id": "Ps_1_1", "q": q},
+            )
+            # The second review builds on the buffered (not yet committed) first one
+            assert (
+                f"Your next review is in {interval} days" in response.json()["message"]
+            )
+
+    # Shutdown flushed the buffer, events included
+    assert _stored("u1", "Ps_1_1")["repetition_count"] == 2
+    db = review_db.connect()
+    assert db.execute(
+        "SELECT quality FROM review_events ORDER BY event_id"
+    ).fetchall() == [(5,), (4,)]
+    db.close()
+    review_db.close_pool()
+
+
+def test_due_list_reflects_buffered_reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(review_db, "DB_PATH", str(tmp_path / "cme.db"))
+    monkeypatch.setattr(cme_service, "WRITE_BEHIND", True)
+    monkeypatch.setenv("SANCTUM_REVIEW_JOURNAL", str(tmp_path / "journal"))
+    headers = {"X-API-Key": "test-key"}
+    yesterday = datetime.utcnow() - timedelta(days=1)
+
+    with TestClient(cme_service.app) as client:
+        db = review_db.connect()
+        for verse_id in ("Ps_1_1", "Ps_1_2", "Ps_1_3"):
+            review_db.upsert_verses(
+                [review_db.verse_to_row(Verse(verse_id=verse_id, text=verse_id))], db=db
+            )
+            review_db.save_review_state(
+                "u1",
+                verse_id,
+                {
+                    "ease_factor": 2.5,
+                    "repetition_count": 1,
+                    "interval": 1,
+                    "next_due": yesterday,
+                },
+                db=db,
+            )
+        db.close()
+        client.post(
+            "/review",
+            headers=headers,
+            json={"user_id": "u1", "verse_id": "Ps_1_2", "q": 5},
+        )
+        # Not flushed yet: the stored state still says Ps_1_2 is due
+        assert _stored("u1", "Ps_1_2")["next_due"] < datetime.utcnow().isoformat()
+        for order in ("due", "priority"):
+            due = client.get(
+                "/users/u1/due", headers=headers, params={"order": order, "limit": 2}
+            ).json()
+            assert [card["verse_id"] for card in due] == ["Ps_1_1", "Ps_1_3"]
+    review_db.close_pool()
+
+
+def test_recovery_skips_committed_segments(review_db_path, tmp_path):
+    journal = str(tmp_path / "journal")
+    event = {
+        **_state("u1", "v1", 1),
+        "quality": 5,
+        "reviewed_at": datetime(2024, 1, 1),
+        "prior_ease_factor": None,
+        "prior_repetition_count": None,
+        "prior_interval": None,
+        "prior_next_due": None,
+    }
+    buffer = ReviewBuffer(journal).start(background=False)
+    buffer.record([_state("u1", "v1", 1)], [event])
+    buffer.flush()
+    buffer.close()
+    # Simulate a crash after the commit but before the segment was removed
+    with open(f"{journal}.{0:08d}", "w") as f:
+        f.write('{"event": {"user_id": "u1", "verse_id": "v1"}}\n')
+
+    restarted = ReviewBuffer(journal).start(background=False)
+    db = review_db.connect()
+    assert db.execute("SELECT COUNT(*) FROM review_events").fetchone()[0] == 1
+    db.close()
+    # New segments continue past the checkpoint
+    assert restarted._seq > 0
+    restarted.close()
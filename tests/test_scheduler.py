@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from src.scheduler import DueScheduler
+
+
+def test_next_card_hydrates_from_database(db, save_review):
+    now = datetime(2024, 1, 10)
+    save_review(db, "u1", "late", now - timedelta(days=3))
+    save_review(db, "u1", "soon", now + timedelta(days=1))
+    save_review(db, "u2", "other", now - timedelta(days=9))
+
+    scheduler = DueScheduler()
+    assert scheduler.next_card("u1", db) == (
+        "late",
+        (now - timedelta(days=3)).isoformat(),
+    )
+    assert scheduler.next_card("nobody", db) is None
+
+
+def test_update_reorders_in_memory(db, save_review):
+    now = datetime(2024, 1, 10)
+    save_review(db, "u1", "a", now)
+    save_review(db, "u1", "b", now + timedelta(days=2))
+    scheduler = DueScheduler()
+    scheduler.next_card("u1", db)
+
+    # Reviewing "a" pushes it past "b"; no database read is needed to see it
+    scheduler.update("u1", "a", now + timedelta(days=6))
+    db.execute("DELETE FROM verse_reviews")
+    assert scheduler.next_card("u1", db)[0] == "b"
+
+
+def test_update_ignores_users_not_in_memory(db):
+    scheduler = DueScheduler()
+    scheduler.update("u1", "a", datetime(2024, 1, 1))
+    assert len(scheduler) == 0
+
+
+def test_lru_eviction(db, save_review):
+    save_review(db, "u1", "a", datetime(2024, 1, 1))
+    scheduler = DueScheduler(max_users=2)
+    for user_id in ("u1", "u2", "u3"):
+        scheduler.next_card(user_id, db)
+    assert len(scheduler) == 2
+    assert "u1" not in scheduler._users
+    # Evicted users are rebuilt from the database on demand
+    assert scheduler.next_card("u1", db)[0] == "a"
+
+
+def test_card_cap_eviction(db, save_review):
+    for i in range(5):
+        save_review(db, "big", f"v{i}", datetime(2024, 1, 1))
+        save_review(db, "small", f"v{i}", datetime(2024, 1, 1))
+    scheduler = DueScheduler(max_cards=7)
+    scheduler.next_card("big", db)
+    scheduler.next_card("small", db)
+    assert list(scheduler._users) == ["small"]
@@ -1,5 +1,5 @@
-
 import datetime
+import numpy as np
 import pytest
 
 from src.algorithms import sm2
@@ -16,12 +16,12 @@ def test_reset_on_failure(monkeypatch):
         def utcnow(cls):
             return datetime.datetime(2024, 1, 1)
 
-    monkeypatch.setattr(sm2, 'datetime', FixedDatetime)
+    monkeypatch.setattr(sm2, "datetime", FixedDatetime)
     res = sm2.update_sm2_stats(2.5, 3, 10, 1)
-    assert res['repetitions'] == 0
-    assert res['interval'] == 1
-    assert res['easiness_factor'] >= 1.3
-    assert res['next_due'] == FixedDatetime.utcnow() + datetime.timedelta(days=1)
+    assert res["repetitions"] == 0
+    assert res["interval"] == 1
+    assert res["easiness_factor"] >= 1.3
+    assert res["next_due"] == FixedDatetime.utcnow() + datetime.timedelta(days=1)
 
 
 def test_successful_review(monkeypatch):
@@ -30,11 +30,11 @@ def test_successful_review(monkeypatch):
         def utcnow(cls):
             return datetime.datetime(2024, 1, 1)
 
-    monkeypatch.setattr(sm2, 'datetime', FixedDatetime)
+    monkeypatch.setattr(sm2, "datetime", FixedDatetime)
     res = sm2.update_sm2_stats(2.5, 1, 1, 5)
-    assert res['repetitions'] == 2
-    assert res['interval'] == 6
-    assert res['easiness_factor'] > 2.5
+    assert res["repetitions"] == 2
+    assert res["interval"] == 6
+    assert res["easiness_factor"] > 2.5
 
 
 def test_late_repetition(monkeypatch):
@@ -43,9 +43,41 @@ def test_late_repetition(monkeypatch):
         def utcnow(cls):
             return datetime.datetime(2024, 1, 1)
 
-    monkeypatch.setattr(sm2, 'datetime', FixedDatetime)
+    monkeypatch.setattr(sm2, "datetime", FixedDatetime)
     res = sm2.update_sm2_stats(2.5, 5, 12, 5)
-    assert res['repetitions'] == 6
-    assert res['interval'] == round(12 * 2.5)
-    assert res['easiness_factor'] > 2.5
-    assert res['next_due'] == FixedDatetime.utcnow() + datetime.timedelta(days=res['interval'])
+    assert res["repetitions"] == 6
+    assert res["interval"] == round(12 * 2.5)
+    assert res["easiness_factor"] > 2.5
+    assert res["next_due"] == FixedDatetime.utcnow() + datetime.timedelta(
+        days=res["interval"]
+    )
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(7)
+    n = 5000
+    ease = rng.uniform(1.3, 3.0, n)
+    # Intervals that land exactly on .5 exercise half-to-even rounding
+    ease[:50] = 2.5
+    reps = rng.integers(0, 8, n)
+    interval = rng.integers(0, 400, n)
+    q = rng.integers(0, 6, n)
+    now = datetime.datetime(2024, 3, 1, 8, 30, 15, 250)
+
+    batch = sm2.update_sm2_batch(ease, reps, interval, q, now=now)
+    due = batch["next_due"].astype(object)
+    for i in range(n):
+        expected = sm2.update_sm2_stats(
+            float(ease[i]), int(reps[i]), int(interval[i]), int(q[i]), now=now
+        )
+        assert batch["easiness_factor"][i] == expected["easiness_factor"]
+        assert batch["repetitions"][i] == expected["repetitions"]
+        assert batch["interval"][i] == expected["interval"]
+        assert due[i] == expected["next_due"]
+
+
+def test_batch_invalid_quality():
+    with pytest.raises(ValueError):
+        sm2.update_sm2_batch(
+            np.array([2.5]), np.array([0]), np.array([0]), np.array([6])
+        )
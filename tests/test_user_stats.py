@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src import user_stats
+from src.cme_service import CMEService
+
+
+def _rows(db):
+    return db.execute("SELECT * FROM user_stats ORDER BY user_id").fetchall()
+
+
+def test_stats_follow_reviews(db):
+    service = CMEService(db)
+    service.process_user_reviews([("u1", "v1", 5), ("u1", "v1", 5), ("u1", "v2", 4)])
+    service.process_user_review("v1", "u1", 1)  # lapse of a learned card
+
+    stats = user_stats.get_user_stats("u1", db)
+    assert stats["total_reviews"] == 4
+    assert stats["reviews_today"] == 4
+    assert stats["cards"] == 2
+    assert stats["lapses"] == 1
+    # Reviews of learned cards: the second v1 review (passed) and the lapse
+    assert stats["retention_rate"] == 0.5
+    state_ease = [
+        r[0]
+        for r in db.execute(
+            "SELECT ease_factor FROM verse_reviews WHERE user_id = 'u1'"
+        )
+    ]
+    assert stats["mean_ease"] == pytest.approx(sum(state_ease) / 2)
+    assert user_stats.get_user_stats("nobody", db) is None
+
+
+def test_reviews_today_resets_on_a_new_day(db):
+    event = {
+        "user_id": "u1",
+        "quality": 4,
+        "prior_repetition_count": None,
+        "prior_ease_factor": None,
+        "prior_interval": None,
+        "ease_factor": 2.5,
+        "interval": 1,
+    }
+    user_stats.apply_review_events(
+        [{**event, "reviewed_at": datetime(2024, 1, 1, 23)}] * 3, db
+    )
+    user_stats.apply_review_events(
+        [{**event, "reviewed_at": datetime(2024, 1, 2, 1)}], db
+    )
+    # A late, out-of-order event for an earlier day does not reset the count
+    user_stats.apply_review_events(
+        [{**event, "reviewed_at": datetime(2024, 1, 1, 22)}], db
+    )
+
+    assert user_stats.get_user_stats("u1", db, today="2024-01-02")["reviews_today"] == 1
+    assert user_stats.get_user_stats("u1", db, today="2024-01-03")["reviews_today"] == 0
+    assert user_stats.get_user_stats("u1", db)["total_reviews"] == 5
+
+
+def test_incremental_rollup_matches_rebuild(db):
+    service = CMEService(db)
+    rng = np.random.default_rng(1)
+    for _ in range(30):
+        service.process_user_reviews(
+            [
+                (f"u{rng.integers(4)}", f"v{rng.integers(6)}", int(rng.integers(6)))
+                for _ in range(8)
+            ]
+        )
+    # Push some cards past the mature threshold
+    for _ in range(8):
+        service.process_user_reviews([("u0", "v0", 5)])
+    incremental = _rows(db)
+
+    assert user_stats.rebuild(db) == 4
+    rebuilt = _rows(db)
+    assert [r[:6] + r[7:] for r in incremental] == [r[:6] + r[7:] for r in rebuilt]
+    assert [r[6] for r in incremental] == pytest.approx([r[6] for r in rebuilt])
+    assert any(r[7] > 0 for r in rebuilt)
+
+
+def test_stats_endpoint(cme_client):
+    headers = {"X-API-Key": "test-key"}
+    assert cme_client.get("/users/stats-user/stats", headers=headers).status_code == 404
+    cme_client.post(
+        "/review",
+        headers=headers,
+        json={"user_id": "stats-user", "verse_id": "Josh_1_8", "q": 5},
+    )
+
+    response = cme_client.get("/users/stats-user/stats", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": "stats-user",
+        "reviews_today": 1,
+        "total_reviews": 1,
+        "lapses": 0,
+        "cards": 1,
+        "mature_cards": 0,
+        "mean_ease": 2.6,
+        "retention_rate": None,
+    }
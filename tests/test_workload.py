@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src import db as review_db
+from src.algorithms import sm2
+from src.algorithms.workload import (
+    Cards,
+    QualityModel,
+    iter_review_cards,
+    simulate_cards,
+    simulate_workload,
+    synthetic_cards,
+)
+
+
+def test_synthetic_cards_introduce_new_per_day():
+    cards = synthetic_cards(users=3, cards_per_user=45, new_per_day=20)
+    assert cards.due_day.tolist() == [0, 1, 2]
+    assert cards.count.tolist() == [60, 60, 15]
+    assert len(cards) == 135
+
+
+def test_perfect_recall_follows_sm2_intervals():
+    # Everyone answers q=5: reviews on days 0, 1, 7 (1 + 6), then 7 + 16 = 23
+    cards = synthetic_cards(users=10, cards_per_user=1)
+    reviews = simulate_cards(cards, days=30, quality=QualityModel([0, 0, 0, 0, 0, 1]))
+    assert np.flatnonzero(reviews).tolist() == [0, 1, 7, 23]
+    assert reviews[[0, 1, 7, 23]].tolist() == [10, 10, 10, 10]
+
+
+def test_failures_are_reviewed_daily():
+    cards = synthetic_cards(users=4, cards_per_user=1)
+    reviews = simulate_cards(cards, days=5, quality=QualityModel([1, 0, 0, 0, 0, 0]))
+    assert reviews.tolist() == [4] * 5
+
+
+def test_cohorts_match_per_card_simulation():
+    days = 60
+    probs = [0.05, 0.05, 0.1, 0.2, 0.3, 0.3]
+    grouped = simulate_workload(
+        [synthetic_cards(300, 20, 10)], days, QualityModel(probs), seed=3
+    )
+
+    # Reference: every card reviewed one by one with the scalar SM-2 update
+    rng = np.random.default_rng(4)
+    reviews = np.zeros(days, dtype=np.int64)
+    for card in range(300 * 20):
+        ease, reps, interval, day = 2.5, 0, 0, (card % 20) // 10
+        while day < days:
+            reviews[day] += 1
+            stats = sm2.update_sm2_stats(
+                ease,
+                reps,
+                interval,
+                int(rng.choice(6, p=probs)),
+                now=datetime(2024, 1, 1),
+            )
+            ease, reps, interval = (
+                stats["easiness_factor"],
+                stats["repetitions"],
+                stats["interval"],
+            )
+            day += interval
+
+    assert grouped.total == pytest.approx(reviews.sum(), rel=0.03)
+    # Within sampling noise day by day
+    assert (np.abs(grouped.reviews - reviews) <= 5 * np.sqrt(reviews) + 5).all()
+
+
+def test_seed_makes_runs_reproducible():
+    cards = synthetic_cards(50, 100, 10)
+    first = simulate_workload([cards], 90, seed=11)
+    second = simulate_workload([cards], 90, seed=11)
+    assert np.array_equal(first.reviews, second.reviews)
+    assert first.peak_to_mean >= 1.0
+
+
+def test_iter_review_cards_reads_verse_reviews(db):
+    start = datetime(2024, 1, 1)
+    for i, offset in enumerate([-3, 0, 0, 2]):
+        review_db.save_review_state(
+            f"u{i}",
+            "v1",
+            {
+                "ease_factor": 2.5,
+                "repetition_count": 2,
+                "interval": 6,
+                "next_due": start + timedelta(days=offset, hours=5),
+            },
+            db=db,
+        )
+    (cards,) = list(iter_review_cards(db, start, chunk_size=10))
+    # Overdue cards are due on day 0; identical states are merged
+    assert dict(zip(cards.due_day.tolist(), cards.count.tolist())) == {0: 3, 2: 1}